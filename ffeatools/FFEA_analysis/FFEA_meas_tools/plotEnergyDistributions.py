@@ -37,7 +37,7 @@ parser.add_argument("script", action="store", help="Input script file (.ffea).")
 
 def plotEnergyDistributions(script):
 	
-	meas = script.load_measurement() 
+	meas = script.load_measurement(columns = ["StrainEnergy"])
 	kT = script.params.kT
 
 	#
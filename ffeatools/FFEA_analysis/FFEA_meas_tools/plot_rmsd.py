@@ -38,7 +38,7 @@ parser.add_argument("script", action="store", help="Input script file (.ffea).")
 
 def plot_rmsd(script):
 
-    meas = script.load_measurement()
+    meas = script.load_measurement(columns = ["RMSD"])
     top = [script.load_topology(i) for i in range(script.params.num_blobs)]
     
     # We need to plot a global measurement graph, and a graph for every blob
@@ -32,6 +32,20 @@ parser.add_argument("out_fname", action="store", help="Output script fname (.ffe
 parser.add_argument("frames_to_read", action="store", type=int, help="Number of frames to read")
 parser.add_argument("thin_percent", action="store", type=float, help="Percentage to keep")
 
+def get_thin_frame_rate(thin_percent):
+    """
+    Turn the percentage of frames to keep into the rate at which to keep them.
+    """
+    if thin_percent < 0 or thin_percent > 100:
+        sys.exit("Error. Percentage must be between 0 and 100. You used %f\n" % (thin_percent))
+    
+    if thin_percent < 1:
+        verify = raw_input("Percentage to keep was %f. Did you mean %f (y/n)?" % (thin_percent, thin_percent * 100))
+        if verify.lower() == "y":
+            thin_percent *= 100
+    
+    return int(round(100 / thin_percent))
+
 def thin_system(script_fname, frames_to_read, thin_percent):
     """
     Remove frames from an FFEA_trajectory file.
@@ -44,15 +58,7 @@ def thin_system(script_fname, frames_to_read, thin_percent):
     an FFEA trajectory object.
     """
     
-    if thin_percent < 0 or thin_percent > 100:
-        sys.exit("Error. Percentage must be between 0 and 100. You used %f\n" % (thin_percent))
-    
-    if thin_percent < 1:
-        verify = raw_input("Percentage to keep was %f. Did you mean %f (y/n)?" % (thin_percent, thin_percent * 100))
-        if verify.lower() == "y":
-            thin_percent *= 100
-    
-    frame_rate = int(round(100 / thin_percent))
+    frame_rate = get_thin_frame_rate(thin_percent)
 
     # Change output data
     script = FFEA_script.FFEA_script(script_fname)
@@ -61,40 +67,52 @@ def thin_system(script_fname, frames_to_read, thin_percent):
     traj = FFEA_trajectory.FFEA_trajectory(script.params.trajectory_out_fname, frame_rate = frame_rate, num_frames_to_read = frames_to_read)
     meas = FFEA_measurement.FFEA_measurement(script.params.measurement_out_fname, frame_rate = frame_rate, num_frames_to_read = frames_to_read)
     return script, traj, meas
+
+def thin_system_to_files(script_fname, out_fname, frames_to_read, thin_percent):
+    """
+    Thin an FFEA system straight into new files, streaming the trajectory
+    and measurements frame by frame rather than loading them, so any length
+    of run can be thinned.
+    In:
+    script_fname: the input script file
+    out_fname: the output script file. The trajectory and measurements are
+    written next to it, numbered if those names are taken
+    frames_to_read: the number of frames to read,
+    thin_percent: percentage of the file to keep
+    Returns:
+    the output script, trajectory and measurement filenames.
+    """
+    frame_rate = get_thin_frame_rate(thin_percent)
+
+    script = FFEA_script.FFEA_script(script_fname)
+    script.params.check *= frame_rate
+
+    # Get output_fnames, not overwriting anything
+    out_bfname = os.path.splitext(out_fname)[0]
+    fnames = []
+    for ext in [".ftj", ".fm", ".ffea"]:
+        fname = out_bfname + ext
+        index = 1
+        while os.path.exists(fname):
+            fname = out_bfname + "_" + str(index) + ext
+            index += 1
+        fnames.append(fname)
+    out_tfname, out_mfname, out_sfname = fnames
+
+    # Same frames from both
+    FFEA_trajectory.rewrite_trajectory(script.params.trajectory_out_fname, out_tfname, stop = frames_to_read, frame_rate = frame_rate)
+    FFEA_measurement.rewrite_measurement(script.params.measurement_out_fname, out_mfname, stop = frames_to_read, frame_rate = frame_rate)
+
+    script.params.measurement_out_fname = out_mfname
+    script.params.trajectory_out_fname = out_tfname
+    script.write_to_file(out_sfname, verbose=True)
+    return out_sfname, out_tfname, out_mfname
     
 if sys.stdin.isatty() and hasattr(__builtin__, 'FFEA_API_mode') == False:
     args = parser.parse_args()
     # Get args and build objects
     if not os.path.exists(args.script_fname):
         raise IOError("Script file specified doesn't exist.")
-    out_script, out_traj, out_meas = thin_system(args.script_fname, args.frames_to_read, args.thin_percent, )
-
-    # Get output_fnames and write out
-    out_bfname = os.path.splitext(args.out_fname)[0]
-
-    out_tfname = out_bfname + ".ftj"
-    index = 1
-    while os.path.exists(out_tfname):
-	out_tfname = out_bfname + "_" + str(index) + ".ftj"
-	index += 1
-
-    out_mfname = out_bfname + ".fm"
-    index = 1
-    while os.path.exists(out_tfname):
-	out_tfname = out_bfname + "_" + str(index) + ".ftj"
-	index += 1
-
-    out_sfname = out_bfname + ".ffea"
-    index = 1
-    while os.path.exists(out_tfname):
-	out_tfname = out_bfname + "_" + str(index) + ".ftj"
-	index += 1
-
-    out_traj.write_to_file(out_tfname)
-    out_meas.write_to_file(out_mfname)
-
-    out_script.params.measurement_out_fname = out_mfname
-    out_script.params.trajectory_out_fname = out_tfname
-    out_script.write_to_file(out_sfname, verbose=True)
+    out_sfname, out_tfname, out_mfname = thin_system_to_files(args.script_fname, args.out_fname, args.frames_to_read, args.thin_percent)
 
     print("\nSystem successfully thinned out!\n\tScript - %s\n\tTrajectory - %s\n\tMeasurement - %s/.fdm\n" % (out_sfname, out_tfname, out_mfname))
@@ -0,0 +1,39 @@
+# 
+#  This file is part of the FFEA simulation package
+#  
+#  Copyright (c) by the Theory and Development FFEA teams,
+#  as they appear in the README.md file. 
+# 
+#  FFEA is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+# 
+#  FFEA is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+# 
+#  You should have received a copy of the GNU General Public License
+#  along with FFEA.  If not, see <http://www.gnu.org/licenses/>.
+# 
+#  To help us fund FFEA development, we humbly ask that you cite 
+#  the research papers on the package.
+#
+
+import sys, os
+import FFEA_binary_trajectory
+import argparse as _argparse
+import __builtin__
+
+parser = _argparse.ArgumentParser(description="Convert an FFEA trajectory (.ftj) to the binary trajectory format (.ftb). Running it again on the same .ftj only appends the new frames.")
+parser.add_argument("traj_fname", action="store", help="Input trajectory file (.ftj)")
+parser.add_argument("out_fname", action="store", nargs="?", default=None, help="Output binary trajectory file (.ftb). Defaults to the input name with a .ftb extension")
+parser.add_argument("-s", "--single", action="store_true", help="Store positions in single precision (float32)")
+
+if sys.stdin.isatty() and hasattr(__builtin__, 'FFEA_API_mode') == False:
+    args = parser.parse_args()
+    if not os.path.exists(args.traj_fname):
+        raise IOError("Trajectory file specified doesnae exist.")
+    dtype = "float32" if args.single else "float64"
+    FFEA_binary_trajectory.convert_ftj_to_binary(args.traj_fname, args.out_fname, dtype = dtype)
@@ -33,8 +33,8 @@ if len(sys.argv) != 4:
 trajfname = sys.argv[1]
 node_index = [int(sys.argv[2]), int(sys.argv[3])]
 
-# Open trajectory
-traj = FFEA_trajectory.FFEA_trajectory(trajfname)
+# Open trajectory (header only; frames are streamed)
+traj = FFEA_trajectory.FFEA_trajectory(trajfname, load_all = 0)
 
 # Get some node position arrays
 xsep = []
@@ -42,15 +42,19 @@ ysep = []
 zsep = []
 abssep = []
 
-step = range(traj.num_frames)
+for frames in traj.iter_frames(blobs = [0], onlyNodes = True, reuse = True):
+	f = frames[0][0]
+	if f == None:
+		continue
 
-for f in traj.blob[0][0].frame:
 	r = f.pos[node_index[1]] - f.pos[node_index[0]]
 	xsep.append(r[0])
 	ysep.append(r[1])
 	zsep.append(r[2])
 	
 	abssep.append(np.linalg.norm(r))
+
+step = range(len(abssep))
 	
 # Convert to numpy
 xsep = np.array(xsep)
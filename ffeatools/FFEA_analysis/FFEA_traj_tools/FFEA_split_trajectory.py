@@ -50,33 +50,35 @@ def FFEA_split_trajectory(infile, outfile, start, end):
 		print("Error: start value greater than end value. Please reenter.")
 		raise ValueError
 
-	# Read only the amount of trajectory that we were asked for
-	try:
-		traj = FFEA_trajectory.FFEA_trajectory(infile, num_frames_to_read = end - start, start = start)
-	except:
-		raise
+	# Only find where the frames are, to check the range
+	index = FFEA_trajectory.FFEA_traj_index(infile)
+	num_frames = max(min(end, index.num_frames) - start, 0)
 
-	if end - start != traj.num_frames:
+	if end - start != num_frames:
 		if sys.version_info[0] < 3:
 			inputter = raw_input
 		else:
 			inputter = input
 
-		ans = inputter("Number of frames within trajectory, %d, less than specified range, %d - %d. Is this ok (y/n)?: " % (traj.num_frames, start, end))
+		ans = inputter("Number of frames within trajectory, %d, less than specified range, %d - %d. Is this ok (y/n)?: " % (num_frames, start, end))
 	
 		try:
 			if str(ans).lower() == "n":
 				print("Will not return a new trajectory file. Please choose a new range next time :)")
+				return
 			else:
 				raise ValueError
-		except:
+		except ValueError:
 			print("Assuming 'y' was entered. Get ready for a new trajectory file!")
-			end = start + traj.num_frames
+			end = start + num_frames
 
 	if outfile == None:
 		outfile = base + "_extracted" + str(start) + "-" + str(end) + ".ftj"
 
-	traj.write_to_file(outfile)
+	# Frames are copied as they are, with the conformation changes of the last one pointing at no frame
+	num_frames = FFEA_trajectory.rewrite_trajectory(infile, outfile, start, end)
+
+	print("Written %d frame/s to '%s'." % (num_frames, outfile))
 
 if sys.stdin.isatty() and hasattr(__builtin__, 'FFEA_API_mode') == False:
 	try:
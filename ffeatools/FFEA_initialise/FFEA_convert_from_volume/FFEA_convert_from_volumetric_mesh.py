@@ -120,10 +120,6 @@ def convert_from_volumetric_mesh(mesh, stokes_radius=None, cull=[False, 0.0], de
     if surf.get_element_indices(top) == -1:
         surf = top.extract_surface()
 
-    # Now, build necessary things that only have linear properties
-    mat = FFEA_material.FFEA_material()
-    mat.build(top.num_elements, d=density, sv=shear_visc, bv=bulk_visc, sm=shear_mod, bm=bulk_mod, di=dielectric)
-    
     # Convert stuff to 2nd order
     top.increase_order(node=node, surf=surf)
     
@@ -138,6 +134,10 @@ def convert_from_volumetric_mesh(mesh, stokes_radius=None, cull=[False, 0.0], de
     if cull:
         top.cull_interior(cull, node, surf=surf)
     
+    # Now, build necessary things that only have linear properties (after culling, so there is one per element)
+    mat = FFEA_material.FFEA_material()
+    mat.build(top.num_elements, d=density, sv=shear_visc, bv=bulk_visc, sm=shear_mod, bm=bulk_mod, di=dielectric)
+    
     # Everything should be set! Make default files for the other stuff
     pin = FFEA_pin.FFEA_pin()
     vdw = FFEA_vdw.FFEA_vdw()
@@ -139,26 +139,9 @@ if ext == ".pdb":
 #				outpdb.chain[i].frame[findex].pos = f[start:end] * 1e10
 
 
-	for i in range(num_blobs):
-		bnodes = output_nodes[i]
-		startchain = i * (outpdb.num_chains / num_blobs)
-		endchain = (i + 1) * (outpdb.num_chains / num_blobs)
-
-		findex = 0
-		for f in bnodes:
-			endatom = 0
-			for j in range(startchain, endchain):
-				startatom = endatom
-				endatom = startatom + outpdb.num_atoms[j]
-				outpdb.chain[j].add_empty_frame()
-				outpdb.chain[j].frame[findex].pos = f[startatom:endatom] * 1e10
-			findex += 1
-
-	#for i in range(outpdb.num_chains):
-#		for bnodes in output_nodes:
-			
-	outpdb.num_frames = outpdb.chain[i].num_frames
-	outpdb.write_to_file(outtraj)
+	# Every frame is the mapped nodes of each blob in turn, straight to file
+	num_frames = len(output_nodes[0])
+	outpdb.write_to_file(outtraj, positions = (np.concatenate([bnodes[findex] for bnodes in output_nodes]) * 1e10 for findex in range(num_frames)))
 
 	# Now simply change the positions using the new mapped ones
 	#bindex = -1
@@ -74,7 +74,7 @@ def cull_small_interior_elements(input_file, smallest_length, load_file=False):
     
         #if top.element[i].interior == None:
         
-        # Let's assume that we don't know, so calculate from surface (fast) or from topology (slow)
+        # Let's assume that we don't know, so calculate from surface or from topology
         calc_from_topology = False
         if surf != None:
     
@@ -86,10 +86,8 @@ def cull_small_interior_elements(input_file, smallest_length, load_file=False):
     
         if calc_from_topology:
     
-            # Slow. Calculate from topology
+            # Calculate from topology (uses the face adjacency of the elements, built once)
             for j in range(top.num_elements):
-                sys.stdout.write("\rTesting whether element %d of %d is interior (First element loop will be slow, sorry :()" % (j, top.num_elements))
-                sys.stdout.flush()
                 top.isElementInterior(j)
         else:
             # Fast. Read from surface
@@ -46,6 +46,7 @@ ffea_tools = 	{
 		"makekineticmaps": "FFEA_initialise/FFEA_mapping_tools/FFEA_generate_kinetic_maps.py",
 		"split": "FFEA_analysis/FFEA_traj_tools/FFEA_split_trajectory.py",
 		"thin": "FFEA_analysis/FFEA_thin_system.py",
+      "trajtobinary": "FFEA_analysis/FFEA_traj_tools/FFEA_convert_traj_to_binary.py",
       "nodesFromTraj": "FFEA_analysis/FFEA_traj_tools/FFEA_get_snapshots_in_nodes.py",
       "tettonet": "FFEA_initialise/FFEA_volume_tools/convert_tet_to_net.py",
       "makestructuremap": "FFEA_initialise/FFEA_mapping_tools/make_structure_map",
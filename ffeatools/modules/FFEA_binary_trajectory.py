@@ -0,0 +1,348 @@
+#
+#  This file is part of the FFEA simulation package
+#
+#  Copyright (c) by the Theory and Development FFEA teams,
+#  as they appear in the README.md file.
+#
+#  FFEA is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  FFEA is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with FFEA.  If not, see <http://www.gnu.org/licenses/>.
+#
+#  To help us fund FFEA development, we humbly ask that you cite
+#  the research papers on the package.
+#
+
+import os, sys
+from os import path
+import numpy as np
+import FFEA_trajectory
+
+# Motion states are stored as one byte per blob per frame
+motion_state_code = {"DYNAMIC": 0, "STATIC": 1, "FROZEN": 2}
+motion_state_name = ["DYNAMIC", "STATIC", "FROZEN"]
+
+class FFEA_binary_trajectory:
+	"""
+	Columnar binary container for FFEA trajectories (.ftb).
+	The container is a small text header, '<fname>', plus raw little-endian
+	data files sitting next to it:
+		<fname>.frames	one record per frame: step, active conformation and
+				motion state of every blob
+		<fname>.bXcY	node positions of blob X, conformation Y, stored as
+				one contiguous (frames, num_nodes, 3) array holding only
+				the frames in which that conformation was active and
+				not STATIC
+	Every data file only ever grows at the end, so frames can be appended
+	while the source .ftj is still being written, and every array can be
+	mapped straight into memory with np.memmap. Velocities are not stored.
+	"""
+
+	def __init__(self, fname = "", mode = "r"):
+
+		self.reset()
+
+		# Return empty object if fname not initialised
+		if fname == "" or fname == None:
+			self.valid = True
+			return
+
+		self.load_header(fname)
+		if mode == "a":
+			self.open_for_append()
+
+	def create(self, fname, num_blobs, num_conformations, num_nodes, dtype = np.float64, source = "", source_offset = 0):
+
+		self.reset()
+		self.fname = fname
+		self.dtype = np.dtype(dtype).newbyteorder("<")
+		self.num_blobs = num_blobs
+		self.num_conformations = list(num_conformations)
+		self.num_nodes = [list(n) for n in num_nodes]
+		self.source = source
+		self.source_offset = source_offset
+		self.build_frame_dtype()
+
+		# Start from empty data files
+		for fn in self.get_data_fnames():
+			open(fn, "wb").close()
+
+		self.write_header()
+		self.open_for_append()
+		self.valid = True
+		self.empty = False
+
+	def load_header(self, fname):
+
+		if not path.exists(fname):
+			raise IOError("No binary trajectory found at '" + fname + "'")
+
+		self.reset()
+		self.fname = fname
+		with open(fname, "r") as fin:
+			line = fin.readline().strip()
+			if line != "FFEA_binary_trajectory_file":
+				raise IOError("\tExpected to read 'FFEA_binary_trajectory_file' but read '" + line + "'. This may not be an FFEA binary trajectory file.")
+
+			try:
+				for line in fin:
+					sline = line.split()
+					if sline == []:
+						continue
+					key = sline[0]
+					if key == "version":
+						self.version = int(sline[1])
+					elif key == "dtype":
+						self.dtype = np.dtype(sline[1])
+					elif key == "num_blobs":
+						self.num_blobs = int(sline[1])
+						self.num_nodes = [[] for i in range(self.num_blobs)]
+					elif key == "num_conformations":
+						self.num_conformations = [int(s) for s in sline[1:]]
+					elif key == "num_nodes":
+						self.num_nodes[int(sline[1])] = [int(s) for s in sline[2:]]
+					elif key == "num_frames":
+						self.num_frames = int(sline[1])
+					elif key == "source":
+						self.source = line.strip()[len("source"):].strip()
+					elif key == "source_offset":
+						self.source_offset = int(sline[1])
+
+			except(IndexError, ValueError):
+				raise IOError("\tUnable to parse line '" + line.strip() + "' of binary trajectory header '" + fname + "'.")
+
+		self.build_frame_dtype()
+		self.valid = True
+		self.empty = False
+
+	def write_header(self):
+
+		# Write to a temporary file and rename so readers never see half a header
+		tmpfname = self.fname + ".tmp"
+		fout = open(tmpfname, "w")
+		fout.write("FFEA_binary_trajectory_file\n")
+		fout.write("version %d\n" % (self.version))
+		fout.write("dtype %s\n" % (self.dtype.str))
+		fout.write("num_blobs %d\n" % (self.num_blobs))
+		fout.write("num_conformations %s\n" % (" ".join([str(c) for c in self.num_conformations])))
+		for i in range(self.num_blobs):
+			fout.write("num_nodes %d %s\n" % (i, " ".join([str(n) for n in self.num_nodes[i]])))
+		fout.write("num_frames %d\n" % (self.num_frames))
+		fout.write("source %s\n" % (self.source))
+		fout.write("source_offset %d\n" % (self.source_offset))
+		fout.close()
+		os.rename(tmpfname, self.fname)
+
+	def build_frame_dtype(self):
+		self.frame_dtype = np.dtype([("step", "<i8"), ("conformation", "<i4", (self.num_blobs,)), ("motion_state", "u1", (self.num_blobs,))])
+
+	def get_data_fname(self, bindex, cindex):
+		return "%s.b%dc%d" % (self.fname, bindex, cindex)
+
+	def get_data_fnames(self):
+		fnames = [self.fname + ".frames"]
+		for i in range(self.num_blobs):
+			for j in range(self.num_conformations[i]):
+				fnames.append(self.get_data_fname(i, j))
+		return fnames
+
+	def open_for_append(self):
+		"""
+		Open all data files for appending. Anything past the last frame
+		recorded in the header (left behind by an interrupted conversion)
+		is discarded first.
+		"""
+		nrows = self.get_num_rows()
+
+		self.frame_out = open(self.fname + ".frames", "r+b")
+		self.frame_out.truncate(self.num_frames * self.frame_dtype.itemsize)
+		self.frame_out.seek(0, 2)
+
+		self.data_out = []
+		for i in range(self.num_blobs):
+			self.data_out.append([])
+			for j in range(self.num_conformations[i]):
+				fout = open(self.get_data_fname(i, j), "r+b")
+				fout.truncate(nrows[i][j] * self.num_nodes[i][j] * 3 * self.dtype.itemsize)
+				fout.seek(0, 2)
+				self.data_out[i].append(fout)
+
+	def append_frame(self, step, conformation, motion_state, pos):
+		"""
+		Append a single frame.
+		In: the step, and one conformation index, motion state name and
+		(num_nodes, 3) position array (None if STATIC) per blob.
+		"""
+		record = np.zeros(1, dtype=self.frame_dtype)
+		record["step"] = step
+		record["conformation"][0] = conformation
+		record["motion_state"][0] = [motion_state_code[s] for s in motion_state]
+		record.tofile(self.frame_out)
+
+		for i in range(self.num_blobs):
+			if pos[i] is None:
+				continue
+			np.ascontiguousarray(pos[i], dtype=self.dtype).tofile(self.data_out[i][conformation[i]])
+
+		self.num_frames += 1
+
+	def flush(self):
+		"""
+		Make everything appended so far visible to readers.
+		"""
+		self.frame_out.flush()
+		for b in self.data_out:
+			for fout in b:
+				fout.flush()
+		self.write_header()
+
+	def close(self):
+		if self.frame_out != None:
+			self.flush()
+			self.frame_out.close()
+			for b in self.data_out:
+				for fout in b:
+					fout.close()
+		self.frame_out = None
+		self.data_out = []
+
+	def get_frames(self):
+		"""
+		Returns the per-frame record array (step, conformation, motion_state).
+		"""
+		if self.num_frames == 0:
+			return np.zeros(0, dtype=self.frame_dtype)
+		return np.memmap(self.fname + ".frames", dtype=self.frame_dtype, mode="r", shape=(self.num_frames,))
+
+	def get_num_rows(self, frames = None):
+		"""
+		Number of stored position blocks in each blob/conformation array.
+		"""
+		if frames is None:
+			frames = self.get_frames()
+
+		nrows = []
+		for i in range(self.num_blobs):
+			stored = frames["motion_state"][:,i] != motion_state_code["STATIC"]
+			nrows.append([int(np.count_nonzero(stored & (frames["conformation"][:,i] == j))) for j in range(self.num_conformations[i])])
+		return nrows
+
+	def get_row_index(self, bindex, cindex, frames = None):
+		"""
+		Map every frame to its row in the blob/conformation position array.
+		Frames where that conformation holds no data get -1.
+		"""
+		if frames is None:
+			frames = self.get_frames()
+
+		stored = (frames["conformation"][:,bindex] == cindex) & (frames["motion_state"][:,bindex] != motion_state_code["STATIC"])
+		rows = np.cumsum(stored) - 1
+		rows[~stored] = -1
+		return rows
+
+	def get_positions(self, bindex, cindex, nrows = None):
+		"""
+		Returns a read-only memory map of the (rows, num_nodes, 3) position array.
+		"""
+		if nrows is None:
+			nrows = self.get_num_rows()[bindex][cindex]
+
+		shape = (nrows, self.num_nodes[bindex][cindex], 3)
+		if nrows == 0 or shape[1] == 0:
+			return np.zeros(shape, dtype=self.dtype)
+		return np.memmap(self.get_data_fname(bindex, cindex), dtype=self.dtype, mode="r", shape=shape)
+
+	def reset(self):
+
+		self.valid = False
+		self.empty = True
+		self.fname = ""
+		self.version = 1
+		self.dtype = np.dtype("<f8")
+		self.num_blobs = 0
+		self.num_conformations = []
+		self.num_nodes = []
+		self.num_frames = 0
+		self.source = ""
+		self.source_offset = 0
+		self.frame_dtype = None
+		self.frame_out = None
+		self.data_out = []
+
+# External functions
+def convert_ftj_to_binary(ftj_fname, bin_fname = None, dtype = np.float64, flush_rate = 100):
+	"""
+	Convert an FFEA trajectory (.ftj) into the binary trajectory format (.ftb).
+	If the binary file already exists and was made from the same .ftj, only
+	frames appended to the .ftj since the last conversion are added, so this
+	can be called repeatedly on a trajectory that is still being written.
+	Half-written frames are left for the next call.
+	In: ftj_fname, bin_fname (defaults to the .ftj name with a .ftb extension),
+	dtype (np.float64 or np.float32), flush_rate (frames between header updates)
+	Out: the number of frames added.
+	"""
+	if bin_fname == None:
+		bin_fname = path.splitext(ftj_fname)[0] + ".ftb"
+
+	if not path.exists(ftj_fname):
+		raise IOError("No trajectory found at '" + ftj_fname + "'")
+
+	# Header of the source
+	traj = FFEA_trajectory.FFEA_trajectory()
+	traj.load_header(ftj_fname)
+
+	# Carry on from where we left off, if we can
+	btraj = None
+	source = path.abspath(ftj_fname)
+	if path.exists(bin_fname):
+		btraj = FFEA_binary_trajectory(bin_fname)
+		if btraj.source != source or btraj.num_nodes != traj.num_nodes or btraj.source_offset > path.getsize(ftj_fname):
+			btraj = None
+		else:
+			btraj.open_for_append()
+			traj.traj.seek(btraj.source_offset)
+			traj.fpos = btraj.source_offset
+
+	if btraj == None:
+		btraj = FFEA_binary_trajectory()
+		btraj.create(bin_fname, traj.num_blobs, traj.num_conformations, traj.num_nodes, dtype = dtype, source = source, source_offset = traj.fpos)
+
+	sys.stdout.write("Converting '%s' to binary trajectory '%s'...\n" % (ftj_fname, bin_fname))
+	num_added = 0
+	while True:
+		bframes = traj.read_frame(traj.traj)
+		if bframes == None:
+			break
+
+		step = 0
+		pos = []
+		for cindex, motion_state, frame in bframes:
+			if frame == None:
+				pos.append(None)
+			else:
+				pos.append(frame.pos)
+				step = frame.step
+
+		conformation = [bf[0] for bf in bframes]
+		motion_state = [bf[1] for bf in bframes]
+		btraj.append_frame(step, conformation, motion_state, pos)
+		btraj.source_offset = traj.traj.tell()
+		num_added += 1
+
+		if num_added % flush_rate == 0:
+			btraj.flush()
+			sys.stdout.write("\r\tFrames converted = %d" % (num_added))
+			sys.stdout.flush()
+
+	btraj.close()
+	traj.traj.close()
+	sys.stdout.write("\ndone! Added %d frame/s, %d in total.\n" % (num_added, btraj.num_frames))
+	return num_added
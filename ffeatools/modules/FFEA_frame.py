@@ -24,6 +24,9 @@
 import numpy as np
 import FFEA_node
 
+# One node line of a trajectory frame. Only the positions vary
+traj_node_line = "%10.6e %10.6e %10.6e" + " %10.6e" % (0) * 7 + "\n"
+
 class FFEA_frame(FFEA_node.FFEA_node):
 
 	# Load with file object already open
@@ -62,70 +65,112 @@ class FFEA_frame(FFEA_node.FFEA_node):
 		
 		return 0
 		
-	# Load only positions, knowing the number of nodes, 
-   #      from file object already open
-	def load_from_traj_faster(self, fo):
+	# Load positions and velocities, knowing the number of nodes,
+	#      from file object already open
+	# With reuse, the nodes are decoded into the arrays this frame already has
+	def load_from_traj_faster(self, fo, reuse = False):
 
 		if self.num_nodes == 0:
 			self.load_from_traj(fo)
 			return 0
-		
-		start = fo.tell()
-		
-		self.pos = np.empty([self.num_nodes, 3])
-		self.vel = np.empty([self.num_nodes, 3])
-		cnt = 0 
-		while(True):
-			prev = fo.tell()
-			line = fo.readline().split()
-			try:
-				for i in range(3):
-					self.pos[cnt,i] = float(line[i])
-					self.vel[cnt,i] = float(line[i+3])
-				cnt += 1
-			except(IndexError):
-			
-				# EOF
-				fo.seek(start)
-				return 1
 
-			except(ValueError):
-				if line[0] == "*" or line[0] == "Blob":
-				
-					# Ready for next frame
-					fo.seek(prev)
-					break
-				else:
-					# Halfway through a written frame
-					fo.seek(start)
-					return 1
-					
+		block = self.read_node_block(fo, 6)
+		if block is None:
+			return 1
+
+		if reuse and self.has_node_arrays(vel = True):
+			self.pos[:] = block[:,0:3]
+			self.vel[:] = block[:,3:6]
+		else:
+			self.pos = np.ascontiguousarray(block[:,0:3])
+			self.vel = np.ascontiguousarray(block[:,3:6])
 		self.num_surface_nodes = self.num_nodes
 		return 0
 		
 	# Load only positions, knowing the number of nodes, 
    #      from file object already open
-	def load_from_traj_onlynodes_faster(self, fo):
+	def load_from_traj_onlynodes_faster(self, fo, reuse = False):
 
 		if self.num_nodes == 0:
 			self.load_from_traj(fo)
 			return 0
-		
-		start = fo.tell()
-		
-		self.pos = np.empty([self.num_nodes, 3])
-		cnt = 0 
-		try:
-		   #read fixed sized lines
-		   # text = fo.read(line_length*self.num_nodes).split("\n")
-		   for ln in range(self.num_nodes):
-		      self.pos[ln] = np.fromstring(fo.readline(), dtype=float, sep=" ", count=3)
-		except:
-		   fo.seek(start)
-		   return 1
 
+		block = self.read_node_block(fo, 3)
+		if block is None:
+			return 1
+
+		if reuse and self.has_node_arrays():
+			self.pos[:] = block
+		else:
+			self.pos = np.ascontiguousarray(block[:,0:3])
 		self.num_surface_nodes = self.num_nodes
 		return 0
+
+	def has_node_arrays(self, vel = False):
+
+		# Whether pos (and vel) are already arrays of the right size to be overwritten
+		shape = (self.num_nodes, 3)
+		if not isinstance(self.pos, np.ndarray) or self.pos.shape != shape:
+			return False
+		return not vel or (isinstance(self.vel, np.ndarray) and self.vel.shape == shape)
+
+	def read_node_block(self, fo, num_columns):
+		"""
+		Read the num_nodes lines of a frame in one go, and decode the first
+		num_columns columns of them with a single numpy call.
+		In: fo, positioned at the first node line, and num_columns.
+		Out: a (num_nodes, num_columns) array, or None if the frame is not
+		completely written yet, in which case fo is returned to where it started.
+		"""
+		start = fo.tell()
+
+		# Lines are ~130 characters, so this is usually a single read
+		text = fo.read(140 * self.num_nodes)
+		newline = np.flatnonzero(np.frombuffer(text, dtype=np.uint8) == 10)
+		while len(newline) < self.num_nodes:
+			more = fo.read(1 << 16)
+
+			# EOF, or halfway through a written frame
+			if more == "":
+				fo.seek(start)
+				return None
+
+			newline = np.append(newline, len(text) + np.flatnonzero(np.frombuffer(more, dtype=np.uint8) == 10))
+			text += more
+
+		# Leave fo at the start of the next line
+		end = newline[self.num_nodes - 1] + 1
+		fo.seek(start + end)
+		text = text[:end]
+		newline = newline[:self.num_nodes]
+
+		# Fewer nodes than expected. Let the line by line reader sort it out
+		if "*" in text or "B" in text:
+			fo.seek(start)
+			if self.load_from_traj(fo) == 1:
+				return None
+			self.num_nodes = len(self.pos)
+			return np.hstack([self.pos, self.vel])[:,:num_columns]
+
+		# Nodes are written with a single space between columns, so unwanted
+		# columns can be dropped before they are converted. Gathering the
+		# bytes isn't free, so only bother when most columns are unwanted
+		raw = np.frombuffer(text, dtype=np.uint8)
+		space = np.flatnonzero(raw == 32)
+		if space.size % self.num_nodes == 0 and space.size / self.num_nodes >= 3 * num_columns:
+			linestart = np.empty(self.num_nodes, dtype=np.int64)
+			linestart[0] = 0
+			linestart[1:] = newline[:-1] + 1
+			length = space.reshape(self.num_nodes, -1)[:,num_columns - 1] + 1 - linestart
+			cumlength = np.cumsum(length)
+			text = raw[np.arange(cumlength[-1]) + np.repeat(linestart - cumlength + length, length)].tostring()
+
+		block = np.fromstring(text, dtype=float, sep=" ")
+		if block.size % self.num_nodes != 0 or block.size < num_columns * self.num_nodes:
+			fo.seek(start)
+			return None
+
+		return block.reshape(self.num_nodes, -1)[:,:num_columns]
 		
 	def build_from_node(self, node):
 	
@@ -135,9 +180,15 @@ class FFEA_frame(FFEA_node.FFEA_node):
 		self.pos = node.pos
 		
 	def write_to_traj(self, fo):
+		fo.write(self.get_traj_string())
 
-		for p in self.pos:
-			fo.write("%10.6e %10.6e %10.6e %10.6e %10.6e %10.6e %10.6e %10.6e %10.6e %10.6e\n" % (p[0], p[1], p[2], 0, 0, 0, 0, 0, 0, 0))
+	def get_traj_string(self):
+		"""
+		The node block of this frame as written to a trajectory, formatted
+		in one go. Velocities and forces are written as zeros.
+		"""
+		pos = np.asarray(self.get_pos(), dtype=np.float64).ravel()
+		return (traj_node_line * (len(pos) / 3)) % tuple(pos.tolist())
 
 	# Function to calculate normals at each node, average of connecting faces
 	def calc_normals(self, surf):
@@ -154,6 +205,69 @@ class FFEA_frame(FFEA_node.FFEA_node):
 	def set_step(self, step):
 		self.step = step
 
+	def get_view(self, scale = 1.0):
+		"""
+		A new frame sharing this frame's position array, whose positions are
+		these ones multiplied by scale. Nothing is copied or scaled while
+		the positions are only read through get_pos. Using pos directly, or
+		changing the view in place, gives it its own scaled copy first
+		(unshare_pos). This frame is never touched.
+		"""
+		view = FFEA_frame()
+		view.num_nodes = self.num_nodes
+		view.num_surface_nodes = self.num_surface_nodes
+		view.num_interior_nodes = self.num_interior_nodes
+		view.step = self.step
+		view._pos = self._pos
+		view.pos_scale = self.pos_scale * scale
+		view.pos_shared = True
+		return view
+
+	# Anything using pos directly gets the positions in the right units,
+	# and its own copy of them if this frame is a view
+	@property
+	def pos(self):
+		self.unshare_pos()
+		return self._pos
+
+	@pos.setter
+	def pos(self, pos):
+		self._pos = pos
+		self.pos_scale = 1.0
+		self.pos_shared = False
+
+	def get_pos(self):
+		"""
+		The positions of this frame, with any pending scale applied, without
+		copying them if there is none.
+		"""
+		if self.pos_scale == 1.0:
+			return self._pos
+		return np.asarray(self._pos) * self.pos_scale
+
+	def unshare_pos(self):
+		"""
+		Give this frame its own, scaled, copy of the positions if it is a
+		view of another frame's.
+		"""
+		if self.pos_shared or self.pos_scale != 1.0:
+			self._pos = np.array(self._pos, dtype=np.float64) * self.pos_scale
+			self.pos_scale = 1.0
+			self.pos_shared = False
+
+	# In place changes must not reach the frame we are a view of
+	def translate(self, trans):
+		self.unshare_pos()
+		FFEA_node.FFEA_node.translate(self, trans)
+
+	def rescale(self, factor):
+		self.unshare_pos()
+		FFEA_node.FFEA_node.rescale(self, factor)
+
+	def rotate(self, rot):
+		self.unshare_pos()
+		FFEA_node.FFEA_node.rotate(self, rot)
+
 		
 	def reset(self):
 		self.num_nodes = 0
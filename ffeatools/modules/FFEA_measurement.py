@@ -21,8 +21,12 @@
 #  the research papers on the package.
 #
 
-import sys
+import os, sys, time
 from os import path
+try:
+	from itertools import izip
+except(ImportError):
+	izip = zip
 import numpy as np
 
 # MatPlotLib conflicts with PyMOL horribly:
@@ -38,7 +42,7 @@ else:
 
 class FFEA_measurement:
 
-	def __init__(self, fname = "", frame_rate = 1, num_frames_to_read = 1000000):
+	def __init__(self, fname = "", frame_rate = 1, num_frames_to_read = 1000000, columns = None, cache = True):
 
 		self.reset()
 
@@ -57,18 +61,32 @@ class FFEA_measurement:
 		line = fin.readline().strip()
 		fin.close()
 		try:
-			if line == "FFEA Global Measurement File":
-				self.load_global(fname, frame_rate = frame_rate, num_frames_to_read = num_frames_to_read)
-			else:		
+			if line != "FFEA Global Measurement File":
 				print("\tPlease supply us with the global measurement file, not the '-d' .fdm file")				
 				return
 
+			dfname = path.splitext(fname)[0] + ".fdm"
+
+			# The cache holds every row, so is thinned after loading
+			if cache and self.load_cache(fname, columns = columns):
+				pass
+
+			elif cache:
+				self.load_global(fname)
+				if path.exists(dfname):
+					self.load_detailed(dfname)
+				self.write_cache(fname)
+
+			else:
+				self.load_global(fname, frame_rate = frame_rate, num_frames_to_read = num_frames_to_read)
+				if path.exists(dfname):
+					self.load_detailed(dfname, frame_rate = frame_rate, num_frames_to_read = num_frames_to_read)
+				frame_rate = 1
+
+			self.select(frame_rate = frame_rate, num_frames_to_read = num_frames_to_read, columns = columns)
+
 			# Get num frames for quick access
 			self.num_frames = len(self.global_meas["Time"])
-
-			dfname = path.splitext(fname)[0] + ".fdm"
-			if path.exists(dfname):
-				self.load_detailed(dfname, frame_rate = frame_rate, num_frames_to_read = num_frames_to_read)
 			
 		except:
 			raise
@@ -77,6 +95,130 @@ class FFEA_measurement:
 		self.empty = False
 		sys.stdout.write("done!\n")
 
+	def get_cache_fname(self, fname):
+		return fname + ".cache"
+
+	def get_cache_stamp(self, fname):
+		"""
+		Size and modification time of the global and detailed files (-1 if
+		there is no detailed file), which the cache must have been made from.
+		"""
+		stamp = []
+		for fn in [fname, path.splitext(fname)[0] + ".fdm"]:
+			if path.exists(fn):
+				st = os.stat(fn)
+				stamp.extend([float(st.st_size), float(st.st_mtime)])
+			else:
+				stamp.extend([-1.0, -1.0])
+		return np.array(stamp)
+
+	def load_cache(self, fname, columns = None):
+		"""
+		Load the measurements from the binary cache next to fname, if it is
+		up to date. Each measurement is stored separately, so if columns is
+		given (a list of keys, e.g. ["Time", "RMSD"]) only those are read.
+		Time is always read. Returns whether the cache was used.
+		"""
+		cfname = self.get_cache_fname(fname)
+		if not path.exists(cfname):
+			return False
+
+		try:
+			cache = np.load(cfname)
+			if not np.array_equal(cache["stamp"], self.get_cache_stamp(fname)):
+				return False
+
+			print("Loading FFEA measurements from cache '" + cfname + "'...")
+			members = set(cache.files)
+			def load_dict(prefix):
+				meas = {}
+				for key in cache[prefix + "keys"]:
+					key = str(key)
+					if prefix + key in members and (columns == None or key == "Time" or key in columns):
+						meas[key] = cache[prefix + key]
+					else:
+						meas[key] = None
+				return meas
+
+			self.num_blobs = int(cache["num_blobs"])
+			self.detail_string = str(cache["detail_string"])
+			self.param_string = str(cache["param_string"])
+			self.global_fname = fname
+			self.global_measmap = [str(m) for m in cache["global_measmap"]]
+			self.global_fpos = int(cache["global_fpos"])
+			self.global_meas = load_dict("global/")
+
+			if bool(cache["detailed"]):
+				self.blob_meas = [load_dict("blob/%d/" % (i)) for i in range(self.num_blobs)]
+				self.interblob_meas = [[None for j in range(self.num_blobs)] for i in range(self.num_blobs)]
+				for i in range(self.num_blobs):
+					for j in range(i, self.num_blobs):
+						self.interblob_meas[i][j] = load_dict("interblob/%d/%d/" % (i, j))
+						self.interblob_meas[j][i] = self.interblob_meas[i][j]
+			cache.close()
+
+		except(IOError, ValueError, KeyError):
+			print("\tUnable to read measurement cache '" + cfname + "'. Loading the text files instead.")
+			self.reset()
+			return False
+
+		return True
+
+	def write_cache(self, fname):
+		"""
+		Store all loaded measurements next to fname (as '<fname>.cache', a
+		.npz archive with one array per measurement), so they can be
+		loaded again without parsing the text files.
+		"""
+		cache = {}
+		def store_dict(prefix, meas):
+			cache[prefix + "keys"] = np.array(sorted(meas.keys()))
+			for key in meas:
+				if meas[key] is not None:
+					cache[prefix + key] = np.asarray(meas[key])
+
+		cache["stamp"] = self.get_cache_stamp(fname)
+		cache["num_blobs"] = np.array(self.num_blobs)
+		cache["detail_string"] = np.array(self.detail_string)
+		cache["param_string"] = np.array(self.param_string)
+		cache["global_measmap"] = np.array(self.global_measmap)
+		cache["global_fpos"] = np.array(self.global_fpos)
+		cache["detailed"] = np.array(self.blob_meas != [])
+		store_dict("global/", self.global_meas)
+		for i in range(len(self.blob_meas)):
+			store_dict("blob/%d/" % (i), self.blob_meas[i])
+			for j in range(i, self.num_blobs):
+				store_dict("interblob/%d/%d/" % (i, j), self.interblob_meas[i][j])
+
+		# Write to a temporary file and rename so readers never see half a cache
+		cfname = self.get_cache_fname(fname)
+		try:
+			with open(cfname + ".tmp", "wb") as fout:
+				np.savez(fout, **cache)
+			os.rename(cfname + ".tmp", cfname)
+		except(IOError, OSError):
+			print("\tUnable to write measurement cache '" + cfname + "'. The text files will be parsed again next time.")
+
+	def select(self, frame_rate = 1, num_frames_to_read = 1000000, columns = None):
+		"""
+		Keep only every frame_rate'th of the first num_frames_to_read rows,
+		and only the measurements named in columns (all if None). Time is
+		always kept.
+		"""
+		self.columns = columns
+		meas = [self.global_meas] + self.blob_meas
+		for i in range(len(self.interblob_meas)):
+			meas.extend(self.interblob_meas[i][i:])
+
+		for m in meas:
+			for key in m:
+				if m[key] is None:
+					continue
+				if columns != None and key != "Time" and key not in columns:
+					m[key] = None
+				else:
+					m[key] = m[key][:num_frames_to_read][::frame_rate]
+
 	def load_global(self, fname, frame_rate = 1, num_frames_to_read = 1000000):
 
 		print("Loading FFEA Global Measurement file...")
@@ -118,42 +260,27 @@ class FFEA_measurement:
 
 		num_meas = len(measmap)
 
-		# Read measurements
-		line = fin.readline()
-		frames_read = 0
-		all_frames = 0
-		while(line != "" and all_frames < num_frames_to_read):
-			#print(all_frames, num_frames_to_read)
-			if line.strip() == "#==RESTART==":
-				line = fin.readline()
-				continue
-
-			if all_frames % frame_rate == 0:
-				sline = line.split()
-				for i in range(num_meas):
-					self.global_meas[measmap[i]].append(float(sline[i]))
-				frames_read += 1
-
-			line = fin.readline()
-			all_frames += 1
+		# Read measurements in one go
+		data, self.global_fpos = read_measurement_rows(fin, num_meas, num_frames_to_read)
+		fin.close()
+		data = data[::frame_rate]
+		frames_read = len(data)
+		print("done! Successfully read " + str(frames_read) + " frame/s from '" + fname + "'.")
 
-			sys.stdout.write("\rFrames read = %d, Frames skipped = %d" % (frames_read, all_frames - frames_read))
-			sys.stdout.flush()
+		# Where to carry on from when following the file
+		self.global_fname = fname
+		self.global_measmap = measmap
 
-		print("\ndone! Successfully read " + str(frames_read) + " frame/s from '" + fname + "'.")
+		for i in range(num_meas):
+			self.global_meas[measmap[i]] = data[:,i]
 
 		# Move centroid into more useful format
-		self.global_meas["Centroid"] = []
-		for i in range(len(self.global_meas['Time'])):
-			self.global_meas["Centroid"].append([self.global_meas["Centroid.x"][i], self.global_meas["Centroid.y"][i], self.global_meas["Centroid.z"][i]])
+		if "Centroid.x" in measmap:
+			self.global_meas["Centroid"] = np.column_stack([self.global_meas["Centroid.x"], self.global_meas["Centroid.y"], self.global_meas["Centroid.z"]])
 
-		del self.global_meas["Centroid.x"]
-		del self.global_meas["Centroid.y"]
-		del self.global_meas["Centroid.z"]
-	
-		for key in self.global_meas:
-			if self.global_meas[key] != None:
-				self.global_meas[key] = np.array(self.global_meas[key])
+			del self.global_meas["Centroid.x"]
+			del self.global_meas["Centroid.y"]
+			del self.global_meas["Centroid.z"]
 
 	def load_detailed(self, fname, frame_rate = 1, num_frames_to_read = 1000000):
 
@@ -209,60 +336,117 @@ class FFEA_measurement:
 				imeasmap.append(title.strip())
 				self.interblob_meas[indexpair[0]][indexpair[1]][title.strip()] = []
 
-		# Now, read measurements and fill the relevent arrays
-		line = fin.readline()
-		frames_read = 0
-		all_frames = 0
-		while(line != "" and all_frames < num_frames_to_read):
-			if line.strip() == "#==RESTART==":
-				line = fin.readline()
-				continue
-
-			if all_frames % frame_rate == 0:
-
-				sline = line.split()[1:]
-
-				localsline = sline[:len(indexmap)]
-				globalsline = sline[len(indexmap):]
-
-				# Local to blobs first!
-				for i in range(len(localsline)):
-					self.blob_meas[indexmap[i]][measmap[i]].append(float(localsline[i]))
-
-				# Now global
-				for i in range(len(globalsline)):
-					self.interblob_meas[iindexmap[i][0]][iindexmap[i][1]][imeasmap[i]].append(float(globalsline[i]))
-				frames_read += 1
-
-			line = fin.readline()
-			all_frames += 1
+		# Now, read measurements in one go and fill the relevent arrays. Time comes first
+		data, fpos = read_measurement_rows(fin, 1 + len(indexmap) + len(iindexmap), num_frames_to_read)
+		fin.close()
+		data = data[::frame_rate]
+		frames_read = len(data)
+		print("done! Successfully read " + str(frames_read) + " frame/s from '" + fname + "'.")
 
-			sys.stdout.write("\rFrames read = %d, Frames skipped = %d" % (frames_read, all_frames - frames_read))
-			sys.stdout.flush()
+		# Local to blobs first!
+		for i in range(len(indexmap)):
+			self.blob_meas[indexmap[i]][measmap[i]] = data[:,1 + i]
 
-		print("\ndone! Successfully read " + str(frames_read) + " frame/s from '" + fname + "'.")
+		# Now global
+		for i in range(len(iindexmap)):
+			self.interblob_meas[iindexmap[i][0]][iindexmap[i][1]][imeasmap[i]] = data[:,1 + len(indexmap) + i]
 
-		# Move centroid into more useful format, make interblob array symmetric and turn stuff to numpy
+		# Move centroid into more useful format and make interblob array symmetric
 		for i in range(self.num_blobs):
-			self.blob_meas[i]["Centroid"] = []
-
-			for j in range(len(self.global_meas['Time'])):
-				self.blob_meas[i]["Centroid"].append([self.blob_meas[i]["Centroid.x"][j], self.blob_meas[i]["Centroid.y"][j], self.blob_meas[i]["Centroid.z"][j]])
+			if "Centroid.x" in self.blob_meas[i] and self.blob_meas[i]["Centroid.x"] is not None:
+				self.blob_meas[i]["Centroid"] = np.column_stack([self.blob_meas[i]["Centroid.x"], self.blob_meas[i]["Centroid.y"], self.blob_meas[i]["Centroid.z"]])
 
 			del self.blob_meas[i]["Centroid.x"]
 			del self.blob_meas[i]["Centroid.y"]
 			del self.blob_meas[i]["Centroid.z"]
 
-			for key in self.blob_meas[i]:
-				if self.blob_meas[i][key] != None:
-					self.blob_meas[i][key] = np.array(self.blob_meas[i][key])
-
 			for j in range(i, self.num_blobs):
-				for key in self.interblob_meas[i][j]:
-					if self.interblob_meas[i][j][key] != None:
-						self.interblob_meas[i][j][key] = np.array(self.interblob_meas[i][j][key])
 				self.interblob_meas[j][i] = self.interblob_meas[i][j]
 
+	def follow(self, fname = None, poll_interval = 1.0, timeout = None, callbacks = [], store = True):
+		"""
+		Generator over the global measurements appended to a .fm file that
+		is still being written, e.g. by a running simulation. Carries on
+		from the last row loaded, or waits for the header if nothing was
+		loaded yet (then fname is needed). Rows are only parsed once their
+		line is complete. The detailed (.fdm) file is not followed.
+		In: fname, poll_interval (seconds), timeout (stop after this many
+		seconds without a new row; None waits forever), callbacks (each
+		called as callback(meas, row) for every new row) and store (append
+		the new rows to global_meas).
+		Yields: a dictionary of the new row, keyed like global_meas and
+		holding only the columns selected when loading.
+		"""
+		last_change = time.time()
+
+		# Wait for the simulation to write the header
+		if self.global_meas == None:
+			if fname == None:
+				raise IOError("\tNo measurement file to follow. Please supply a filename.")
+
+			while(True):
+				if path.exists(fname):
+					header = open(fname, "r").read(1 << 16)
+					i = header.find("\nMeasurements:\n")
+					if i != -1 and header.find("\n", i + 15) != -1:
+						break
+
+				if timeout != None and time.time() - last_change > timeout:
+					return
+				time.sleep(poll_interval)
+
+			self.load_global(fname, num_frames_to_read = 0)
+			self.num_frames = 0
+			self.valid = True
+			self.empty = False
+
+		measmap = self.global_measmap
+		fin = open(self.global_fname, "r")
+		try:
+			while(True):
+
+				# Complete lines only. The rest waits until next time
+				fin.seek(self.global_fpos)
+				lines = fin.read().split("\n")[:-1]
+				rows = []
+				for line in lines:
+					self.global_fpos += len(line) + 1
+					sline = line.split()
+					if sline == [] or line.strip() == "#==RESTART==":
+						continue
+
+					row = dict(zip(measmap, [float(s) for s in sline]))
+					if "Centroid.x" in row:
+						row["Centroid"] = np.array([row.pop("Centroid.x"), row.pop("Centroid.y"), row.pop("Centroid.z")])
+
+					# Same measurements as were selected when loading
+					if self.columns != None:
+						row = dict([(key, row[key]) for key in row if key == "Time" or key in self.columns])
+					rows.append(row)
+
+				if rows == []:
+					if timeout != None and time.time() - last_change > timeout:
+						return
+					time.sleep(poll_interval)
+					continue
+
+				# Grow the arrays once per batch of rows
+				if store:
+					for key in rows[0]:
+						new = np.array([row[key] for row in rows])
+						if self.global_meas[key] is None or len(self.global_meas[key]) == 0:
+							self.global_meas[key] = new
+						else:
+							self.global_meas[key] = np.concatenate([self.global_meas[key], new])
+					self.num_frames += len(rows)
+
+				last_change = time.time()
+				for row in rows:
+					for callback in callbacks:
+						callback(self, row)
+					yield row
+		finally:
+			fin.close()
 
 	def add_empty_blob(self):
 		
@@ -451,5 +635,136 @@ class FFEA_measurement:
 		self.num_blobs = 0
 		self.num_frames = 0
 		self.global_meas = None
+		self.global_fname = ""
+		self.global_measmap = []
+		self.global_fpos = 0
+		self.columns = None
 		self.blob_meas = []
 		self.interblob_meas = []
+
+# External functions
+def read_measurement_rows(fin, num_columns, num_rows = 1000000):
+	"""
+	Read the rows of a measurement file from the current position of fin
+	to the end, or the first num_rows of them, decoding them with a single
+	numpy call. Restart markers and blank lines are filtered out, as are
+	incomplete rows (e.g. one still being written). Only malformed files
+	are gone through line by line.
+	In: fin, num_columns, and num_rows, the most rows to return.
+	Out: a (rows, num_columns) array, and the position of fin just past
+	the last row returned.
+	"""
+	start = fin.tell()
+	text = fin.read()
+
+	# Complete lines only
+	text = text[:text.rfind("\n") + 1]
+
+	if num_rows <= 0:
+		return np.zeros((0, num_columns)), start
+
+	# Usually every line is a row, so those wanted end at the num_rows'th newline
+	newline = np.flatnonzero(np.frombuffer(text, dtype=np.uint8) == 10)
+	if len(newline) > num_rows:
+		end = newline[num_rows - 1] + 1
+		data = np.fromstring(text[:end].replace("#==RESTART==", " "), sep=" ")
+		if data.size == num_rows * num_columns:
+			return data.reshape(-1, num_columns), start + end
+
+	# Else every line is a row, or blank, or a restart marker
+	data = np.fromstring(text.replace("#==RESTART==", " "), sep=" ")
+	if data.size % num_columns == 0:
+		if data.size // num_columns <= num_rows:
+			return data.reshape(-1, num_columns), start + len(text)
+
+		# Too many rows. Cut after the line holding the last one wanted. Row
+		# lines are the ones with anything but whitespace and restart markers
+		is_solid = np.arange(256) > 32
+		is_solid[np.frombuffer("#=RESTA", dtype=np.uint8)] = False
+		solid = np.cumsum(is_solid[np.frombuffer(text, dtype=np.uint8)])[newline]
+		rows = np.flatnonzero(np.diff(np.append(0, solid)) > 0)
+		if len(rows) == data.size // num_columns:
+			return data[:num_rows * num_columns].reshape(-1, num_columns), start + newline[rows[num_rows - 1]] + 1
+
+	# Otherwise (something is malformed), go through the lines
+	lines = text.split("\n")[:-1]
+	keep = [i for i in range(len(lines)) if lines[i].strip() not in ("", "#==RESTART==")]
+	keep = keep[:max(num_rows, 0)]
+
+	data = np.fromstring(" ".join([lines[i] for i in keep]), sep=" ")
+	if data.size != len(keep) * num_columns:
+
+		# Something is malformed. Drop the rows with the wrong number of columns
+		keep = [i for i in keep if len(lines[i].split()) == num_columns]
+		data = np.fromstring(" ".join([lines[i] for i in keep]), sep=" ")
+
+	if keep == []:
+		return np.zeros((0, num_columns)), start
+	return data.reshape(-1, num_columns), start + sum([len(l) + 1 for l in lines[:keep[-1] + 1]])
+
+def rewrite_measurement(fname, out_fname, start = 0, stop = None, frame_rate = 1, time_range = None):
+	"""
+	Write every frame_rate'th row from start up to (not including) stop of
+	a global measurement file, and of the detailed file next to it if there
+	is one, to new files, one row at a time. Memory use does not depend on
+	the length of the run. Rows are copied as they are, restart markers are
+	dropped. Selects the same frames as FFEA_trajectory.rewrite_trajectory.
+	In: fname, out_fname (the detailed output takes the same name with a
+	.fdm extension), start, stop (None for the end), frame_rate and
+	time_range, an optional (earliest, latest) Time of the rows to keep.
+	Out: the number of rows written.
+	"""
+	files = [(fname, out_fname)]
+	dfname = path.splitext(fname)[0] + ".fdm"
+	if path.exists(dfname):
+		files.append((dfname, path.splitext(out_fname)[0] + ".fdm"))
+
+	fins = [open(f[0], "r") for f in files]
+	fouts = [open(f[1], "w", 1 << 20) for f in files]
+
+	# Headers, as they are
+	for fin, fout in zip(fins, fouts):
+		while(True):
+			line = fin.readline()
+			if line == "":
+				raise IOError("\tExpected to find 'Measurements:' in '" + fin.name + "'. This may not be an FFEA measurement file.")
+			fout.write(line)
+			if line.strip() == "Measurements:":
+				fout.write(fin.readline())
+				break
+
+	# The global and detailed files have a row per frame each, so go through them together
+	num_written = 0
+	rows = [iter_measurement_rows(fin) for fin in fins]
+	for findex, lines in enumerate(izip(*rows)):
+		if stop != None and findex >= stop:
+			break
+
+		if findex < start or (findex - start) % frame_rate != 0:
+			continue
+
+		if time_range != None:
+			t = float(lines[0].split(None, 1)[0])
+			if t < time_range[0] or t > time_range[1]:
+				continue
+
+		for fout, line in zip(fouts, lines):
+			fout.write(line)
+		num_written += 1
+
+	for f in fins + fouts:
+		f.close()
+
+	return num_written
+
+def iter_measurement_rows(fin):
+	"""
+	Generator over the complete rows of a measurement file from the
+	current position of fin, skipping restart markers and blank lines.
+	"""
+	for line in fin:
+		if not line.endswith("\n"):
+			break
+		if line.strip() in ("", "#==RESTART=="):
+			continue
+		yield line
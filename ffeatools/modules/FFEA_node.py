@@ -26,7 +26,7 @@ from time import sleep
 import numpy as np
 from FFEA_exceptions import *
 
-class FFEA_node:
+class FFEA_node(object):
 
 	def __init__(self, fname = "", scale = 1.0, frame = 0):
 	
@@ -346,15 +346,8 @@ class FFEA_node:
 			self.pos[amap[n]] = oldpos[n]
 
 		# And reassign surface and topologies
-		for i in range(top.num_elements):
-
-			# Map node indices
-			for j in range(len(top.element[i].n)):
-				top.element[i].n[j] = amap[top.element[i].n[j]]
-
-		for i in range(surf.num_faces):
-			for j in range(len(surf.face[i].n)):
-				surf.face[i].n[j] = amap[surf.face[i].n[j]]
+		top.renumber_nodes(amap)
+		surf.renumber_nodes(amap)
 	
 		# And make sure the interior node of surface elements if at the end of the list of the linear indices
 		#for i in range(top.num_interior_elements, top.num_elements):
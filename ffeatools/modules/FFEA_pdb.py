@@ -77,38 +77,140 @@ class FFEA_pdb:
 		self.empty = False
 		sys.stdout.write("...done!\n")
 
-	def load_pdb(self, fname, num_frames_to_read = 100000):
+	def load_pdb(self, fname, num_frames_to_read = 100000, chunk_size = 1 << 24):
+		"""
+		Read a pdb file (or a multi-model pdb trajectory) in a single pass.
+		The first frame gives the chains and atoms. Coordinates are then cut
+		out of the fixed-width ATOM records of all frames a chunk at a time
+		and decoded by numpy straight into one (frames, atoms, 3) array, of
+		which every chain's frames are views.
+		"""
 
 		# Open file
 		try:
-			fin = open(fname, "r")
+			fin = open(fname, "rb")
 		except(IOError):
 			raise IOError
 
 		#
 		# Try to make robust against dodgy formating by the user
 		#
-		sys.stdout.write("\tScanning first frame to determine format...")
-		
-		# Read to first bit of interest (each MODEL is a frame, each chain a blob)
-		line = fin.readline()
+		sys.stdout.write("\tReading first frame to determine structure...")
+
+		# Read until we have the whole first frame
+		text = ""
 		while True:
+			chunk = fin.read(chunk_size)
+			text += chunk
+			start_pos = text.find("\nATOM")
+			if text[:4] == "ATOM":
+				start_pos = 0
+			elif start_pos != -1:
+				start_pos += 1
+
+			if start_pos != -1:
+				structure = self.read_pdb_structure(text[start_pos:].split("\n"), complete = (chunk == ""))
+				if structure != None:
+					break
 
-			# Ignore MODEL, only insert when we output
-			if line[0:4] == "ATOM":
-				aID=int(line[6:12])
-				cID = line[21]
-				fin.seek(-len(line),1)
-				start_pos = fin.tell()
+			if chunk == "":
+				raise IOError("\tNo ATOM records found in '" + fname + "'.")
+
+		sys.stdout.write("\tdone!\n")
+
+		# Build everything we need
+		self.num_chains, self.num_atoms, atom_lines = structure
+		self.chain = [FFEA_pdb_chain(num_atoms = self.num_atoms[i]) for i in range(self.num_chains)]
+
+		# Read atom structures
+		j = 0
+		for c in range(self.num_chains):
+			for atom in self.chain[c].atom:
+				line = atom_lines[j]
+				self.chain[c].chainID = line[21]
+				atom.set_structure(atomID=line[6:12], name=line[12:16], res=line[17:20], resID=line[22:26], occupancy=line[54:60], temperature=line[60:66], segID=line[72:76], element=line[76:78], charge=line[78:80].strip(), ffea_comment=self.get_ffea_comment(line))
+				j += 1
+
+		#
+		# Now the coordinates of all frames, from the first ATOM line on
+		#
+		sys.stdout.write("\tReading all frame data...\n\n")
+		atoms_per_frame = sum(self.num_atoms)
+		text = text[start_pos:]
+		bytes_per_frame = max(text.find("\n", len("\n".join(atom_lines))) + 1, 1)
+		capacity = max(min(num_frames_to_read, (os.path.getsize(fname) - start_pos) / bytes_per_frame + 1), 1)
+		pos = np.empty([capacity * atoms_per_frame, 3])
+		num_read = 0
+		while True:
+
+			# Complete lines only, unless that's all of it
+			chunk = fin.read(chunk_size)
+			text += chunk
+			end = len(text) if chunk == "" else text.rfind("\n") + 1
+			coords, finished = read_atom_coordinates(text[:end])
+			text = text[end:]
+
+			# Store, making room if need be
+			if num_read + len(coords) > len(pos):
+				pos = np.resize(pos, [max(2 * len(pos), num_read + len(coords)), 3])
+			pos[num_read:num_read + len(coords)] = coords
+			num_read += len(coords)
+
+			sys.stdout.write("\r\t\tFrames Read %d" % (num_read / atoms_per_frame))
+			sys.stdout.flush()
+			if finished or chunk == "" or num_read >= num_frames_to_read * atoms_per_frame:
 				break
-			else:
-				line = fin.readline()
+
+		# Whole frames only
+		self.num_frames = min(num_read / atoms_per_frame, num_frames_to_read)
+		self.coords = pos[:self.num_frames * atoms_per_frame].reshape(self.num_frames, atoms_per_frame, 3)
+
+		# Every chain's frames are views of the one array
+		first_atom = 0
+		for c in range(self.num_chains):
+			chain = self.chain[c]
+			for i in range(self.num_frames):
+				frame = FFEA_frame.FFEA_frame()
+				frame.num_nodes = self.num_atoms[c]
+				frame.pos = self.coords[i, first_atom:first_atom + self.num_atoms[c]]
+				chain.frame.append(frame)
+			chain.num_frames = self.num_frames
+			first_atom += self.num_atoms[c]
+
+		# Finish
+		sys.stdout.write("\r\t\tFrames Read %d" % (self.num_frames))
+		sys.stdout.write("\n\n\t...done! Read %d frames from file.\n" % (self.num_frames))
+		fin.close()
+
+	def read_pdb_structure(self, lines, complete = True):
+		"""
+		Work out the chains of the first frame (can't trust TERs to exist,
+		sometimes people leave them out).
+		In: the lines of the file from the first ATOM record on, and whether
+		they run to the end of the file.
+		Out: the number of chains, the number of atoms in each and the ATOM
+		lines of the first frame, or None if the frame may not be complete.
+		"""
+		# The last line may have been cut short
+		if not complete:
+			lines = lines[:-1]
+			if lines == []:
+				return None
+
+		aID = int(lines[0][6:12])
+		cID = lines[0][21]
 		num_atoms = [0]
 		num_chains = 1
+		atom_lines = []
 
-		# Now read the first frame (can't trust TERs to exist, sometimes people leave them out)
+		i = 0
 		while True:
-			line = fin.readline()
+			if i == len(lines):
+				if complete:
+					break
+				return None
+
+			line = lines[i]
 			if line[0:4] == "ATOM":
 
 				# New frame?
@@ -124,124 +226,28 @@ class FFEA_pdb:
 					num_atoms.append(0)
 
 				num_atoms[-1] += 1
+				atom_lines.append(line)
 
 			elif line[0:3] == "TER":
 
 				# See if next line gives a new chain. If not, register a new chain
-				check_pos = fin.tell()
-				line = fin.readline()
+				if i + 1 == len(lines) and not complete:
+					return None
 				
 				## Any failure to read next line constitues the end of the frame
 				try:
-					if line[21] == cID:
+					if lines[i + 1][21] == cID:
 						num_chains += 1
 						num_atoms.append(0)
-				except:
+				except(IndexError):
 					break
 
-				fin.seek(check_pos)
-
 			elif line[0:3] == "END" or line.strip() == "":
 				break
 
-		sys.stdout.write("\tdone!\n")
-
-		#
-		# Reset to beginning and read atomic structures
-		#
-		sys.stdout.write("\tReading first frame to determine structure...")		
-		fin.seek(start_pos)
-		
-		# Build everything we need
-		self.num_chains = num_chains
-		self.num_atoms = num_atoms
-		self.chain = [FFEA_pdb_chain(num_atoms = num_atoms[i]) for i in range(num_chains)]
-
-		# Read atom structures
-		for c in range(self.num_chains):
-			
-			# Get to "ATOM" lines
-			line = fin.readline()
-			while True:
-				if line[0:4] == "ATOM":
-					fin.seek(-len(line),1)
-					break
-			
-				line = fin.readline()
-
-			# Read ATOM structures like a boss
-			for j in range(self.chain[c].num_atoms):
-				line = fin.readline()
-				self.chain[c].chainID = line[21]
-				self.chain[c].atom[j].set_structure(atomID=line[6:12], name=line[12:16], res=line[17:20], resID=line[22:26], occupancy=line[54:60], temperature=line[60:66], segID=line[72:76], element=line[76:78], charge=line[78:80].strip(), ffea_comment=self.get_ffea_comment(line))
-
-		sys.stdout.write("\tdone!\n")
-
-		#
-		# Reset to beginning and read frame data
-		#
-		sys.stdout.write("\tReading all frame data...\n\n")
-		fin.seek(start_pos)
-		
-		# Read all frames
-		completed = False
-		while not completed:
-			
-			# Check for EOF quickly (hopefully)
-			fspos = fin.tell()
-			while True:
-				line = fin.readline()
-				if line[0:4] == "ATOM":
-					fin.seek(-len(line), 1)
-					break
-
-				if (line[0:3] == "END" and len(line) == 3) or line.strip() == "":
-					completed = True
-					break
-			
-			if completed:
-				break
-
-			# Read all data for all chains
-			sys.stdout.write("\r\t\tFrames Read %d" % (self.num_frames))
-
-			for c in range(self.num_chains):
-			
-				# Get to "ATOM" lines
-				line = fin.readline()
-				while True:
-
-					if line[0:4] == "ATOM":
-						fin.seek(-len(line),1)
-						break
-			
-					line = fin.readline()
+			i += 1
 
-				# Get a frame
-				frame = FFEA_frame.FFEA_frame()
-				frame.num_nodes = self.num_atoms[c]
-				frame.pos = [[0.0,0.0,0.0] for i in range(self.num_atoms[c])]
-	
-				# Read ATOM positions like a boss
-				for j in range(self.chain[c].num_atoms):
-					line = fin.readline()
-					#print line
-					frame.pos[j][0] = float(line[30:38])
-					frame.pos[j][1] = float(line[38:46])
-					frame.pos[j][2] = float(line[46:54])
-				frame.pos = np.array(frame.pos)
-				self.chain[c].frame.append(frame)
-				self.chain[c].num_frames += 1
-			self.num_frames += 1
-
-			# Check finish condition
-			if self.num_frames == num_frames_to_read:
-				completed = True
-
-		# Finish
-		sys.stdout.write("\r\t\tFrames Read %d" % (self.num_frames))
-		sys.stdout.write("\n\n\t...done! Read %d frames from file.\n" % (self.num_frames))
-		fin.close()
+		return num_chains, num_atoms, atom_lines
 
 	def get_ffea_comment(self, line):
 		t = line.split("<")
@@ -262,25 +268,19 @@ class FFEA_pdb:
 		if frames == None:
 			frames = [0,self.num_frames]
 
-		text = ""
-		for i in range(frames[0], frames[1], frame_rate):
-			#sys.stdout.write("\r\r%d frames written (%d%%)" % (i, (i * 100) / self.num_frames))
-			sys.stdout.flush()
-			text += ("MODEL     %4d\n" % (i + 1))
-			for j in range(self.num_chains):
-				for k in range(self.num_atoms[j]):
-					#print j, self.num_chains, len(self.chain), k, self.num_atoms[j], len(self.chain[j].atom)
-					a = self.chain[j].atom[k]
-					text += ("%6s%5d %4s %3s %c%4d    %8.3f%8.3f%8.3f%6.2f%6.2f      %4s%2s%2s\n" % ("ATOM  ", a.atomID, a.name, a.res, self.chain[j].chainID, a.resID, self.chain[j].frame[i].pos[k][0], self.chain[j].frame[i].pos[k][1], self.chain[j].frame[i].pos[k][2], a.occupancy, a.temperature, a.segID ,a.element, a.charge))
-
-				text += ("TER\n")
-			text+= ("ENDMDL\n")
-		text += ("END\n")
-		return text 
-
+		text = self.get_frame_text(self.iter_frame_positions(frames, frame_rate), [i + 1 for i in range(frames[0], frames[1], frame_rate)])
+		return "".join(text) + "END\n"
 
-	def write_to_file(self, fname, frames = None, frame_rate = 1):
 
+	def write_to_file(self, fname, frames = None, frame_rate = 1, positions = None, buffer_size = 1 << 22):
+		"""
+		Write the pdb, or a pdb trajectory, to file.
+		In: fname, frames ([first, last) of the stored frames) and frame_rate.
+		If positions is given (any iterable, e.g. a generator, yielding one
+		(atoms, 3) array of all atoms in chain order per frame) those are
+		written as consecutive models instead of the stored frames, one at a
+		time, so they never all have to be held in memory.
+		"""
 		print("Writing to " + fname + "...")
 
 		# Write differently depending on format
@@ -291,19 +291,86 @@ class FFEA_pdb:
 			sys.stdout.write(ext + " is not a supported file extension at the moment. Defaulting to .pdb.\n")
 		
 		try:
-			fout = open(fname, "w")
+			fout = open(fname, "w", buffer_size)
 		except(IOError):
 			raise IOError
 
-		text = self.write_to_text(frames, frame_rate)
-		
-		fout.write(text)
+		if positions == None:
+			if frames == None:
+				frames = [0,self.num_frames]
+			positions = self.iter_frame_positions(frames, frame_rate)
+			model = [i + 1 for i in range(frames[0], frames[1], frame_rate)]
+		else:
+			model = None
+
+		# Gather whole frames and write them in large blocks
+		block = []
+		block_size = 0
+		for text in self.get_frame_text(positions, model):
+			block.append(text)
+			block_size += len(text)
+			if block_size >= buffer_size:
+				fout.write("".join(block))
+				block = []
+				block_size = 0
+
+		block.append("END\n")
+		fout.write("".join(block))
 		# sys.stdout.write("\r\r100% of frames written    \n")
 		sys.stdout.write("flushing...")
 		print("...done")
 		fout.close()
+
+	def get_atom_template(self):
+		"""
+		Build the text of the ATOM (and TER) records of a whole frame once,
+		leaving only the coordinates to be filled in. Everything else in a
+		record is the same in every frame.
+		Out: a format string taking the flattened (atoms, 3) positions.
+		"""
+		template = []
+		for j in range(self.num_chains):
+			chainID = self.chain[j].chainID
+			for k in range(self.num_atoms[j]):
+				a = self.chain[j].atom[k]
+				prefix = "%6s%5d %4s %3s %c%4d    " % ("ATOM  ", a.atomID, a.name, a.res, chainID, a.resID)
+				suffix = "%6.2f%6.2f      %4s%2s%2s\n" % (a.occupancy, a.temperature, a.segID, a.element, a.charge)
+				template.append(prefix.replace("%", "%%") + "%8.3f%8.3f%8.3f" + suffix.replace("%", "%%"))
+			template.append("TER\n")
+		return "".join(template)
+
+	def get_frame_text(self, positions, model = None):
+		"""
+		Generator giving the text of one model per frame.
+		In: an iterable of (atoms, 3) position arrays and, optionally, the
+		model numbers to use (default 1, 2, 3...).
+		"""
+		template = self.get_atom_template()
+		num_atoms = sum(self.num_atoms)
+		for i, pos in enumerate(positions):
+			pos = np.asarray(pos, dtype=float)
+			if pos.shape != (num_atoms, 3):
+				raise IndexError("\tFrame %d has %s positions, but the pdb has %d atoms." % (i, str(pos.shape), num_atoms))
+
+			yield "MODEL     %4d\n" % (i + 1 if model == None else model[i]) + template % tuple(pos.ravel().tolist()) + "ENDMDL\n"
+
+	def iter_frame_positions(self, frames, frame_rate = 1):
+		"""
+		Generator giving the positions of all atoms of each stored frame.
+		"""
+		for i in range(frames[0], frames[1], frame_rate):
+			if self.num_chains == 1:
+				yield self.chain[0].frame[i].get_pos()
+			else:
+				yield np.concatenate([np.reshape(self.chain[j].frame[i].get_pos(), (-1, 3)) for j in range(self.num_chains)])
 	
 	def build_from_traj(self, traj, scale = 1e10):
+		"""
+		One chain per blob (first conformation) of a trajectory. The frames
+		are views of the trajectory's positions (see FFEA_frame.get_view),
+		scaled from metres to Angstroms when read, so nothing is copied and
+		the trajectory is left as it is.
+		"""
 
 		# Reset	
 		self.reset()
@@ -328,11 +395,9 @@ class FFEA_pdb:
 				atom.set_structure()
 				chain.atom.append(atom)
 
-			# Sort frames
+			# Sort frames. Views of the trajectory's, scaled when read
 			chain.num_frames = traj.num_frames
-			chain.frame = c.frame
-			for f in chain.frame:
-				f.pos *= scale
+			chain.frame = [f.get_view(scale) for f in c.frame]
 
 			self.chain.append(chain)
 			self.num_chains += 1
@@ -360,88 +425,149 @@ class FFEA_pdb:
 
 		self.num_frames += 1
 
-	def translate(self, trans):
+	def get_coords(self):
+		"""
+		All positions as one (frames, atoms, 3) array, of which every chain's
+		frames are views, so that transforms can be applied to all chains
+		and frames at once. Frames that are not already part of it (built
+		by hand, or views of a trajectory) are gathered into a new one, so
+		changing it never changes a trajectory we were built from.
+		"""
+		if not self.coords_are_shared():
+			coords = np.empty([self.num_frames, sum(self.num_atoms), 3])
+			first_atom = 0
+			for c in range(self.num_chains):
+				for i in range(self.num_frames):
+					coords[i, first_atom:first_atom + self.num_atoms[c]] = self.chain[c].frame[i].get_pos()
+				first_atom += self.num_atoms[c]
 
-		for i in range(self.num_chains):
-			for j in range(self.num_frames):
-				try:
-					self.chain[i].frame[j].translate(trans)
-				except:
-					print("Could not translate, likely due to formatting error in the translation vector provided")
-					raise
+			self.coords = coords
+			first_atom = 0
+			for c in range(self.num_chains):
+				for i in range(self.num_frames):
+					frame = self.chain[c].frame[i]
+					frame.pos = self.coords[i, first_atom:first_atom + self.num_atoms[c]]
+				first_atom += self.num_atoms[c]
 
-	def rotate_chains_individually(self, rot):
+		return self.coords
 
-		for i in range(self.num_chains):
-			for j in range(self.num_frames):
-				try:
-					self.chain[i].frame[j].rotate(rot)
-				except:
-					print("Could not translate, likely due to formatting error in the translation vector provided")
-					raise
+	def coords_are_shared(self):
 
-	# rotate the full system according to rot, around origin_trans (default CM),
-   #        but just frame findex (default 0)
-	def rotate_full_system(self, rot, cent = [], findex = 0):
-		# findex is which frame we move to pos
-		if findex >= self.num_frames:
-			print("Frame " + findex + " does not exist. Please specifiy a correct index")
+		if self.coords is None or self.coords.shape != (self.num_frames, sum(self.num_atoms), 3) or not self.coords.flags.c_contiguous:
+			return False
+
+		# Every frame must point at its own place in the array
+		address = self.coords.__array_interface__["data"][0]
+		frame_bytes = self.coords.strides[0]
+		first_atom = 0
+		for c in range(self.num_chains):
+			for i in range(self.num_frames):
+				if self.chain[c].frame[i].pos_scale != 1.0 or self.chain[c].frame[i].pos_shared:
+					return False
+				pos = self.chain[c].frame[i].pos
+				if not isinstance(pos, np.ndarray) or pos.shape != (self.num_atoms[c], 3) or pos.strides != self.coords.strides[1:] or pos.__array_interface__["data"][0] != address + i * frame_bytes + first_atom * self.coords.strides[1]:
+					return False
+			first_atom += self.num_atoms[c]
+		return True
+
+	def get_frame_indices(self, findex = None):
+		"""
+		Frames to act on: all of them (None), a single index or a list.
+		"""
+		if findex is None:
+			return slice(None)
+
+		findex = np.atleast_1d(np.array(findex, dtype=int))
+		if np.any(findex >= self.num_frames) or np.any(findex < -self.num_frames):
+			print("Frame " + str(findex) + " does not exist. Please specifiy a correct index")
 			raise IndexError
-		
-		if cent == []:
-			cent = np.array([0.0,0.0,0.0])
-			for i in range(self.num_chains):
-				cent += self.chain[i].frame[findex].calc_centroid() * self.num_atoms[i]
-			cent *= 1.0 / sum(self.num_atoms)
+		return findex
+
+	def get_centroid(self, findex = None):
+		"""
+		Centroid of the whole system in each frame.
+		Out: a (frames, 3) array (or (3,) if findex is a single index).
+		"""
+		cent = self.get_coords()[self.get_frame_indices(findex)].mean(axis = 1)
+		if np.ndim(findex) == 0 and findex is not None:
+			return cent[0]
+		return cent
+
+	def transform(self, rot = None, trans = None, findex = None):
+		"""
+		Apply a rigid body transform, pos -> R pos + trans, to every atom.
+		In: rot, one rotation (see get_rotation_matrix) or one per frame,
+		trans, one (3,) vector or a (frames, 3) array of them, and the
+		frames to act on (default all). Applying a different transform to
+		every frame in one go is what superposing a trajectory needs.
+		"""
+		coords = self.get_coords()
+		findex = self.get_frame_indices(findex)
+		pos = coords[findex]
+
+		if rot is not None:
+			R = get_rotation_matrix(rot)
+			if R is None:
+				return
+			pos = rotate_coords(pos, R)
+
+		if trans is not None:
+			trans = np.array(trans, dtype=float)
+			if trans.ndim == 1:
+				pos += trans
+			else:
+				pos += trans[:,np.newaxis,:]
 
-		origin_trans = np.array([0.,0.,0.]) - cent
-		self.translate(origin_trans)
+		coords[findex] = pos
 
-		rot = np.array(rot)
-		if rot.size == 3:
-			# Rotate in x, then y, then z
-			c = np.cos
-			s = np.sin
-			x = np.radians(rot[0])
-			y = np.radians(rot[1])
-			z = np.radians(rot[2])
-			Rx = np.array([[1, 0, 0],[0,c(x),-s(x)],[0,s(x),c(x)]])
-			Ry = np.array([[c(y), 0, s(y)],[0,1,0],[-s(y),0,c(y)]])
-			Rz = np.array([[c(z),-s(z),0],[s(z),c(z),0], [0,0,1]])
-			
-			# x, y, z. Change if you want
-			R = np.dot(Rz, np.dot(Ry, Rx))
+	def translate(self, trans, findex = None):
 
-		elif rot.size == 9:
-			R = np.array([[0.0,0.0,0.0],[0.0,0.0,0.0],[0.0,0.0,0.0]])
-			for i in range(3):
-				for j in range(3):
-					R[i][j] = rot[3 * i + j]
+		try:
+			self.transform(trans = trans, findex = findex)
+		except:
+			print("Could not translate, likely due to formatting error in the translation vector provided")
+			raise
 
-		else:
-			return
+	def rotate_chains_individually(self, rot, findex = None):
 
-		for i in range(self.num_chains):
-			for j in range(len(self.chain[i].frame[findex].pos)):
-				self.chain[i].frame[findex].pos[j] = np.dot(R, self.chain[i].frame[findex].pos[j])
+		# Each chain about its own centroid, in every frame at once
+		coords = self.get_coords()
+		findex = self.get_frame_indices(findex)
+		R = get_rotation_matrix(rot)
+		if R is None:
+			return
 
-		# Translate back
-		self.translate(-1 * origin_trans)
+		first_atom = 0
+		for c in range(self.num_chains):
+			last_atom = first_atom + self.num_atoms[c]
+			pos = coords[findex, first_atom:last_atom]
+			cent = pos.mean(axis = 1)[:,np.newaxis,:]
+			try:
+				coords[findex, first_atom:last_atom] = rotate_coords(pos - cent, R) + cent
+			except:
+				print("Could not rotate, likely due to formatting error in the rotation provided")
+				raise
+			first_atom = last_atom
+
+	# rotate the full system according to rot, around cent (default CM of
+	#	each frame), but just frame findex (default 0, None for all frames)
+	def rotate_full_system(self, rot, cent = [], findex = 0):
 
+		R = get_rotation_matrix(rot)
+		if R is None:
+			return
 
+		if len(cent) == 0:
+			cent = self.get_centroid(findex)
+		else:
+			cent = np.array(cent, dtype=float)
 
+		# x -> R (x - c) + c
+		self.transform(rot = R, trans = cent - rotate_coords(cent, R), findex = findex)
 
 	def set_pos(self, pos, findex = 0):
-		# findex is which frame we move to pos
-		if findex >= self.num_frames:
-			print("Frame " + findex + " does not exist. Please specifiy a correct index")
-			raise IndexError
-		
-		cent = np.array([0.0,0.0,0.0])
-		for i in range(self.num_chains):
-			cent += self.chain[i].frame[findex].calc_centroid() * self.num_atoms[i]
-		cent *= 1.0 / sum(self.num_atoms)
-		self.translate(np.array(pos) - cent)
+		# findex is which frame we move to pos. All frames move with it
+		self.translate(np.array(pos) - self.get_centroid(int(findex)))
 
 	def reset(self):
 
@@ -451,6 +577,7 @@ class FFEA_pdb:
 		self.num_chains = 0
 		self.num_atoms = []
 		self.chain = []
+		self.coords = None
 
 # For FFEA purposes, split object by chains (don't worry about pointers to groups of things. If you want that, use MDAnalysis)
 class FFEA_pdb_chain:
@@ -477,6 +604,7 @@ class FFEA_pdb_chain:
 		if atom == None:
 			raise IndexError
 		
+		self.frame[frame].unshare_pos()
 		self.frame[frame].pos[atom][0] = float(x)
 		self.frame[frame].pos[atom][1] = float(y)
 		self.frame[frame].pos[atom][2] = float(z)
@@ -558,32 +686,11 @@ class FFEA_pdb_frame:
 		origin_trans = np.array([0.0,0.0,0.0]) - self.calc_centroid()
 		self.translate(origin_trans)
 
-		rot = np.array(rot)
-		if rot.size == 3:
-			# Rotate in x, then y, then z
-			c = np.cos
-			s = np.sin
-			x = np.radians(rot[0])
-			y = np.radians(rot[1])
-			z = np.radians(rot[2])
-			Rx = np.array([[1, 0, 0],[0,c(x),-s(x)],[0,s(x),c(x)]])
-			Ry = np.array([[c(y), 0, s(y)],[0,1,0],[-s(y),0,c(y)]])
-			Rz = np.array([[c(z),-s(z),0],[s(z),c(z),0], [0,0,1]])
-			
-			# x, y, z. Change if you want
-			R = np.dot(Rz, np.dot(Ry, Rx))
-
-		elif rot.size == 9:
-			R = np.array([[0.0,0.0,0.0],[0.0,0.0,0.0],[0.0,0.0,0.0]])
-			for i in range(3):
-				for j in range(3):
-					R[i][j] = rot[3 * i + j]
-
-		else:
+		R = get_rotation_matrix(rot)
+		if R is None or R.ndim != 2:
 			return
 
-		for i in range(len(self.pos)):
-			self.pos[i] = np.dot(R, self.pos[i])
+		self.pos[:] = rotate_coords(self.pos, R)
 
 		# Translate back
 		self.translate(-1 * origin_trans)
@@ -597,3 +704,104 @@ class FFEA_pdb_frame:
 
 		self.pos = []
 		self.step = 0
+
+# External functions
+def get_rotation_matrix(rot):
+	"""
+	Rotation matrix from either 3 angles in degrees (rotating in x, then y,
+	then z) or the 9 elements of the matrix itself, row by row. A (frames, 3)
+	or (frames, 9) array gives one matrix per frame.
+	Out: a (3, 3) or (frames, 3, 3) array, or None if rot is neither.
+	"""
+	rot = np.array(rot, dtype=float)
+	if rot.shape == (9,) or rot.shape == (3, 3):
+		return rot.reshape(3, 3)
+	elif rot.shape == (3,):
+		return get_rotation_matrix(rot.reshape(1, 3))[0]
+	elif rot.ndim == 3 and rot.shape[1:] == (3, 3):
+		return rot
+	elif rot.ndim != 2:
+		return None
+	elif rot.shape[1] == 9:
+		return rot.reshape(-1, 3, 3)
+	elif rot.shape[1] != 3:
+		return None
+
+	c = np.cos(np.radians(rot))
+	s = np.sin(np.radians(rot))
+	one = np.ones(len(rot))
+	zero = np.zeros(len(rot))
+	Rx = np.array([[one, zero, zero], [zero, c[:,0], -s[:,0]], [zero, s[:,0], c[:,0]]]).transpose(2, 0, 1)
+	Ry = np.array([[c[:,1], zero, s[:,1]], [zero, one, zero], [-s[:,1], zero, c[:,1]]]).transpose(2, 0, 1)
+	Rz = np.array([[c[:,2], -s[:,2], zero], [s[:,2], c[:,2], zero], [zero, zero, one]]).transpose(2, 0, 1)
+
+	# x, y, z. Change if you want
+	return np.matmul(Rz, np.matmul(Ry, Rx))
+
+def rotate_coords(pos, R):
+	"""
+	Rotate (..., 3) positions by one (3, 3) matrix, or (frames, ..., 3)
+	positions by a (frames, 3, 3) stack of them.
+	"""
+	pos = np.asarray(pos, dtype=float)
+	if R.ndim == 2:
+		return np.dot(pos.reshape(-1, 3), R.T).reshape(pos.shape)
+	elif pos.ndim == 2:
+		return np.matmul(R, pos[:,:,np.newaxis])[:,:,0]
+	return np.matmul(pos, R.transpose(0, 2, 1))
+
+def read_atom_coordinates(text):
+	"""
+	Cut the x, y and z columns out of every ATOM record in a block of pdb
+	text and decode them together. Stops at the first blank line, which
+	ends the file as far as frames are concerned.
+	In: text, made of whole lines.
+	Out: an (atoms, 3) array and whether a blank line was found.
+	"""
+	if text == "":
+		return np.zeros([0, 3]), False
+
+	# Pad so that short lines at the end can't index past the buffer
+	buf = np.frombuffer(text + " " * 80, dtype=np.uint8)
+	newlines = np.flatnonzero(buf[:len(text)] == ord("\n"))
+	starts = np.concatenate([[0], newlines + 1])
+	ends = np.concatenate([newlines, [len(text)]])
+	if starts[-1] == len(text):
+		starts = starts[:-1]
+		ends = ends[:-1]
+
+	# Blank lines
+	lengths = ends - starts
+	blank = (lengths == 0) | ((lengths == 1) & (buf[starts] == ord("\r")))
+	finished = np.any(blank)
+	if finished:
+		num_lines = np.argmax(blank)
+		starts = starts[:num_lines]
+
+	atom = (buf[starts] == ord("A")) & (buf[starts + 1] == ord("T")) & (buf[starts + 2] == ord("O")) & (buf[starts + 3] == ord("M"))
+	starts = starts[atom]
+
+	# Columns 31 to 54 hold the three 8 character coordinates
+	columns = buf[starts[:,np.newaxis] + np.arange(30, 54)].reshape(-1, 3, 8)
+	return decode_coordinates(columns), finished
+
+def decode_coordinates(columns):
+	"""
+	Decode (atoms, 3, 8) characters of pdb coordinates. Standard %8.3f
+	fields are decoded digit by digit with integer arithmetic. Anything
+	else goes through the general (slower) string conversion.
+	"""
+	if len(columns) == 0:
+		return np.zeros([0, 3])
+
+	chars = np.delete(columns, 4, axis=2)
+	digits = chars - np.uint8(ord("0"))
+	isdigit = digits <= 9
+	isminus = chars == ord("-")
+	if np.all(columns[:,:,4] == ord(".")) and np.all(isdigit | isminus | (chars == ord(" "))) and np.all(isdigit[:,:,3:]):
+		digits[~isdigit] = 0
+		value = np.dot(digits, 10 ** np.arange(6, -1, -1)) / 1000.0
+		value[np.any(isminus, axis=2)] *= -1
+		return value
+
+	return np.ascontiguousarray(columns).view("S8")[:,:,0].astype(np.float64)
@@ -28,6 +28,7 @@
         Email: py12rw@leeds.ac.uk
 """
 
+import os, re
 import numpy as np
 import matplotlib.pyplot as plt
 import scipy.interpolate as interpolate
@@ -35,6 +36,11 @@ from mpl_toolkits.mplot3d import Axes3D # do not remove
 
 global rod_creator_version
 rod_creator_version = 0.3
+rod_binary_version = 1
+
+# The rows of every frame of a rod trajectory, in order
+rod_row_names = ["equil_r", "equil_m", "current_r", "current_m", "perturbed_x_energy_positive", "perturbed_y_energy_positive", "perturbed_z_energy_positive", "twisted_energy_positive", "perturbed_x_energy_negative", "perturbed_y_energy_negative", "perturbed_z_energy_negative", "twisted_energy_negative", "material_params", "B_matrix"]
+num_rod_rows = len(rod_row_names)
 
 """
  _____     ______  
@@ -81,13 +87,21 @@ class FFEA_rod:
         degree of freedom (x, y, z, twist)
     """
     
-    def __init__(self, filename=None, rod_no=0, num_rods=1, num_elements=0):
+    def __init__(self, filename=None, rod_no=0, num_rods=1, num_elements=0, num_processes=1, memmap_prefix=None, cache=False):
         """
         Initialize the rod object and load the contents of the trajectory.
         
         Params:
             filename - the path to the .rodtraj file to be loaded.
             rod_no - give the rod a unique ID, if you like
+            num_processes - decode the frames in this many processes.
+            memmap_prefix - if given, each of the 14 arrays is stored in
+            [memmap_prefix].[row name].npy and memory mapped, instead of
+            being held in memory.
+            cache - keep a binary copy of the trajectory next to it
+            ([filename].rodb) and load that instead, for as long as the
+            trajectory doesn't change.
+            A .rodb filename is loaded as a binary rod trajectory.
             
         Returns:
             nothing. But it populates every attribute in this object, save for
@@ -95,25 +109,33 @@ class FFEA_rod:
         """
         self.rod_no = rod_no
         
-        if filename:
+        if filename and os.path.splitext(filename)[1] == ".rodb":
+            self.load_binary(filename)
+
+        elif filename:
             self.filename = filename
-            self.end_of_header = 0
-            rod_file = open(filename, "r")
-            for line in rod_file:
-                self.end_of_header += 1
-                if line.split(',')[0] == 'HEADER':
-                    self.rod_id = int(line.split(',')[2])
-                if line.split(',')[0] == 'num_elements':
-                    self.num_elements = int(line.split(',')[1])                
-                if line.split(',')[0] == 'length':
-                    self.length = int(line.split(',')[1])          
-                if line.split(',')[0] == 'num_rods':
-                    self.num_rods = int(line.split(',')[1])
-                if line == "---END HEADER---\n":
-                    break
-            rod_file.close()
+            self.load_header()
+
+            # A binary copy made from this very file will do
+            cache_fname = filename + ".rodb"
+            if cache and os.path.exists(cache_fname):
+                try:
+                    source_stamp = self.load_binary(cache_fname)
+                    self.filename = filename
+                    if source_stamp == self.get_source_stamp():
+                        return
+                except (IOError, ValueError):
+                    pass
+                self.filename = filename
+                self.load_header()
+
             self.get_trajectory_length()
-            self.load_trajectory()
+            self.load_trajectory(num_processes=num_processes, memmap_prefix=memmap_prefix)
+            if cache:
+                try:
+                    self.write_binary_rod(cache_fname, source_stamp=self.get_source_stamp())
+                except (IOError, OSError):
+                    pass
         
         else:
             self.num_frames = 1
@@ -137,110 +159,162 @@ class FFEA_rod:
 
         return
     
+    def load_header(self):
+        """
+        Read the header of the .rodtraj file, once.
+        Input: nothing, but self.filename must be set.
+        Output: sets rod_id, num_elements, length, num_rods, end_of_header
+        (in lines) and header_end (in bytes).
+        """
+        self.end_of_header = 0
+        rod_file = open(self.filename, "r")
+        while True:
+            line = rod_file.readline()
+            if not line:
+                break
+            self.end_of_header += 1
+            sline = line.split(',')
+            if sline[0] == 'HEADER':
+                self.rod_id = int(sline[2])
+            if sline[0] == 'num_elements':
+                self.num_elements = int(sline[1])
+            if sline[0] == 'length':
+                self.length = int(sline[1])
+            if sline[0] == 'num_rods':
+                self.num_rods = int(sline[1])
+            if line == "---END HEADER---\n":
+                break
+        self.header_end = rod_file.tell()
+        rod_file.close()
+
     def get_num_dimensions(self, row):
         """
         Get the number of dimensions for the row. For example, equil_r is stored
         in row 1, and it's positions, so it's 3D. This will return 4 for
         B_matrix because the B_matrix of each node is 4 elements long.
+        Worked out from the first frame by get_trajectory_length.
         """
-        rod_file = open(self.filename, "r")
-        for lines_skipped in range(self.end_of_header):
-            rod_file.readline()
-        for lines_skipped in range(row):
-            rod_file.readline()
-        line = rod_file.readline()
-        rod_file.close()
-        return len(line.split(","))/self.num_elements
+        return self.num_dimensions[row - 1]
 
-        
-    def get_trajectory_length(self):
+    def get_trajectory_length(self, chunk_size=1<<24):
         """
-        Get the number of frames in the trajectory.
+        Get the number of frames in the trajectory, by finding where every
+        frame starts in one pass through the file, a chunk at a time. The
+        first frame also gives the length of each row. A frame still being
+        written at the end of the file is left out.
         Input: nothing, but the file header info must already be loaded (see
-        __init__).
-        Output: sets the self.num_frames attribute.
+        load_header).
+        Output: sets the self.num_frames, self.frame_offsets (where each
+        frame starts, plus where the last one ends, in bytes) and
+        self.num_dimensions attributes.
         """
-        self.num_frames = 0
         rod_file = open(self.filename, "r")
-        for line in rod_file:
-            if line.split(" ")[0] == "FRAME" and line.split(" ")[2] == "ROD":
-                self.num_frames+=1
+        rod_file.seek(self.header_end)
+        offsets = []
+        text = "\n"
+        text_start = self.header_end - 1
+        while True:
+            chunk = rod_file.read(chunk_size)
+            text += chunk
+            # Only search up to the last newline, so FRAME lines can't be split
+            end = len(text) if chunk == "" else text.rfind("\n") + 1
+            pos = text.find("\nFRAME ", 0, end)
+            while pos != -1:
+                offsets.append(text_start + pos + 1)
+                pos = text.find("\nFRAME ", pos + 1, end)
+            if chunk == "":
+                break
+            text_start += end - 1
+            text = text[end - 1:]
+
+        # Row lengths, from the first frame
+        self.num_dimensions = [3] * num_rod_rows
+        if offsets != []:
+            rod_file.seek(offsets[0])
+            rod_file.readline()
+            for row in range(num_rod_rows):
+                self.num_dimensions[row] = len(rod_file.readline().split(","))/self.num_elements
+
+        # The last frame must be whole
+        rod_file.seek(0, 2)
+        offsets.append(rod_file.tell())
+        if len(offsets) > 1:
+            rod_file.seek(offsets[-2])
+            if rod_file.read(offsets[-1] - offsets[-2]).count("\n") < num_rod_rows + 1:
+                offsets.pop()
         rod_file.close()
 
-    def load_trajectory(self):
+        self.frame_offsets = np.array(offsets, dtype=np.int64)
+        self.num_frames = len(offsets) - 1
+
+    def load_trajectory(self, num_processes=1, memmap_prefix=None, frames_per_block=256):
         """
-        Loads the trajectory. Fast, but also messy. The basic idea is that it allocates
-        a load of very large numpy arrays, then iterates over every frame, calling
-        rod_file.readline() for each line, loading that frame for that line into
-        the array, and then does .readline() again. It does that 14 times for the
-        14 rows in each frame. No, it's not pretty, you're right. It's not.
-        At least it's not trying to be clever.
+        Loads the trajectory. The 14 arrays are allocated up front (or memory
+        mapped, with memmap_prefix), then the frames located by
+        get_trajectory_length are read in blocks. Each block is decoded by a
+        single np.fromstring call and split into the rows. Blocks can be
+        decoded in several processes (num_processes).
         
         Inputs: none, it already has the filename set in self.filename and all
         the meta info.
         Outputs: none, but it populates all the 'contents' arrays.
         """
+        arrays = []
+        for row in range(num_rod_rows):
+            shape = (self.num_frames, self.num_elements, self.num_dimensions[row])
+            if memmap_prefix == None:
+                array = np.empty(shape)
+            else:
+                array = np.lib.format.open_memmap(memmap_prefix + "." + rod_row_names[row] + ".npy", mode="w+", dtype=np.float64, shape=shape)
+            setattr(self, rod_row_names[row], array)
+            arrays.append(array)
 
-        self.equil_r = np.empty([self.num_frames, self.num_elements, self.get_num_dimensions(1)])
-        self.equil_m = np.empty([self.num_frames, self.num_elements, self.get_num_dimensions(2)])
-        self.current_r = np.empty([self.num_frames, self.num_elements, self.get_num_dimensions(3)])
-        self.current_m  = np.empty([self.num_frames, self.num_elements, self.get_num_dimensions(4)])
-        self.perturbed_x_energy_positive = np.empty([self.num_frames, self.num_elements, self.get_num_dimensions(5)])
-        self.perturbed_y_energy_positive = np.empty([self.num_frames, self.num_elements, self.get_num_dimensions(6)])
-        self.perturbed_z_energy_positive = np.empty([self.num_frames, self.num_elements, self.get_num_dimensions(7)])
-        self.twisted_energy_positive = np.empty([self.num_frames, self.num_elements, self.get_num_dimensions(8)])
-        self.perturbed_x_energy_negative = np.empty([self.num_frames, self.num_elements, self.get_num_dimensions(9)])
-        self.perturbed_y_energy_negative = np.empty([self.num_frames, self.num_elements, self.get_num_dimensions(10)])
-        self.perturbed_z_energy_negative = np.empty([self.num_frames, self.num_elements, self.get_num_dimensions(11)])
-        self.twisted_energy_negative = np.empty([self.num_frames, self.num_elements, self.get_num_dimensions(12)])
-        self.material_params = np.empty([self.num_frames, self.num_elements, self.get_num_dimensions(13)])
-        self.B_matrix = np.empty([self.num_frames, self.num_elements, self.get_num_dimensions(14)])
+        # Frame blocks
+        row_sizes = [self.num_elements * d for d in self.num_dimensions]
+        tasks = []
+        for first in range(0, self.num_frames, frames_per_block):
+            last = min(first + frames_per_block, self.num_frames)
+            tasks.append((self.filename, first, self.frame_offsets[first:last + 1].tolist(), row_sizes))
 
-        # look, this is not pretty but it is really fast
+        if num_processes > 1 and len(tasks) > 1:
+            import multiprocessing
+            pool = multiprocessing.Pool(num_processes)
+            try:
+                blocks = pool.imap(decode_rod_frames, tasks)
+                self.store_frame_blocks(tasks, blocks, arrays)
+            finally:
+                pool.terminate()
+        else:
+            self.store_frame_blocks(tasks, (decode_rod_frames(task) for task in tasks), arrays)
+
+        if memmap_prefix != None:
+            for array in arrays:
+                array.flush()
 
-        rod_file = open(self.filename, "r")
-        frame_no = 0
-        while True:
-            line = rod_file.readline()
-            if not line:
-                break
-            if line.split(" ")[0] == "FRAME":
-                try:
-                    line = rod_file.readline()
-                    self.equil_r[frame_no] = np.fromstring(line, sep=",").reshape(self.equil_r[frame_no].shape)
-                    line = rod_file.readline()
-                    self.equil_m[frame_no] = np.fromstring(line, sep=",").reshape(self.equil_m[frame_no].shape)
-                    line = rod_file.readline()
-                    self.current_r[frame_no] = np.fromstring(line, sep=",").reshape(self.current_r[frame_no].shape)
-                    line = rod_file.readline()
-                    self.current_m[frame_no] = np.fromstring(line, sep=",").reshape(self.current_m[frame_no].shape)
-                    line = rod_file.readline()
-                    self.perturbed_x_energy_positive[frame_no] = np.fromstring(line, sep=",").reshape(self.perturbed_x_energy_positive[frame_no].shape)
-                    line = rod_file.readline()
-                    self.perturbed_y_energy_positive[frame_no] = np.fromstring(line, sep=",").reshape(self.perturbed_y_energy_positive[frame_no].shape)
-                    line = rod_file.readline()
-                    self.perturbed_z_energy_positive[frame_no] = np.fromstring(line, sep=",").reshape(self.perturbed_z_energy_positive[frame_no].shape)
-                    line = rod_file.readline()
-                    self.twisted_energy_positive[frame_no] = np.fromstring(line, sep=",").reshape(self.twisted_energy_positive[frame_no].shape)
-                    line = rod_file.readline()
-                    self.perturbed_x_energy_negative[frame_no] = np.fromstring(line, sep=",").reshape(self.perturbed_x_energy_negative[frame_no].shape)
-                    line = rod_file.readline()
-                    self.perturbed_y_energy_negative[frame_no] = np.fromstring(line, sep=",").reshape(self.perturbed_y_energy_negative[frame_no].shape)
-                    line = rod_file.readline()
-                    self.perturbed_z_energy_negative[frame_no] = np.fromstring(line, sep=",").reshape(self.perturbed_z_energy_negative[frame_no].shape)
-                    line = rod_file.readline()
-                    self.twisted_energy_negative[frame_no] = np.fromstring(line, sep=",").reshape(self.twisted_energy_negative[frame_no].shape)
-                    line = rod_file.readline()
-                    self.material_params[frame_no] = np.fromstring(line, sep=",").reshape(self.material_params[frame_no].shape)
-                    line = rod_file.readline()
-                    self.B_matrix[frame_no] = np.fromstring(line, sep=",").reshape(self.B_matrix[frame_no].shape)
-                    frame_no += 1
-                except ValueError as e:
-                    raise ValueError(str(e)+"\nError loading frame "+str(frame_no)+"\nProblem line: "+str(line))
         #self.set_avg_energies()
         return
+
+    def store_frame_blocks(self, tasks, blocks, arrays):
+        """
+        Copy decoded (frames, values) blocks into the 14 arrays.
+        """
+        for i, block in enumerate(blocks):
+            first = tasks[i][1]
+            last = first + len(block)
+            column = 0
+            for row in range(num_rod_rows):
+                size = self.num_elements * self.num_dimensions[row]
+                arrays[row][first:last] = block[:, column:column + size].reshape(arrays[row][first:last].shape)
+                column += size
     
     def write_rod(self, filename):
+        """
+        Write the rod trajectory. A filename ending in .rodb gets the binary
+        format (see write_binary_rod), anything else the text format.
+        """
+        if os.path.splitext(filename)[1] == ".rodb":
+            self.write_binary_rod(filename)
+            return
         
         try:
             self.p_i
@@ -248,27 +322,15 @@ class FFEA_rod:
             self.p_i = self.get_p_i(self.current_r)
         
         # First, write header info 
-        rod_file = open(filename, "w")
+        rod_file = open(filename, "w", 1<<22)
         rod_file.write("format,ffea_rod\n")
         rod_file.write("version,"+str(rod_creator_version)+"\n")
         rod_file.write("HEADER,ROD,"+str(self.rod_no)+"\n")
         rod_file.write("num_elements,"+str(self.num_elements)+"\n")
         rod_file.write("length,"+str(self.length)+"\n")
         rod_file.write("num_rods,"+str(self.num_rods)+"\n")
-        rod_file.write("row1,equil_r\n")
-        rod_file.write("row2,equil_m\n")
-        rod_file.write("row3,current_r\n")
-        rod_file.write("row4,current_m\n")
-        rod_file.write("row5,perturbed_x_energy_positive\n")
-        rod_file.write("row6,perturbed_y_energy_positive\n")
-        rod_file.write("row7,perturbed_z_energy_positive\n")
-        rod_file.write("row8,twisted_energy_positive\n")
-        rod_file.write("row9,perturbed_x_energy_negative\n")
-        rod_file.write("row10,perturbed_y_energy_negative\n")
-        rod_file.write("row11,perturbed_z_energy_negative\n")
-        rod_file.write("row12,twisted_energy_negative\n")
-        rod_file.write("row13,material_params\n")
-        rod_file.write("row14,B_matrix\n")
+        for row in range(num_rod_rows):
+            rod_file.write("row"+str(row+1)+","+rod_row_names[row]+"\n")
         
         # Connections (note: this is temporary, it might end up in the .ffea file)
         rod_file.write("CONNECTIONS,ROD,0\n")
@@ -276,42 +338,129 @@ class FFEA_rod:
         
         rod_file.write("---END HEADER---\n")
         
-        # Write trajectory
-        
-        try:
-            StringIO
-            shutil
-        except NameError:
-            import cStringIO as StringIO
-#            import shutil
-        
-        def write_array(array, file_obj):
-            sio = StringIO.StringIO()
-            np.savetxt(sio, array, newline=",")
-            str_to_write = sio.getvalue()[:-1]+"\n"
-            file_obj.write(str_to_write)
-        
+        # Write trajectory. Every frame is formatted in one go
+        arrays = [getattr(self, name) for name in rod_row_names]
+        frame_template = "FRAME %d ROD %d\n"
+        for array in arrays:
+            num_values = array[0].size if len(array) > 0 else 0
+            frame_template += ",".join(["%.18e"] * num_values) + "\n"
+
         for frame in range(self.num_frames):
-            
-            rod_file.write("FRAME "+str(frame)+" ROD "+str(self.rod_no)+"\n")
-            write_array(self.equil_r[frame].flatten(), rod_file)
-            write_array(self.equil_m[frame].flatten(), rod_file)
-            write_array(self.current_r[frame].flatten(), rod_file)
-            write_array(self.current_m[frame].flatten(), rod_file)
-            write_array(self.perturbed_x_energy_positive[frame].flatten(), rod_file)
-            write_array(self.perturbed_y_energy_positive[frame].flatten(), rod_file)
-            write_array(self.perturbed_z_energy_positive[frame].flatten(), rod_file)
-            write_array(self.twisted_energy_positive[frame].flatten(), rod_file)
-            write_array(self.perturbed_x_energy_negative[frame].flatten(), rod_file)
-            write_array(self.perturbed_y_energy_negative[frame].flatten(), rod_file)
-            write_array(self.perturbed_z_energy_negative[frame].flatten(), rod_file)
-            write_array(self.twisted_energy_negative[frame].flatten(), rod_file)
-            write_array(self.material_params[frame].flatten(), rod_file)
-            write_array(self.B_matrix[frame].flatten(), rod_file)
-            
+            values = np.concatenate([array[frame].ravel() for array in arrays]).tolist()
+            rod_file.write(frame_template % tuple([frame, self.rod_no] + values))
             
         rod_file.close()
-            
+
+    def write_binary_rod(self, filename, dtype=np.float64, source_stamp=None):
+        """
+        Write the rod trajectory in the binary rod format (.rodb). This is a
+        text header, like that of the .rodtraj, padded to a whole number of
+        pages, followed by each of the 14 arrays, raw and little-endian, one
+        after the other. The reader (load_binary) memory maps the arrays.
+        Params: filename, dtype (np.float64 or np.float32), and source_stamp,
+        which identifies the text file it was made from, if any.
+        Returns: nothing.
+        """
+        dtype = np.dtype(dtype).newbyteorder("<")
+        header = ["format,ffea_rod_binary"]
+        header.append("version,"+str(rod_binary_version))
+        header.append("HEADER,ROD,"+str(self.rod_no))
+        header.append("num_elements,"+str(self.num_elements))
+        header.append("length,"+str(self.length))
+        header.append("num_rods,"+str(self.num_rods))
+        header.append("num_frames,"+str(self.num_frames))
+        header.append("dtype,"+dtype.str)
+        if source_stamp != None:
+            header.append("source,"+",".join([repr(s) for s in source_stamp]))
+
+        # Offsets of the arrays, from the start of the data
+        offset = 0
+        arrays = []
+        for row in range(num_rod_rows):
+            array = getattr(self, rod_row_names[row])
+            arrays.append(array)
+            header.append("row"+str(row+1)+","+rod_row_names[row]+","+str(array.shape[2])+","+str(offset))
+            offset += array.size * dtype.itemsize
+        header.append("---END HEADER---\n")
+        header = "\n".join(header).encode("ascii")
+        data_start = (len(header) // 4096 + 1) * 4096
+
+        # Write to a temporary file and rename so readers never see half a file
+        rod_file = open(filename + ".tmp", "wb")
+        rod_file.write(header)
+        rod_file.write(b" " * (data_start - len(header)))
+        for array in arrays:
+            np.ascontiguousarray(array, dtype=dtype).tofile(rod_file)
+        rod_file.close()
+        os.rename(filename + ".tmp", filename)
+
+    def load_binary(self, filename, mode="c"):
+        """
+        Load a binary rod trajectory (.rodb, see write_binary_rod). Nothing
+        is read but the header: each array is a memory map of the file.
+        Params: filename, and the np.memmap mode. The default, "c", lets the
+        arrays be changed in memory without touching the file.
+        Returns: the stamp of the text file it was made from, or None.
+        """
+        self.filename = filename
+        self.end_of_header = 0
+        source_stamp = None
+        dtype = np.dtype("<f8")
+        rows = []
+        rod_file = open(filename, "rb")
+        line = rod_file.readline().decode("ascii", "replace")
+        if line.strip() != "format,ffea_rod_binary":
+            rod_file.close()
+            raise IOError("\tExpected to read 'format,ffea_rod_binary' but read '" + line.strip() + "'. This may not be an FFEA binary rod file.")
+
+        try:
+            while True:
+                line = rod_file.readline().decode("ascii")
+                if not line or line == "---END HEADER---\n":
+                    break
+                sline = line.strip().split(',')
+                if sline[0] == 'HEADER':
+                    self.rod_id = int(sline[2])
+                elif sline[0] == 'num_elements':
+                    self.num_elements = int(sline[1])
+                elif sline[0] == 'length':
+                    self.length = int(sline[1])
+                elif sline[0] == 'num_rods':
+                    self.num_rods = int(sline[1])
+                elif sline[0] == 'num_frames':
+                    self.num_frames = int(sline[1])
+                elif sline[0] == 'dtype':
+                    dtype = np.dtype(sline[1])
+                elif sline[0] == 'source':
+                    source_stamp = [float(s) for s in sline[1:]]
+                elif sline[0][:3] == 'row':
+                    rows.append((sline[1], int(sline[2]), int(sline[3])))
+        except (IndexError, ValueError):
+            rod_file.close()
+            raise IOError("\tUnable to parse line '" + line.strip() + "' of binary rod header '" + filename + "'.")
+
+        data_start = (rod_file.tell() // 4096 + 1) * 4096
+        rod_file.close()
+
+        self.num_dimensions = []
+        for name, num_dimensions, offset in rows:
+            shape = (self.num_frames, self.num_elements, num_dimensions)
+            if self.num_frames * self.num_elements * num_dimensions == 0:
+                array = np.zeros(shape, dtype=dtype)
+            else:
+                array = np.memmap(filename, dtype=dtype, mode=mode, offset=data_start + offset, shape=shape)
+            setattr(self, name, array)
+            self.num_dimensions.append(num_dimensions)
+
+        return source_stamp
+
+    def get_source_stamp(self):
+        """
+        Size and modification time of the text trajectory, which a binary
+        copy of it must have been made from to be used instead.
+        """
+        st = os.stat(self.filename)
+        return [float(st.st_size), float(st.st_mtime)]
 
     def get_p_i(self, x):
         """
@@ -322,18 +471,8 @@ class FFEA_rod:
         Returns: an array containing the p_i vectors for each frame.
         """
         #x = either self.current_r, or self.equil_r!
-        
-        # Find p_i
-        x_shifted = np.copy(x)
-        for frame in range(len(x_shifted)):
-            x_shifted[frame] = np.roll(x_shifted[frame],1,axis=0) 
-        p_i = x - x_shifted #get all the p_i values in one big giant array operation
-        
-        # Remove first p_i
-        p_i_new = np.empty([self.num_frames, self.num_elements-1, len(self.current_r[0][0]) ])
-        for frame in range(len(p_i_new)):
-            p_i_new[frame] = np.delete(p_i[frame], 0, axis=0)
-        return p_i_new
+        x = np.asarray(x)
+        return x[:,1:] - x[:,:-1] #get all the p_i values in one big giant array operation
         
     def set_avg_energies(self):
         """
@@ -434,7 +573,7 @@ class anal_rod:
         Returns: nothing.
         """
         self.rod = rod
-        py_rod_math = py_rod_math()
+        self.py_rod_math = py_rod_math
         self.analytical_P = None
         self.analytical_deflection = None
         self.analytical_kbT = None
@@ -458,11 +597,7 @@ class anal_rod:
         Params: none.
         Returns: none, but it sets self.deflections, an array.
         """
-        frames = len(self.rod.current_r)
-        nodes = len(self.rod.current_r[0]) -1
-        self.deflections = np.zeros([frames])
-        for frame in range(frames):
-            self.deflections[frame] = self.rod.current_r[frame][nodes][1] - self.rod.equil_r[frame][nodes][1]
+        self.deflections = np.asarray(self.rod.current_r)[:,-1,1] - np.asarray(self.rod.equil_r)[:,-1,1]
 
     def get_EI_from_deflection(self, force_applied):
         """
@@ -478,13 +613,10 @@ class anal_rod:
         except AttributeError:
             self.get_deflection()
             
-        frames = len(self.rod.current_r)
         nodes = len(self.rod.current_r[0]) -1
         beam_length = py_rod_math.get_length(self.rod.equil_r[0][1] - self.rod.equil_r[0][nodes])
-        self.EI_from_deflection = np.zeros([frames])
-        for frame in range(frames):
-            #beam_length = self.get_absolute_length(1,nodes,frame) # gets a better number but i think not for the right reason, i think the beam length is constant
-            self.EI_from_deflection[frame] = (force_applied*(beam_length**3))/(3*py_rod_math.get_length(self.deflections[frame]))
+        #beam_length = self.get_absolute_length(1,nodes,frame) # gets a better number but i think not for the right reason, i think the beam length is constant
+        self.EI_from_deflection = (force_applied*(beam_length**3))/(3*np.abs(self.deflections))
 
     def get_persistence_length(self):
         """
@@ -502,27 +634,58 @@ class anal_rod:
         except AttributeError:
             self.p_i = self.get_p_i(self.rod.current_r)
         
-        self.P = np.zeros(len(self.rod.current_r))
-        cos_theta = np.zeros(len(self.rod.current_r))
-        
-        for frame in range(len(self.rod.current_r)):
-            a = py_rod_math.normalize(self.p_i[frame][0])
-            b = py_rod_math.normalize(self.p_i[frame][-1])
-            cos_theta[frame] = py_rod_math.get_cos_theta(a,b)
+        a = py_rod_math.normalize_all(self.p_i[:,0])
+        b = py_rod_math.normalize_all(self.p_i[:,-1])
+        cos_theta = py_rod_math.dot_all(a,b)/(py_rod_math.get_lengths(a)*py_rod_math.get_lengths(b))
             
         avg_cos_theta = np.average(cos_theta)
 #        avg_cos_theta = np.sqrt(np.mean(cos_theta**2)) #rms?
         
-        for frame in range(len(self.rod.current_r)):
-            L = self.get_absolute_length(0, len(self.rod.current_r[0])-2, frame) # -1 for there being 1 less element than nodes, -1 for the length being measured from the center of both elements.
-            self.P[frame] = -L/np.log(avg_cos_theta)
+        # -1 for there being 1 less element than nodes, -1 for the length being measured from the center of both elements.
+        L = np.sum(py_rod_math.get_lengths(self.p_i[:,:len(self.rod.current_r[0])-2]), axis=1)
+        self.P = -L/np.log(avg_cos_theta)
             
-        if self.P[frame] > 0.0001:
-            print("L = "+str(L))
-            print("a = "+str(a))
-            print("b = "+str(b))
+        if self.P[-1] > 0.0001:
+            print("L = "+str(L[-1]))
+            print("a = "+str(a[-1]))
+            print("b = "+str(b[-1]))
             print("cos_theta = "+str(cos_theta))
-            print("P = "+str(self.P[frame]))
+            print("P = "+str(self.P[-1]))
+
+    def get_element_pairs(self, p_i, m):
+        """
+        Get the normalized p_i and m vectors for every pair of adjacent
+        elements in every frame, as used by the bending and twisting energies.
+        Params: p_i, an array of p_i vectors (e.g. self.p_i, self.equil_p_i),
+        and m, the matching material frame (e.g. self.rod.current_m).
+        Returns: pim1, pi, mim1, mi, four arrays of the form
+        [frame][element pair][x,y,z].
+        """
+        num_pairs = len(p_i[0])-1
+        m = np.asarray(m)
+        pim1 = py_rod_math.normalize_all(p_i[:,:num_pairs])
+        pi = py_rod_math.normalize_all(p_i[:,1:num_pairs+1])
+        mim1 = py_rod_math.normalize_all(m[:,:num_pairs])
+        mi = py_rod_math.normalize_all(m[:,1:num_pairs+1])
+        return pim1, pi, mim1, mi
+
+    def get_B_matrices(self, element_offset):
+        """
+        Build the 2x2 bending matrices for every pair of adjacent elements in
+        every frame. As in the simulation, only the first diagonal element
+        varies, the rest are taken from the first element of the first frame.
+        Params: element_offset, 0 to use the first element of each pair, 1 to
+        use the second.
+        Returns: an array of the form [frame][element pair][2][2].
+        """
+        B_matrix = np.asarray(self.rod.B_matrix)
+        num_pairs = len(self.p_i[0])-1
+        B = np.empty([len(self.p_i), num_pairs, 2, 2])
+        B[:,:,0,0] = B_matrix[:,element_offset:element_offset+num_pairs,0]
+        B[:,:,0,1] = B_matrix[0][0][1]
+        B[:,:,1,0] = B_matrix[0][0][2]
+        B[:,:,1,1] = B_matrix[0][0][3]
+        return B
 
     def get_bending_response(self):
         """
@@ -537,7 +700,7 @@ class anal_rod:
         except AttributeError:
             self.p_i = self.get_p_i(self.rod.current_r)
         try:
-            self.equil_p_ir
+            self.equil_p_i
         except AttributeError:
             self.equil_p_i = self.get_p_i(self.rod.equil_r)
             
@@ -547,49 +710,36 @@ class anal_rod:
             import warnings
             warnings.warn("EI is not constant. If this is for an equipartition test, it won't work.")
             
-        self.bending_energy = np.zeros( [len(self.p_i), len(self.p_i[0])-1] )
+        # NOTE TO SELF: ADD NORMALISATION!
         
-        for frame in range(len(self.p_i)):
-            for element in range(len(self.bending_energy[0])):
-                
-                # NOTE TO SELF: ADD NORMALISATION!
-                
-                B_j = np.matrix([[self.rod.B_matrix[frame][element][0], self.rod.B_matrix[0][0][1]], [self.rod.B_matrix[0][0][2], self.rod.B_matrix[0][0][3]]])
-                B_i= np.matrix([[self.rod.B_matrix[frame][element+1][0], self.rod.B_matrix[0][0][1]], [self.rod.B_matrix[0][0][2], self.rod.B_matrix[0][0][3]]])
-                
-                pim1 = py_rod_math.normalize(self.p_i[frame][element])
-                pi = py_rod_math.normalize(self.p_i[frame][element+1])
-                mim1 = py_rod_math.normalize(self.rod.current_m[frame][element])
-                nim1 = np.cross(mim1, pim1/np.linalg.norm(pim1))
-                mi = py_rod_math.normalize(self.rod.current_m[frame][element+1])
-                #m2i = m2im1 = np.cross(m1i, ei/np.linalg.norm(ei)) #THIS HAS TO BE WRONG, RIGHT?
-                ni = np.cross(mi, pi/np.linalg.norm(pi))
-                
-                omega_i = py_rod_math.omega(pi, pim1, nim1, mim1)
-                omega_j = py_rod_math.omega(pi, pim1, ni, mi)
-                
-                equil_pim1 = py_rod_math.normalize(self.equil_p_i[frame][element])
-                equil_pi = py_rod_math.normalize(self.equil_p_i[frame][element+1])
-                equil_mim1 = py_rod_math.normalize(self.rod.equil_m[frame][element])
-                equil_nim1 = np.cross(equil_mim1, equil_pim1/np.linalg.norm(equil_pim1))
-                equil_mi = py_rod_math.normalize(self.rod.equil_m[frame][element+1])
-                #m2i_bar = m2im1 = np.cross(m1i_bar, ei_bar/np.linalg.norm(ei_bar)) #THIS HAS TO BE WRONG, RIGHT?
-                equil_ni = np.cross(equil_mi, equil_pi/np.linalg.norm(equil_pi))
-                
-                equil_omega_i = py_rod_math.omega(equil_pi, equil_pim1, equil_nim1, equil_mim1)
-                equil_omega_j = py_rod_math.omega(equil_pi, equil_pim1, equil_ni, equil_mi)
+        B_j = self.get_B_matrices(0)
+        B_i = self.get_B_matrices(1)
+        
+        pim1, pi, mim1, mi = self.get_element_pairs(self.p_i, self.rod.current_m)
+        nim1 = np.cross(mim1, py_rod_math.normalize_all(pim1))
+        #m2i = m2im1 = np.cross(m1i, ei/np.linalg.norm(ei)) #THIS HAS TO BE WRONG, RIGHT?
+        ni = np.cross(mi, py_rod_math.normalize_all(pi))
+        
+        omega_i = py_rod_math.omega_all(pi, pim1, nim1, mim1)
+        omega_j = py_rod_math.omega_all(pi, pim1, ni, mi)
+        
+        equil_pim1, equil_pi, equil_mim1, equil_mi = self.get_element_pairs(self.equil_p_i, self.rod.equil_m)
+        equil_nim1 = np.cross(equil_mim1, py_rod_math.normalize_all(equil_pim1))
+        #m2i_bar = m2im1 = np.cross(m1i_bar, ei_bar/np.linalg.norm(ei_bar)) #THIS HAS TO BE WRONG, RIGHT?
+        equil_ni = np.cross(equil_mi, py_rod_math.normalize_all(equil_pi))
+        
+        equil_omega_i = py_rod_math.omega_all(equil_pi, equil_pim1, equil_nim1, equil_mim1)
+        equil_omega_j = py_rod_math.omega_all(equil_pi, equil_pim1, equil_ni, equil_mi)
 
-                delta_omega_i = omega_i - equil_omega_i
-                delta_omega_j = omega_j - equil_omega_j
-                
-                inner_i = np.dot(np.transpose(delta_omega_i), np.dot(B_j, delta_omega_i))
-                inner_j = np.dot(np.transpose(delta_omega_j), np.dot(B_i, delta_omega_j))
-                
-                energy = 0.5*(inner_i + inner_j)*(1/(2*(py_rod_math.get_length(equil_pi)+py_rod_math.get_length(equil_pim1))))
-                
-                L_i = py_rod_math.get_length(equil_pi)+py_rod_math.get_length(equil_pim1)
-                
-                self.bending_energy[frame][element] = energy
+        delta_omega_i = omega_i - equil_omega_i
+        delta_omega_j = omega_j - equil_omega_j
+        
+        inner_i = np.einsum('...i,...ij,...j', delta_omega_i, B_j, delta_omega_i)
+        inner_j = np.einsum('...i,...ij,...j', delta_omega_j, B_i, delta_omega_j)
+        
+        L_i = py_rod_math.get_lengths(equil_pi)+py_rod_math.get_lengths(equil_pim1)
+        
+        self.bending_energy = 0.5*(inner_i + inner_j)*(1/(2*L_i))
         
     def get_bending_response_mutual(self):
         """
@@ -600,24 +750,36 @@ class anal_rod:
         """
         
         def get_mutual_frame_inverse(a, b):
-            a_length = py_rod_math.get_length(a)
-            b_length = py_rod_math.get_length(b)
+            a_length = py_rod_math.get_lengths(a)[...,np.newaxis]
+            b_length = py_rod_math.get_lengths(b)[...,np.newaxis]
             mutual_frame = (1/a_length)*a + (1/b_length)*b
-            return py_rod_math.normalize(mutual_frame)
+            return py_rod_math.normalize_all(mutual_frame)
         
 
         def get_mutual_angle_inverse(a, b, angle):
-            a_length = py_rod_math.get_length(a)
-            b_length = py_rod_math.get_length(b)
+            a_length = py_rod_math.get_lengths(a)
+            b_length = py_rod_math.get_lengths(b)
             a_b_ratio = b_length/(b_length+a_length)
             return angle*a_b_ratio
         
+        def get_omega(p_i, m):
+            num_pairs = len(p_i[0])-1
+            mutual_l = get_mutual_frame_inverse(p_i[:,:num_pairs], p_i[:,1:num_pairs+1])
+            pim1, pi, mim1, mi = self.get_element_pairs(p_i, m)
+            mutual_mi = py_rod_math.parallel_transport_all(mi, pi, mutual_l)
+            mutual_mim1 = py_rod_math.parallel_transport_all(mim1, pim1, mutual_l)
+            angle_between = np.arccos(py_rod_math.dot_all(mutual_mi, mutual_mim1))
+            mutual_angle = get_mutual_angle_inverse(mutual_mi, mutual_mim1, angle_between)
+            mutual_m_rotated = py_rod_math.rodrigues_all(mutual_mim1, mutual_l, mutual_angle)
+            omega = py_rod_math.omega_all(pi, pim1, np.cross(mutual_m_rotated, mutual_l), mutual_m_rotated)
+            return omega, py_rod_math.get_lengths(pi)+py_rod_math.get_lengths(pim1)
+        
         try:
             self.p_i
         except AttributeError:
             self.p_i = self.get_p_i(self.rod.current_r)
         try:
-            self.equil_p_ir
+            self.equil_p_i
         except AttributeError:
             self.equil_p_i = self.get_p_i(self.rod.equil_r)
             
@@ -627,62 +789,18 @@ class anal_rod:
             import warnings
             warnings.warn("EI is not constant. If this is for an equipartition test, it won't work.")
             
-        self.bending_energy = np.zeros( [len(self.p_i), len(self.p_i[0])-1] )
+        # NOTE TO SELF: ADD NORMALISATION!
         
-        for frame in range(len(self.p_i)):
-            for element in range(len(self.bending_energy[0])):
-                
-                # NOTE TO SELF: ADD NORMALISATION!
-                
-                #B_j = np.matrix([[self.rod.B_matrix[frame][element][0], self.rod.B_matrix[0][0][1]], [self.rod.B_matrix[0][0][2], self.rod.B_matrix[0][0][3]]])
-                B= np.matrix([[self.rod.B_matrix[frame][element+1][0], self.rod.B_matrix[0][0][1]], [self.rod.B_matrix[0][0][2], self.rod.B_matrix[0][0][3]]])
-                
-                mutual_l = get_mutual_frame_inverse(self.p_i[frame][element], self.p_i[frame][element+1])
-                equil_mutual_l = get_mutual_frame_inverse(self.equil_p_i[frame][element], self.equil_p_i[frame][element+1])
-                
-                pim1 = py_rod_math.normalize(self.p_i[frame][element])
-                pi = py_rod_math.normalize(self.p_i[frame][element+1])
-                mim1 = py_rod_math.normalize(self.rod.current_m[frame][element])
-                nim1 = np.cross(mim1, pim1/np.linalg.norm(pim1))
-                mi = py_rod_math.normalize(self.rod.current_m[frame][element+1])
-                #m2i = m2im1 = np.cross(m1i, ei/np.linalg.norm(ei)) #THIS HAS TO BE WRONG, RIGHT?
-                ni = np.cross(mi, pi/np.linalg.norm(pi))
-                
-                # need to do this for the equilibrium config as well
-                mutual_mi = py_rod_math.parallel_transport(mi,  pi, mutual_l)
-                mutual_mim1 = py_rod_math.parallel_transport(mim1,  pim1, mutual_l)
-                angle_between = np.arccos(np.dot(mutual_mi, mutual_mim1))
-                mutual_angle = get_mutual_angle_inverse(mutual_mi, mutual_mim1, angle_between)
-                mutual_m_rotated = self.py_rod_math.rodrigues(mutual_mim1, mutual_l, mutual_angle)
-                omega = py_rod_math.omega(pi, pim1, np.cross(mutual_m_rotated, mutual_l), mutual_m_rotated)
-                
-                
-                
-                
-                equil_pim1 = py_rod_math.normalize(self.equil_p_i[frame][element])
-                equil_pi = py_rod_math.normalize(self.equil_p_i[frame][element+1])
-                equil_mim1 = py_rod_math.normalize(self.rod.equil_m[frame][element])
-                equil_nim1 = np.cross(equil_mim1, equil_pim1/np.linalg.norm(equil_pim1))
-                equil_mi = py_rod_math.normalize(self.rod.equil_m[frame][element+1])
-                #m2i_bar = m2im1 = np.cross(m1i_bar, ei_bar/np.linalg.norm(ei_bar)) #THIS HAS TO BE WRONG, RIGHT?
-                equil_ni = np.cross(equil_mi, equil_pi/np.linalg.norm(equil_pi))
-                
-                equil_mutual_mi = py_rod_math.parallel_transport(equil_mi,  equil_pi, equil_mutual_l)
-                equil_mutual_mim1 = py_rod_math.parallel_transport(equil_mim1,  equil_pim1, equil_mutual_l)
-                equil_angle_between = np.arccos(np.dot(equil_mutual_mi, equil_mutual_mim1))
-                equil_mutual_angle = get_mutual_angle_inverse(equil_mutual_mi, equil_mutual_mim1, equil_angle_between)
-                equil_mutual_m_rotated = self.py_rod_math.rodrigues(equil_mutual_mim1, equil_mutual_l, equil_mutual_angle)
-                equil_omega = py_rod_math.omega(equil_pi, equil_pim1, np.cross(equil_mutual_m_rotated, equil_mutual_l), equil_mutual_m_rotated)
-                
-                delta_omega = omega - equil_omega
-                
-                inner = np.dot(np.transpose(delta_omega), np.dot(B, delta_omega))
+        B = self.get_B_matrices(1)
+        
+        omega, _ = get_omega(self.p_i, self.rod.current_m)
+        equil_omega, L_i = get_omega(self.equil_p_i, self.rod.equil_m)
+        
+        delta_omega = omega - equil_omega
+        
+        inner = np.einsum('...i,...ij,...j', delta_omega, B, delta_omega)
 
-                energy = 0.5*(inner)*(1/((py_rod_math.get_length(equil_pi)+py_rod_math.get_length(equil_pim1))))
-                
-                #L_i = py_rod_math.get_length(equil_pi)+py_rod_math.get_length(equil_pim1)
-                
-                self.bending_energy[frame][element] = energy
+        self.bending_energy = 0.5*(inner)*(1/L_i)
                 
     def get_twist_amount(self):
         """
@@ -697,23 +815,26 @@ class anal_rod:
             self.p_i
         except AttributeError:
             self.p_i = self.get_p_i(self.rod.current_r)
+        try:
+            self.equil_p_i
+        except AttributeError:
             self.equil_p_i = self.get_p_i(self.rod.equil_r)
         
-        self.twist_amount = np.zeros( [len(self.r_i), len(self.r_i[0])-1] )
-        self.twist_energy = np.zeros( [len(self.r_i), len(self.r_i[0])-1] )
+        # parallel transport  mi to mip1
+        pim1, pi, mim1, mi = self.get_element_pairs(self.p_i, self.rod.current_m)
+        mim1_transported = py_rod_math.parallel_transport_all(mim1, pim1, pi)
+        delta_theta = py_rod_math.get_twist_angle_all(mim1_transported, mi)
         
-        for frame in range(len(self.p_i)):
-            for element in range(len(self.p_i[frame])-1):
-                # parallel transport  mi to mip1
-                mim1_transported = py_rod_math.parallel_transport(py_rod_math.normalize(self.rod.current_m[frame][element]), py_rod_math.normalize(self.r_i[frame][element]), py_rod_math.normalize(self.r_i[frame][element+1] ))
-                delta_theta = py_rod_math.get_twist_angle( mim1_transported, py_rod_math.normalize(self.rod.current_m[frame][element+1]))
-                equil_mim1_transported = py_rod_math.parallel_transport(py_rod_math.normalize(self.rod.equil_m[frame][element]), py_rod_math.normalize(self.equil_r_i[frame][element]), py_rod_math.normalize(self.equil_r_i[frame][element+1] ))
-                equil_delta_theta = py_rod_math.get_twist_angle( equil_mim1_transported, py_rod_math.normalize(self.rod.equil_m[frame][element+1]))
-                
-                self.twist_amount[frame][element] = delta_theta - equil_delta_theta
-                
-                Li = py_rod_math.get_length(self.equil_r_i[frame][element]) + py_rod_math.get_length(self.equil_r_i[frame][element+1]) 
-                self.twist_energy[frame][element] = self.rod.material_params[frame][element][1]/Li * np.power(delta_theta-equil_delta_theta, 2)
+        equil_pim1, equil_pi, equil_mim1, equil_mi = self.get_element_pairs(self.equil_p_i, self.rod.equil_m)
+        equil_mim1_transported = py_rod_math.parallel_transport_all(equil_mim1, equil_pim1, equil_pi)
+        equil_delta_theta = py_rod_math.get_twist_angle_all(equil_mim1_transported, equil_mi)
+        
+        self.twist_amount = delta_theta - equil_delta_theta
+        
+        num_pairs = len(self.p_i[0])-1
+        equil_lengths = py_rod_math.get_lengths(self.equil_p_i)
+        Li = equil_lengths[:,:num_pairs] + equil_lengths[:,1:num_pairs+1]
+        self.twist_energy = np.asarray(self.rod.material_params)[:,:num_pairs,1]/Li * np.power(self.twist_amount, 2)
         
         
     def get_equipartition(self):
@@ -725,27 +846,18 @@ class anal_rod:
         self.p_i = self.get_p_i(self.rod.current_r)
         self.equil_p_i = self.get_p_i(self.rod.equil_r)
         
-        self.p_i_extension= np.zeros( [len(self.p_i), len(self.p_i[0])] )
-        for frame in range(len(self.p_i)):
-            for segment in range(len(self.p_i[frame])):
-                self.p_i_extension[frame][segment] = py_rod_math.get_length(self.equil_p_i[frame][segment]) - py_rod_math.get_length(self.p_i[frame][segment])
-
-        self.p_i_extension_x = np.zeros( [len(self.p_i), len(self.p_i[0])] )
-        self.p_i_extension_y = np.zeros( [len(self.p_i), len(self.p_i[0])] )
-        self.p_i_extension_z = np.zeros( [len(self.p_i), len(self.p_i[0])] )
-        for frame in range(len(self.p_i)):
-            for segment in range(len(self.p_i[frame])):
-                self.p_i_extension_x[frame][segment] = self.equil_p_i[frame][segment][0] - self.p_i[frame][segment][0]
-                self.p_i_extension_y[frame][segment] = self.equil_p_i[frame][segment][1] - self.p_i[frame][segment][1]
-                self.p_i_extension_z[frame][segment] = self.equil_p_i[frame][segment][2] - self.p_i[frame][segment][2]
+        self.p_i_extension = py_rod_math.get_lengths(self.equil_p_i) - py_rod_math.get_lengths(self.p_i)
+
+        p_i_extension_xyz = self.equil_p_i - self.p_i
+        self.p_i_extension_x = p_i_extension_xyz[:,:,0]
+        self.p_i_extension_y = p_i_extension_xyz[:,:,1]
+        self.p_i_extension_z = p_i_extension_xyz[:,:,2]
    
         self.get_bending_response()
         
         self.get_twist_amount()
         
-        self.average_twist_energy = np.zeros(len(self.twist_energy))
-        for frame in range(len(self.average_twist_energy)):
-            self.average_twist_energy[frame] = np.average( self.twist_energy[frame] )
+        self.average_twist_energy = np.average(self.twist_energy, axis=1)
    
     def get_constant_EI(self):
         """
@@ -1042,10 +1154,7 @@ class anal_rod:
         except AttributeError:
             self.p_i = self.get_p_i(self.rod.current_r)
             
-        absolute_length = 0
-        for i in range(ending_node-starting_node):
-            absolute_length += py_rod_math.get_length(self.p_i[frame][i+starting_node])
-        return absolute_length
+        return np.sum(py_rod_math.get_lengths(self.p_i[frame][starting_node:ending_node]))
         
     def whole_rod_avg(self, thing):
         """
@@ -1199,6 +1308,74 @@ class py_rod_math:
         except TypeError:
             return np.cos(theta)*np.array(v) + np.cross(k, v)*np.sin(theta) + np.array(k)*np.dot(k,v)*(1-np.cos(theta))
 
+    """
+    The functions below are the batched versions of the ones above. They take
+    arrays of vectors of the form [...][x,y,z] (e.g. [frame][element][x,y,z])
+    and work along the last axis, so the analysis can run over a whole
+    trajectory at once instead of looping over every frame and element.
+    """
+
+    def get_lengths(self, vecs):
+        """
+        Given an array of vectors, return an array of their lengths.
+        """
+        vecs = np.asarray(vecs)
+        return np.sqrt(np.einsum('...i,...i', vecs, vecs))
+
+    def normalize_all(self, vecs):
+        """
+        Given an array of vectors, return the normalized version of each one.
+        """
+        vecs = np.asarray(vecs)
+        return vecs/self.get_lengths(vecs)[...,np.newaxis]
+
+    def dot_all(self, a, b):
+        """
+        Given two arrays of vectors, return the dot product of each pair.
+        """
+        return np.einsum('...i,...i', a, b)
+
+    def kb_i_all(self, pi, pim1):
+        """
+        Batched version of kb_i.
+        """
+        return np.cross(2*pim1,pi)/(self.get_lengths(pi)*self.get_lengths(pim1) + self.dot_all(pi, pim1))[...,np.newaxis]
+
+    def omega_all(self, pi, pim1, m2j, m1j):
+        """
+        Batched version of omega. Returns an array of 2-vectors of the form
+        [...][omega_1, omega_2] (no kb_i).
+        """
+        kb_i = self.kb_i_all(pi, pim1)
+        return np.stack([self.dot_all(kb_i, m2j), -self.dot_all(kb_i, m1j)], axis=-1)
+
+    def parallel_transport_all(self, m_i, a, b):
+        """
+        Batched version of parallel_transport. Instead of building the rotation
+        matrix R = I + [v]x + [v]x^2/(1+c) for each vector, this applies it
+        directly, as m + v x m + v x (v x m)/(1+c).
+        """
+        v = np.cross(a,b)
+        c_factor = 1./(1+self.dot_all(a,b))
+        v_cross_m = np.cross(v, m_i)
+        return m_i + v_cross_m + np.cross(v, v_cross_m)*c_factor[...,np.newaxis]
+
+    def get_twist_angle_all(self, m_i, m_j):
+        """
+        Batched version of get_twist_angle.
+        """
+        return np.arccos( self.dot_all(self.normalize_all(m_i), self.normalize_all(m_j)) )
+
+    def rodrigues_all(self, v, k, theta):
+        """
+        Batched version of rodrigues. Theta is an array with one angle for each
+        vector.
+        """
+        k = self.normalize_all(k)
+        cos_theta = np.cos(theta)[...,np.newaxis]
+        sin_theta = np.sin(theta)[...,np.newaxis]
+        return cos_theta*v + np.cross(k, v)*sin_theta + k*self.dot_all(k,v)[...,np.newaxis]*(1-cos_theta)
+
 py_rod_math = py_rod_math()
 
 test_threejs = """[new THREE.Vector3(289.76843686945404, 452.51481137238443, 56.10018915737797),
@@ -1509,3 +1686,34 @@ def mpt_angle(a, b, angle):
     a_b_ratio = b_length/(b_length+a_length)
     angle_to_rotate = a_b_ratio * angle
     return angle_to_rotate
+
+def decode_rod_frames(task):
+    """
+    Decode a block of consecutive rod trajectory frames.
+    Params: a tuple of the filename, the index of the first frame, the byte
+    offsets of the frames (plus the end of the last one) and the number of
+    values in each row.
+    Returns: a (frames, values) array, the rows of each frame laid end to end.
+    """
+    filename, first, offsets, row_sizes = task
+    rod_file = open(filename, "r")
+    rod_file.seek(offsets[0])
+    text = rod_file.read(offsets[-1] - offsets[0])
+    rod_file.close()
+
+    # Drop the FRAME lines, then every value is separated by a comma
+    num_frames = len(offsets) - 1
+    values_per_frame = sum(row_sizes)
+    text = re.sub("FRAME [^\n]*\n", "", text)
+    block = np.fromstring(text.replace("\n", ","), sep=",")
+    if block.size == num_frames * values_per_frame:
+        return block.reshape(num_frames, values_per_frame)
+
+    # Something is off. Go frame by frame to find out where
+    for i in range(num_frames):
+        lines = text.split("\n")[i * num_rod_rows:(i + 1) * num_rod_rows]
+        for row in range(num_rod_rows):
+            line = lines[row] if row < len(lines) else ""
+            if np.fromstring(line, sep=",").size != row_sizes[row]:
+                raise ValueError("Wrong number of values in row " + str(row + 1) + "\nError loading frame " + str(first + i) + "\nProblem line: " + line)
+    raise ValueError("Error loading frames " + str(first) + " to " + str(first + num_frames - 1))
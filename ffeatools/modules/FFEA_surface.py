@@ -21,7 +21,7 @@
 #  the research papers on the package.
 #
 
-import sys, os
+import sys, os, re
 from time import sleep
 import numpy as np
 from FFEA_exceptions import *
@@ -43,6 +43,23 @@ def do_profile(follow=[]):
         return profiled_func
     return inner
 
+# A line with nothing but whitespace on it
+blank_line = re.compile(r"^[ \t\r]*$", re.M)
+
+def get_rows(text, width=None):
+
+	# The whitespace separated integers of text, up to its first blank line, as an (num_rows x width) int32 array.
+	# The width is that of the first row if not given
+	end = blank_line.search(text)
+	if end != None:
+		text = text[:end.start()]
+	if width == None:
+		width = len(text.split("\n", 1)[0].split())
+
+	rows = np.fromstring(text, dtype=np.int32, sep=" ")
+	if width == 0:
+		return rows.reshape(0, 0)
+	return rows.reshape(-1, width)
 
 class FFEA_surface:
 
@@ -119,38 +136,15 @@ class FFEA_surface:
 
 		fin.readline()
 
-		# Read faces now	
-		while(True):
-			sline = fin.readline().split()
-
-			if len(sline) == 0:
-				break
-
-			# Get a face	
-			if len(sline) == 3 or len(sline) == 4:
-				f = FFEA_face_tri_lin()
-
-				if len(sline) == 3:
-					# Just a face
-					f.set_indices(sline)
-				else:
-					# Face with parent element
-					f.set_indices(sline[1:], elindex = sline[0])
-
-			elif len(sline) == 6 or len(sline) == 7:
-				f = FFEA_face_tri_sec()
-
-				if len(sline) == 6:
-					# Just a face
-					f.set_indices(sline)
-				else:
-					# Face with parent element
-					f.set_indices(sline[1:], elindex = sline[0])
-
-			self.add_face(f)
-
+		# Read faces now, straight into the arrays. 3 or 6 nodes, after the parent element if there are 4 or 7 columns
+		rows = get_rows(fin.read())
 		fin.close()
 
+		if rows.shape[1] == 4 or rows.shape[1] == 7:
+			self.set_connectivity(rows[:,1:], rows[:,0])
+		elif rows.shape[1] == 3 or rows.shape[1] == 6:
+			self.set_connectivity(rows)
+
 	def load_stl(self, fname):
 
 		print("Not currently supported.")
@@ -196,15 +190,9 @@ class FFEA_surface:
 
 		lines = lines[start_index:]
 
-		for line in lines:
-			if line[0] != "f":
-				continue
-
-			sline = line.split()[1:4]
-			sline = [int(s) - 1 for s in sline]
-			f = FFEA_face_tri_lin()
-			f.set_indices(sline)
-			self.add_face(f)
+		# Faces are indexed from 1
+		faces = [line.split()[1:4] for line in lines if line[0] == "f"]
+		self.set_connectivity(np.array(faces, dtype=np.int32).reshape(-1, 3) - 1)
 
 	def load_face(self, fname):
 
@@ -223,22 +211,13 @@ class FFEA_surface:
 
 		num_faces = int(sline[0])
 
-		# Read faces now	
-		while(True):
-			sline = fin.readline().split()
-
-			if sline[0].strip() == "#":
-				break
-
-			# Get a face
-			sline = sline[1:4]
-			sline = [int(s) - 1 for s in sline]
-			f = FFEA_face_tri_lin()
-			f.set_indices(sline)
-			self.add_face(f)
-
+		# Read faces now, up to the closing comment. Each row is the index, 3 nodes (from 1) and maybe a boundary marker
+		text = fin.read()
 		fin.close()
 
+		rows = get_rows(text.split("#", 1)[0], 4 + int(sline[1]))
+		self.set_connectivity(rows[:,1:4] - 1)
+
 	def load_vol(self, fname):
 
 		# Open file
@@ -263,94 +242,131 @@ class FFEA_surface:
 
 			continue
 
-		# Get num_faces
+		# Get num_faces. Each row is surfnr bcnr domin domout np p1 p2 p3 (and maybe more)
 		i += 1
 		num_faces = int(lines[i])
-		zeroindexing = False
-		for j in range(i + 1, i + 1 + num_faces):
-			try:
-				sline = lines[j].split()[5:]
-				face = FFEA_face_tri_lin()
-				
-				# Test indices
-				for s in sline:
-					if s.strip() == "0":
-						zeroindexing = True
-						break
- 
-				face.set_indices(sline[:3])
-				self.add_face(face)
-
-			except:
-				self.reset()
-				raise Exception("\tCouldn't find the specified %d faces. Only found %d. File '" + fname + "' not formatted correctly." % (num_faces, i))
+		try:
+			rows = get_rows("".join(lines[i + 1:i + 1 + num_faces]))
+			if len(rows) != num_faces:
+				raise IndexError
+		except:
+			self.reset()
+			raise Exception("\tCouldn't find the specified %d faces. File '%s' not formatted correctly." % (num_faces, fname))
 
 		# Indexing from 0
-		if not zeroindexing:
-			for i in range(self.num_faces):
-				for j in range(3):
-					self.face[i].n[j] -= 1
+		n = rows[:,5:8]
+		if not np.any(rows[:,5:] == 0):
+			n -= 1
+		self.set_connectivity(n)
+
 	def add_face(self, f):
-		self.face.append(f)
-		self.num_faces += 1
 
-	def get_element_indices(self, top):
+		# One face at a time copies the arrays, so the loaders set them all at once instead
+		n = [int(i) for i in f.n]
+		width = max(len(n), self.connectivity.shape[1]) if self.num_faces > 0 else len(n)
+		self.set_width(width)
+		n = np.array([n + [-1] * (width - len(n))], dtype=np.int32)
+		self.set_connectivity(np.concatenate([self.connectivity, n]), np.append(self.elindex, -1 if f.elindex == None else f.elindex))
 
-		elcheck = range(top.num_elements)
-		index = -1
-		for f in self.face:
-			index += 1			
-			success = 0
-			for i in elcheck:
-				compare = 0
-				for j in range(3):
-					if f.n[j] in top.element[i].n:
-						compare += 1
-				if compare == 3:
-					success = 1
-					f.elindex = i
-					#elcheck.remove(i)	# Can't remove, as elements can have more than one surface face (especially in coarse structures :( )
-					break
+	def set_connectivity(self, n, elindex=-1):
 
-			if success != 1:
-				print("Face " + str(index) + " could not be found in the topology structure. This topology cannot be paired with this surface. Regenerating surface...")
-				print("Face in error = ", self.face[index].n)
-				for f in self.face:
-					f.elindex = None
-				return -1
+		# Replace all faces at once, given their (num_faces x 3|6) nodes and the element each belongs to (-1 if not known).
+		# Linear faces among second order ones have -1 (no node) in place of the second order nodes
+		self.connectivity = np.array(n, dtype=np.int32).reshape(len(n), -1)
+		if self.connectivity.shape[1] == 6 and np.all(self.connectivity[:,3:] == -1):
+			self.connectivity = self.connectivity[:,0:3]
+		self.elindex = np.empty(len(n), dtype=np.int32)
+		self.elindex[:] = elindex
+		self.num_faces = len(self.connectivity)
 
-	def upgrade_face(self, index):
+	def set_width(self, width):
+
+		# Make room for width nodes per face, with -1 (no node) in the new columns
+		if width > self.connectivity.shape[1]:
+			padding = -1 * np.ones([self.num_faces, width - self.connectivity.shape[1]], dtype=np.int32)
+			self.connectivity = np.hstack([self.connectivity, padding])
+
+	def get_face_nodes(self, index):
+
+		# The nodes of a face, as a view of its row (only the linear ones for a linear face among second order ones)
+		n = self.connectivity[index]
+		if len(n) == 6 and n[3] == -1:
+			return n[0:3]
+		return n
+
+	def set_face_nodes(self, index, n):
 
-		# Replace element with a higher order one
-		f = FFEA_face_tri_sec()
-		f.n = self.face[index].n
-		f.elindex = self.face[index].elindex
+		n = np.array(n, dtype=np.int32)
+		self.set_width(len(n))
+		self.connectivity[index] = -1
+		self.connectivity[index,0:len(n)] = n
 
-		self.face.insert(index, f)
-		self.face.pop(index + 1)
+	def renumber_nodes(self, nodemap):
+
+		# Give every node i the new index nodemap[i]
+		nodemap = np.asarray(nodemap)
+		self.connectivity = np.where(self.connectivity >= 0, nodemap[self.connectivity], -1).astype(np.int32)
+
+	def get_connectivity(self):
+
+		# All nodes of every face, as an (num_faces x 3|6) array
+		return self.connectivity
+
+	def get_elindex(self):
+
+		# The element each face belongs to, as an array (-1 if not known)
+		return self.elindex
+
+	def get_element_indices(self, top):
+
+		# Each face belongs to the first element with its 3 (linear) nodes in it. The candidates are the elements of its first node
+		n = top.get_connectivity().astype(np.int64)
+		elements = np.repeat(np.arange(top.num_elements), n.shape[1])[n.ravel() != -1]
+		n = n.ravel()[n.ravel() != -1]
+		order = np.argsort(n, kind="mergesort")
+		f = self.connectivity[:,0:3].astype(np.int64)
+		start = np.searchsorted(n[order], f[:,0], side="left")
+		count = np.searchsorted(n[order], f[:,0], side="right") - start
+		face = np.repeat(np.arange(self.num_faces), count)
+		candidate = elements[order[np.arange(np.sum(count)) + np.repeat(start - (np.cumsum(count) - count), count)]]
+
+		# Both other nodes have to be in the candidate too
+		num_nodes = np.max(np.concatenate([n, f.ravel(), [0]])) + 1
+		keys = np.sort(elements * num_nodes + n)
+		found = np.ones(len(face), dtype=bool)
+		for j in range(1, 3):
+			key = candidate * num_nodes + f[face,j]
+			found &= keys[np.minimum(np.searchsorted(keys, key), len(keys) - 1)] == key
+		faces, first = np.unique(face[found], return_index=True)
+
+		if len(faces) != self.num_faces:
+			index = np.flatnonzero(np.in1d(np.arange(self.num_faces), faces, invert=True))[0]
+			print("Face " + str(index) + " could not be found in the topology structure. This topology cannot be paired with this surface. Regenerating surface...")
+			print("Face in error = ", self.face[index].n)
+			self.elindex[:] = -1
+			return -1
+
+		self.elindex = candidate[found][first].astype(np.int32)
+
+	def upgrade_face(self, index):
+
+		# Make room for the second order nodes of a face. They're -1 (no node), so it's still linear until they're set
+		self.set_width(6)
 
 	def split_face(self, index):
 
 		# Split second order face into 4 1st orders
-		if isinstance(self.face[index], FFEA_face_tri_sec):
+		oldn = self.get_face_nodes(index)
+		if len(oldn) == 6:
 			
 			# Order is lin0, lin1, lin2, sec01, sec02, sec12
 			# So, 4 tris are 034, 153, 245, 354
-			oldf = self.face[index]
-			f = [FFEA_face_tri_lin() for i in range(4)]
-			f[0].set_indices([oldf.n[0], oldf.n[3], oldf.n[4]], oldf.elindex)
-			f[1].set_indices([oldf.n[1], oldf.n[5], oldf.n[3]], oldf.elindex)
-			f[2].set_indices([oldf.n[2], oldf.n[4], oldf.n[5]], oldf.elindex)
-			f[3].set_indices([oldf.n[3], oldf.n[5], oldf.n[4]], oldf.elindex)
+			n = -1 * np.ones([4, self.connectivity.shape[1]], dtype=np.int32)
+			n[:,0:3] = oldn[np.array([[0,3,4], [1,5,3], [2,4,5], [3,5,4]])]
 			
 			# Insert in this order after the old face
-			for face in f:
-				self.face.append(face)
-			
-			self.face.pop(index)
-
-			# 1 -> 4 means += 3
-			self.num_faces += 3
+			keep = np.arange(self.num_faces) != index
+			self.set_connectivity(np.concatenate([self.connectivity[keep], n]), np.append(self.elindex[keep], [self.elindex[index]] * 4))
 
 	def check_normals(self, node, top):
 		
@@ -374,6 +390,7 @@ class FFEA_surface:
 						top.element[elindex].n[j] = index[1]
 					elif top.element[elindex].n[j] == index[1]:
 						top.element[elindex].n[j] = index[0]
+				top.clear_adjacency()
 
 	def print_details(self):
 
@@ -541,38 +558,77 @@ class FFEA_surface:
 
 		return 0
 
+	def get_edges(self, node):
+
+		# Edge vectors of all faces (num_faces x 3 x 3), edge i going from node i - 1 to node i
+		x = np.asarray(node.pos, dtype=float).reshape(-1, 3)[self.get_connectivity()[:,0:3]]
+		return x - np.roll(x, 1, axis=1)
+
 	def calculateSmallestEdge(self, node):
 		
 		# For this one, only worry about the edges
-		minL = float("inf")		
-		for f in self.face:
-			l = f.calculateSmallestEdge(node)
-			if l < minL:
-				minL = l
-		
-		return minL
+		if self.num_faces == 0:
+			return float("inf")
+		return np.min(np.linalg.norm(self.get_edges(node), axis=2))
 
 	def calculateSmallestLength(self, node):
 		
 		# For this one, worry about point-to-edge diagonals
-		minL = float("inf")
-		for f in self.face:
-			l = f.calculateSmallestLength(node)
-			if l < minL:
-				minL = l
-		
-		return minL
+		if self.num_faces == 0:
+			return float("inf")
+		e = self.get_edges(node)
+		e0 = np.roll(e, 1, axis=1)
+		l1 = np.linalg.norm(e, axis=2)
+		l0 = np.linalg.norm(e0, axis=2)
+		lp = np.sum(e * e0, axis=2) / l0
+		return np.min(np.sqrt(l1 * l1 - lp * lp))
 
 	def reset(self):
 
-		self.face = []
+		self.face = FFEA_face_list(self)
 		self.num_faces = 0
+		self.connectivity = np.zeros([0, 3], dtype=np.int32)
+		self.elindex = np.zeros(0, dtype=np.int32)
 		self.valid = False
 		self.empty = True
 		self.firstOrderFaceNodes = [] # an array of nodes n_i1, n_i2, n_i3, ... describing 1st order faces.
 		self.num_linear_faces = 0
 
-class FFEA_face:
+class FFEA_face_list(object):
+
+	# The faces of a surface, as views made when asked for
+	__slots__ = ("surf",)
+
+	def __init__(self, surf):
+		self.surf = surf
+
+	def __len__(self):
+		return len(self.surf.connectivity)
+
+	def __getitem__(self, index):
+		if isinstance(index, slice):
+			return [FFEA_face_view(self.surf, i) for i in range(*index.indices(len(self)))]
+
+		index = int(index)
+		if index < 0:
+			index += len(self)
+		if index < 0 or index >= len(self):
+			raise IndexError("Face index out of range")
+		return FFEA_face_view(self.surf, index)
+
+	def __setitem__(self, index, f):
+		face = self[index]
+		face.n = f.n
+		face.elindex = f.elindex
+
+	def __iter__(self):
+		for i in range(len(self)):
+			yield FFEA_face_view(self.surf, i)
+
+class FFEA_face(object):
+
+	# No attributes of its own, so that the views below don't need a __dict__
+	__slots__ = ()
 
 	def __init__(self):
 
@@ -685,3 +741,31 @@ class FFEA_face_tri_sec(FFEA_face):
 
 		self.n = [0,1,2,3,4,5]
 		self.elindex = None
+
+class FFEA_face_view(FFEA_face):
+
+	# A face of a surface, read from and written to its arrays
+	__slots__ = ("surf", "index")
+
+	def __init__(self, surf, index):
+		self.surf = surf
+		self.index = index
+
+	@property
+	def n(self):
+		return self.surf.get_face_nodes(self.index)
+
+	@n.setter
+	def n(self, n):
+		self.surf.set_face_nodes(self.index, n)
+
+	@property
+	def elindex(self):
+		elindex = self.surf.elindex[self.index]
+		if elindex == -1:
+			return None
+		return int(elindex)
+
+	@elindex.setter
+	def elindex(self, elindex):
+		self.surf.elindex[self.index] = -1 if elindex == None else elindex
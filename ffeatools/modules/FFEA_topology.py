@@ -21,12 +21,58 @@
 #  the research papers on the package.
 #
 
-import os, sys
+import os, sys, re
 from time import sleep
 import numpy as np
 import FFEA_surface
 from FFEA_exceptions import *
 
+# Local node indices of the 4 faces of a tetrahedron (face i doesn't have node i in it)
+linear_face_nodes = np.array([[1,3,2], [0,2,3], [0,3,1], [0,1,2]])
+
+# Local indices of the second order nodes on the edges of those faces (sec01, sec02, sec12)
+secondary_face_nodes = np.array([[8,7,9], [5,6,9], [6,4,8], [4,5,7]])
+
+# Local node indices of the 6 edges of a tetrahedron (in the order of the second order nodes)
+linear_edge_nodes = np.array([[0,1], [0,2], [0,3], [1,2], [1,3], [2,3]])
+
+def get_face_keys(faces):
+
+	# One hashable key per face (or edge), the same whatever order the nodes are in
+	faces = np.sort(np.asarray(faces, dtype=np.int64), axis=1)
+	num_nodes = faces.max() + 1 if faces.size else 1
+
+	# Pack into a single integer if it fits, else compare the raw bytes of each row
+	if float(num_nodes) ** faces.shape[1] < 2 ** 63:
+		keys = np.zeros(len(faces), dtype=np.int64)
+		for i in range(faces.shape[1]):
+			keys = keys * num_nodes + faces[:,i]
+		return keys
+	else:
+		return np.ascontiguousarray(faces).view(np.dtype((np.void, faces.itemsize * faces.shape[1]))).ravel()
+
+def get_csr(ids, count, stride):
+
+	# Group the flattened (element, local index) entries by their id. Entry k belongs to element k / stride
+	ptr = np.zeros(len(count) + 1, dtype=np.int64)
+	ptr[1:] = np.cumsum(count)
+	return ptr, np.argsort(ids, kind="mergesort") // stride
+
+def get_positions(node):
+
+	# Node positions (which can be a list) as an (num_nodes x 3) array
+	return np.asarray(node.pos, dtype=float).reshape(-1, 3)
+
+def get_volumes(x, signed=False):
+
+	# Volumes of linear elements, given the positions of their nodes x (num_elements x 4 x 3)
+	e = x[:,1:] - x[:,0][:,np.newaxis]
+	vol = np.einsum("ij,ij->i", e[:,2], np.cross(e[:,1], e[:,0])) / 6.0
+	if signed:
+		return vol
+	else:
+		return np.fabs(vol)
+
 class FFEA_topology:
 
 	def __init__(self, fname = ""):
@@ -101,30 +147,17 @@ class FFEA_topology:
 
 		fin.readline()
 
-		# Read elements now
-		eltype = 0	
-		while(True):
-			sline = fin.readline().split()
-
-			# Get an element
-			try:
-				if sline[0].strip() == "interior":
-					eltype = 1
-					continue
-	
-				elif len(sline) == 4:
-					el = FFEA_element_tet_lin()
-				elif len(sline) == 10:
-					el = FFEA_element_tet_sec()
-
-			except(IndexError):
-				break
-
-			el.set_indices(sline)
-			self.add_element(el, eltype=eltype)
-
+		# Read elements now, straight into the arrays. The surface ones come first, then the interior ones
+		text = re.split(r"^[ \t]*interior.*\n?", fin.read(), maxsplit=1, flags=re.M) + [""]
 		fin.close()
 
+		width = len(text[0].split("\n", 1)[0].split()) or len(text[1].split("\n", 1)[0].split()) or 4
+		surface = FFEA_surface.get_rows(text[0], width)
+		interior = FFEA_surface.get_rows(text[1], width)
+		self.set_connectivity(np.concatenate([surface, interior]), np.repeat([0, 1], [len(surface), len(interior)]))
+		self.num_surface_elements = len(surface)
+		self.num_interior_elements = len(interior)
+
 	def load_vol(self, fname):
 
 		# Open file
@@ -145,26 +178,16 @@ class FFEA_topology:
 		# Read num_elements
 		num_elements = int(fin.readline())
 
-		# Get all elements
-		zeroindexing = False
-		for i in range(num_elements):
-			sline = fin.readline().split()[2:]
-			el = FFEA_element_tet_lin()
-			
-			# Test indices
-			for s in sline:
-				if s.strip() == "0":
-					zeroindexing = True
-					break
- 
-			el.set_indices(sline)
-			self.add_element(el)
+		# Get all elements. Each row is matnr np p1 p2 p3 p4
+		rows = FFEA_surface.get_rows("".join([fin.readline() for i in range(num_elements)]))
+		fin.close()
 
 		# Indexing from 0
-		if not zeroindexing:
-			for i in range(self.num_elements):
-				for j in range(4):
-					self.element[i].n[j] -= 1
+		n = rows[:,2:]
+		if not np.any(n == 0):
+			n -= 1
+		self.set_connectivity(n)
+		self.num_surface_elements = self.num_elements
 
 	def load_ele(self, fname):
 
@@ -181,74 +204,94 @@ class FFEA_topology:
 			raise TypeError
 
 		num_elements = int(sline[0])
-		num_interior_elements = 0
-		num_surface_elements = num_elements
-
-		# Read elements now
-		while(True):
-			sline = fin.readline().split()
-			if sline[0].strip() == "#":
-				break
-
-			sline = sline[1:]
-			# Get an element
-			try:
-				if len(sline) == 4:
-					el = FFEA_element_tet_lin()
-				elif len(sline) == 10:
-					el = FFEA_element_tet_sec()
+		num_nodes = int(sline[1])
 
-			except(IndexError):
-				break
+		# Read elements now, up to the closing comment. Each row is the index, the 4 or 10 nodes and maybe a region attribute
+		text = fin.read()
+		fin.close()
 
-			# Indexing from zero
-			sline = [int(s) - 1 for s in sline]
-			el.set_indices(sline)
-			self.add_element(el)
+		rows = FFEA_surface.get_rows(text.split("#", 1)[0], 1 + num_nodes + int(sline[2]))
 
-		fin.close()
+		# Indexing from zero
+		self.set_connectivity(rows[:,1:1 + num_nodes] - 1)
+		self.num_surface_elements = self.num_elements
 
 	def add_element(self, el, eltype = -1):
 
 		if eltype == -1:
 			self.num_surface_elements += 1
-			el.interior = None
+			interior = -1
 
 		elif eltype == 0:
 			self.num_surface_elements += 1
-			el.interior = False
+			interior = 0
 		else:
 			self.num_interior_elements += 1
-			el.interior = True
+			interior = 1
+
+		# One element at a time copies the arrays, so the loaders set them all at once instead
+		n = [int(i) for i in el.n]
+		width = max(len(n), self.connectivity.shape[1]) if self.num_elements > 0 else len(n)
+		self.set_width(width)
+		n = np.array([n + [-1] * (width - len(n))], dtype=np.int32)
+		self.set_connectivity(np.concatenate([self.connectivity, n]), np.append(self.element_interior, interior))
+
+	def set_connectivity(self, n, interior=-1):
+
+		# Replace all elements at once, given their (num_elements x 4|10) nodes and whether each is interior (1), on the surface (0)
+		# or not known (-1). Linear elements among second order ones have -1 (no node) in place of the second order nodes
+		self.connectivity = np.array(n, dtype=np.int32).reshape(len(n), -1)
+		if self.connectivity.shape[1] == 10 and np.all(self.connectivity[:,4:] == -1):
+			self.connectivity = self.connectivity[:,0:4]
+		self.element_interior = np.empty(len(n), dtype=np.int8)
+		self.element_interior[:] = interior
+		self.num_elements = len(self.connectivity)
+		self.clear_adjacency()
+
+	def set_width(self, width):
 
-		self.element.append(el)
-		self.num_elements += 1
+		# Make room for width nodes per element, with -1 (no node) in the new columns
+		if width > self.connectivity.shape[1]:
+			padding = -1 * np.ones([self.num_elements, width - self.connectivity.shape[1]], dtype=np.int32)
+			self.connectivity = np.hstack([self.connectivity, padding])
+
+	def get_element_nodes(self, index):
+
+		# The nodes of an element, as a view of its row (only the linear ones for a linear element among second order ones)
+		n = self.connectivity[index]
+		if len(n) == 10 and n[4] == -1:
+			return n[0:4]
+		return n
+
+	def set_element_nodes(self, index, n):
+
+		n = np.array(n, dtype=np.int32)
+		self.set_width(len(n))
+		self.connectivity[index] = -1
+		self.connectivity[index,0:len(n)] = n
+		self.clear_adjacency()
+
+	def renumber_nodes(self, nodemap):
+
+		# Give every node i the new index nodemap[i]
+		nodemap = np.asarray(nodemap)
+		self.connectivity = np.where(self.connectivity >= 0, nodemap[self.connectivity], -1).astype(np.int32)
+		self.clear_adjacency()
 
 	def get_num_elements(self):
-		return len(self.element)
+		return len(self.connectivity)
 
 	def get_linear_nodes(self):
 	
-		# Get them all
-		n = []
-		for e in self.element:
-			for index in e.n[0:4]:
-				n.append(index)
-		
-		# Make a list of a set
-		return list(set(n))
+		# All of them, once each
+		return np.unique(self.connectivity[:,0:4]).tolist()
 
 	def calc_CoM(self, node, mat):
 
-		CoM = np.array([0.0,0.0,0.0])
-		eindex = -1
-		total_mass = 0.0
-		for e in self.element:
-			eindex += 1
-			elmass = e.calc_volume(node) * mat.element[eindex][0]
-			total_mass += elmass			
-			CoM += elmass * (np.mean([node.pos[n] for n in e.n[0:4]], axis=0))
-		self.CoM = CoM * 1.0/total_mass
+		x = get_positions(node)[self.get_linear_connectivity()]
+		elmass = get_volumes(x) * np.asarray(mat.element, dtype=float)[:,0]
+		CoM = np.sum(elmass[:,np.newaxis] * np.mean(x, axis=1), axis=0)
+		self.CoM = CoM * 1.0/np.sum(elmass)
 		return self.CoM
 
 	def get_CoM(self):
@@ -256,53 +299,27 @@ class FFEA_topology:
 	
 	def extract_surface(self):
 		
-		faces = []
-		facessorted = []
-		elindex = []
 		surf = FFEA_surface.FFEA_surface()
+		if self.num_elements == 0:
+			return surf
 
-		# Get all faces in entire system. If only occurs once, it's a surface face. Keep the order
-		for i in range(self.num_elements):
-			e = self.element[i]
+		# Get all faces in entire system, in element order. If only occurs once, it's a surface face. Keep the order
+		n = self.connectivity
+		faces = n[:,linear_face_nodes].reshape(-1, 3)
+		elindex = np.repeat(np.arange(self.num_elements), 4)
 
-			if len(e.n) == 10:
-				print("Error. Functionality not yet available for 2nd order elements")
-				return
+		# Faces that occur twice cancel out
+		unique_faces, face_id, count = np.unique(get_face_keys(faces), return_inverse=True, return_counts=True)
 
-			for j in range(4):
-				faces.append(e.get_linear_face(j, obj=False))
-				facessorted.append(sorted(e.get_linear_face(j, obj=False)))
-				elindex.append(i)
+		# Only an odd count leaves a face behind, and it's the last of them that survives
+		order = np.argsort(face_id, kind="mergesort")
+		surface = np.sort(order[np.cumsum(count)[count % 2 == 1] - 1])
 
-		# Now, go through sorted faces and if it occurs twice, delete both from the actual surface
-		run = -1
-		while(facessorted != []):
-			run += 1
-			# Get a face
-			fsort = facessorted.pop(0)					
-			f = faces.pop(0)
-			eind = elindex.pop(0)
-
-			# Is it in the list?
-			if fsort not in facessorted:
-				
-				# It was only there once! Surface face baby
-				sf = FFEA_surface.FFEA_face_tri_lin()
-				sf.set_indices(f, elindex = eind)				
-				surf.add_face(sf)
-			else:
-				# Delete the other face in the list
-				for i in range(len(facessorted)):
-					if facessorted[i] == fsort:
-						index = i
-						break
-				try:
-					facessorted.pop(index)
-					faces.pop(index)
-					elindex.pop(index)
-				except:
-					break
-	
+		# Second order elements give second order faces (lin0, lin1, lin2, sec01, sec02, sec12)
+		if n.shape[1] == 10:
+			faces = np.hstack([faces, n[:,secondary_face_nodes].reshape(-1, 3)])
+
+		surf.set_connectivity(faces[surface], elindex[surface])
 		return surf
 
 	def calculateInterior(self, surf=None):
@@ -313,55 +330,24 @@ class FFEA_topology:
 			return
 
 		# Don't continue if we're already done
-		num_done = 0
-		for e in self.element:
-			if e.interior == None:
-				break
-			else:
-				num_done += 1
-
-		if num_done == self.num_elements:
+		if np.all(self.element_interior != -1):
 			return
 
-		# Set all elements as default to interior elements
-		self.num_interior_elements = self.num_elements
-		self.num_surface_elements = 0
-
-		for i in range(self.num_elements):
-			self.element[i].interior = True
-
-
-		# Now, use surface to work out which are surface elements
-		for i in range(surf.num_faces):
-			if self.element[surf.face[i].elindex].interior:
-				self.element[surf.face[i].elindex].interior = False
-				self.num_interior_elements -= 1
-				self.num_surface_elements += 1
+		# Set all elements as default to interior elements, then use surface to work out which are surface elements
+		interior = np.ones(self.num_elements, dtype=np.int8)
+		elindex = surf.get_elindex()
+		interior[elindex[elindex != -1]] = 0
+		self.num_interior_elements = int(np.sum(interior))
+		self.num_surface_elements = self.num_elements - self.num_interior_elements
 
-		# Get a map, so we know what element wil go where
-		amap = [-1 for i in range(self.num_elements)]
-		index = 0
+		# Get a map, so we know what element wil go where (interior ones first, otherwise in the same order)
+		order = np.argsort(1 - interior, kind="mergesort")
+		amap = np.empty(self.num_elements, dtype=np.int64)
+		amap[order] = np.arange(self.num_elements)
 
-		for i in range(self.num_elements):
-			if self.element[i].interior:
-				amap[i] = index 
-				index += 1
-
-		for i in range(len(amap)):
-			if amap[i] == -1:
-				amap[i] = index
-				index += 1
-
-		# Now, reorder actual elements
-		old_els = self.element
-		self.element = [None for i in range(self.num_elements)]
-
-		for i in range(self.num_elements):
-			self.element[amap[i]] = old_els[i]
-
-		# And reorder the surface indices
-		for i in range(surf.num_faces):
-			surf.face[i].elindex = amap[surf.face[i].elindex]
+		# Now, reorder actual elements, and the surface indices
+		self.set_connectivity(self.connectivity[order], interior[order])
+		surf.elindex = np.where(elindex != -1, amap[elindex], -1).astype(np.int32)
 
 	def isElementInterior(self, index):
 		
@@ -371,278 +357,260 @@ class FFEA_topology:
 			print("Element ", index, " does not exist.")
 			return False
 
-		# First, see if already calculated. Else, set default assumption
+		# First, see if already calculated
 		if testEl.interior != None:
 			return testEl.interior
 
-		else:
-			testEl.interior = False
+		# Element is interior if all of its faces are shared with another element
+		testEl.interior = bool(np.all(self.get_adjacency().face_count[index] > 1))
+		return testEl.interior
 
-		# To test if interior, see if a faces are repeated. If all are, element is interior
-		i = -1
-		faces_not_found = [0,1,2,3]
-		for el in self.element:
-			
-			i += 1
-			el_connected = False
-			faces_to_remove = -1
+	def get_linear_connectivity(self):
 
-			# Same element doesn't count
-			if i == index:
-				continue
-		
-			for j in faces_not_found:
-				testFace = testEl.get_linear_face(j)
-				
-				for k in range(4):
-					face = el.get_linear_face(k)
-
-					if face.isSame(testFace):
-						faces_to_remove = j
-						el_connected = True
-						break
-
-				if el_connected:
-					break
-	
-			try:
-				faces_not_found.remove(faces_to_remove)
-			except:
-				pass
-			if faces_not_found == []:
-				testEl.interior = True
-				break
+		# The 4 linear nodes of every element, as an (num_elements x 4) array
+		return self.connectivity[:,0:4].astype(np.int64)
 
-		return testEl.interior
+	def get_connectivity(self):
+
+		# All nodes of every element, as an (num_elements x 4|10) array
+		return self.connectivity
+
+	def get_adjacency(self):
+
+		# Build the face and edge adjacency of the elements, or reuse it if nothing has changed since
+		if self.adjacency == None or self.adjacency.num_elements != self.num_elements:
+			self.adjacency = FFEA_topology_adjacency(self.get_linear_connectivity())
+
+		return self.adjacency
+
+	def clear_adjacency(self):
+
+		# Must be called whenever the elements are added, removed or renumbered
+		self.adjacency = None
+
+	def get_face_neighbours(self, index):
+
+		# The element on the other side of each face (-1 for surface faces)
+		return self.get_adjacency().face_neighbour[index]
+
+	def get_edge_neighbours(self, index):
+
+		# All other elements sharing at least an edge with this one
+		return self.get_adjacency().get_edge_neighbours(index)
 	
 	def increase_order(self, node = None, surf = None, stokes = None):
 		
 		# Increases the order of this topology, and all of the associated structures (if they exist)
 
 		# Check current order (function currently only for 1st order - 2nd order)
-		for e in self.element:
-			if len(e.n) == 10:
-				print("Error. Increasing to order > 2 is currently not supported")
-				return
-
-		# Get a unique edge list (edge is two nodes, and a potential 3rd node)
-		# Also get num_nodes whilst we're at it (in case node object not provided)
-		edges = []
-		max_node_index = -1 * float("inf")
-		for i in range(self.num_elements):
-			n = self.element[i].n
-			n = sorted(n)
-
-			nmax = max(n)
-			if nmax > max_node_index:
-				max_node_index = nmax
-
-			for j in range(3):
-				for k in range(j + 1, 4):
-					ed = (n[j], n[k], -1)
-					edges.append(ed)
-			
-		edges = list(set(edges))
-
-		# For each edge, add a new midpoint
-		new_edges = []
-		for e in edges:
-			max_node_index += 1
-			new_edge = (e[0], e[1], max_node_index)
-			new_edges.append(new_edge)
-			
-			# Now actually add the nodes if necessary
+		if self.connectivity.shape[1] == 10:
+			print("Error. Increasing to order > 2 is currently not supported")
+			return
 
-			# Stokes 2nd order nodes should have no drag
-			if stokes != None:
-				stokes.add_node(0.0)
-			
-			if node != None:
-				nnpos = 0.5 * (node.pos[e[0]] + node.pos[e[1]])
-				node.add_node(nnpos)
-
-		# Now, rebuild topology (and surface, maybe)
-		# Make a dictionary
-		new_edges = dict(((e[0],e[1]), e[2]) for e in new_edges)
-		for i in range(self.num_elements):
-
-			# Replace element with a second order one
-			self.upgrade_element(i)
-
-			# Get local edges and append nodes to element
-			n = self.element[i].n
-			#n = sorted(n)
-
-			# 6 edges
-			for j in range(3):
-				for k in range(j + 1, 4):
-					ed = (n[j], n[k])
-					try:
-						self.element[i].n.append(new_edges[ed])
-					except(KeyError):
-						ed = (n[k], n[j])
-						self.element[i].n.append(new_edges[ed])
-		# Now surface
+		if self.num_elements == 0:
+			return
+
+		# Get a unique edge list, along with the edges of the surface faces (which should all be in the topology)
+		n = self.get_linear_connectivity()
+		edges = n[:,linear_edge_nodes].reshape(-1, 2)
 		if surf != None:
-			for i in range(surf.num_faces):
-
-				# Replace face with a second order one, then convert to 4 linear ones
-				surf.upgrade_face(i)
-
-				# Get local edges and append nodes to element
-				n = surf.face[i].n
-				#n = sorted(n)
-
-				# 3 edges
-				for j in range(2):
-					for k in range(j + 1, 3):
-						ed = (n[j], n[k])
-						try:
-							surf.face[i].n.append(new_edges[ed])
-						except(KeyError):
-							ed = (n[k], n[j])
-							surf.face[i].n.append(new_edges[ed])
-			# Now make linear again
-			for i in range(surf.num_faces):
-				surf.split_face(0)			# Always zero, as split_face deletes the face at index
+			f = surf.connectivity[:,0:3].astype(np.int64)
+			edges = np.concatenate([edges, f[:,[[0,1], [0,2], [1,2]]].reshape(-1, 2)])
+
+		unique_edges, first, edge_id = np.unique(get_face_keys(edges), return_index=True, return_inverse=True)
+		in_topology = np.zeros(len(unique_edges), dtype=bool)
+		in_topology[edge_id[:6 * self.num_elements]] = True
+		if not np.all(in_topology):
+			raise IndexError("Surface faces have edges that are not in the topology.")
+
+		# Each edge gets a new midpoint node, numbered after all of the current ones
+		edges = edges[first]
+		midpoint = np.max(n) + 1 + np.arange(len(edges))
+		
+		# Now actually add the nodes if necessary
+
+		# Stokes 2nd order nodes should have no drag
+		if stokes != None:
+			stokes.radius.extend([0.0 for i in range(len(edges))])
+			stokes.num_nodes += len(edges)
+
+		if node != None:
+			pos = get_positions(node)
+			nnpos = 0.5 * (pos[edges[:,0]] + pos[edges[:,1]])
+			if isinstance(node.pos, list):
+				node.pos.extend(list(nnpos))
+			else:
+				node.pos = np.concatenate([node.pos, nnpos])
+			node.num_nodes += len(edges)
+			node.num_surface_nodes += len(edges)
+
+		# Now, rebuild topology, with the 6 new nodes in edge order (01, 02, 03, 12, 13, 23)
+		n = np.hstack([n, midpoint[edge_id[:6 * self.num_elements].reshape(-1, 6)]])
+		self.set_connectivity(n, self.element_interior)
+
+		# Now surface. Each face becomes a second order one (lin0, lin1, lin2, sec01, sec02, sec12), which is split into
+		# 4 linear ones (034, 153, 245, 354, as in FFEA_surface.split_face)
+		if surf != None:
+			f = np.hstack([f, midpoint[edge_id[6 * self.num_elements:].reshape(-1, 3)]])
+			f = f[:,[[0,3,4], [1,5,3], [2,4,5], [3,5,4]]].reshape(-1, 3)
+			surf.set_connectivity(f, np.repeat(surf.get_elindex(), 4))
 
 	def upgrade_element(self, index):
 
-		# Replace element with a higher order one
-		e = FFEA_element_tet_sec()
-		e.n = self.element[index].n
-		
-		self.element.insert(index, e)
-		self.element.pop(index + 1)
+		# Make room for the second order nodes of an element. They're -1 (no node), so it's still linear until they're set
+		self.set_width(10)
 
 	def cull_interior(self, limitvol, node, surf=None):
 
+		# Cull interior elements with volume < limitvol by collapsing each one (and the elements sharing an edge with it) to a node at its centroid.
+		# Only elements whose nodes are all interior are culled, so the surface is never changed. 2nd order elements are
+		# culled by their linear nodes, and their midpoint nodes follow them
 		# First, get the interior stuff sorted, if we can
 		self.calculateInterior(surf=surf)
 		node.calculateInterior(top=self, surf=surf)
 
-		# Now, for all interior elements, cull if vol < limitvol
+		# Each sweep collapses all of the small elements that are far enough apart not to affect each other
+		sweeps = []
 		culled_elements = 0
-		completed = False
-		while(not completed):
-			completed = True
+		while(True):
+			nall = self.get_connectivity().astype(np.int64)
+			n = nall[:,0:4]
+			self.adjacency = FFEA_topology_adjacency(n)
+			adj = self.adjacency
+			pos = get_positions(node)
+
+			# Surface nodes are the nodes of faces that aren't shared
+			surface_node = np.zeros(len(pos), dtype=bool)
+			surface_node[n[:,linear_face_nodes][adj.face_count == 1]] = True
+
+			# Get the candidates, smallest first (for stability reasons)
+			vol = get_volumes(pos[n])
+			candidates = np.flatnonzero((vol < limitvol) & ~np.any(surface_node[n], axis=1))
+			candidates = candidates[np.argsort(vol[candidates], kind="mergesort")]
+
+			# A candidate can't be collapsed if any of its nodes are in an element touching one we're already collapsing,
+			# or if moving its nodes to the centroid would turn any of the remaining elements around it inside out
+			locked = np.zeros(len(pos), dtype=bool)
+			collapse = []
+			for i in candidates:
+				if np.any(locked[n[i]]):
+					continue
 
-			for i in range(self.num_elements):
-				e = self.element[i]
-				if not e.interior:
+				ring = adj.get_node_elements(n[i])
+				remaining = np.setdiff1d(ring, np.append(adj.get_edge_neighbours(i), i))
+				x = pos[n[remaining]]
+				movedx = np.copy(x)
+				movedx[np.in1d(n[remaining], n[i]).reshape(-1, 4)] = np.mean(pos[n[i]], axis=0)
+				if np.any(get_volumes(x, signed=True) * get_volumes(movedx, signed=True) <= 0):
 					continue
-		
-				vol = e.calc_volume(node)
-				if vol < limitvol:
-					
-					#completed = False
-
-					# Get the new node to add
-					cent = e.calc_centroid(node)
-					
-					# Get the 4 adjacent elements we need to delete in addition to this one
-					elstodelete = [i]
-					for j in range(self.num_elements):
-						#if e.sharesaface(self.element[j]):
-						#	elstodelete.append(j)
-						if e.sharesanedge(self.element[j]):
-							elstodelete.append(j)
-
-					nodestorenumber = sorted(e.n[0:4])
-
-					# Delete elements (all interior)
-					for j in reversed(elstodelete):
-						self.element.pop(j)
-					self.num_elements -= len(elstodelete)
-					self.num_interior_elements -= len(elstodelete)
-					culled_elements += len(elstodelete)
-
-					# Delete all necessary nodes (not all interior :( )
-					for j in reversed(nodestorenumber):
-						if j < node.num_surface_nodes:
-							node.num_surface_nodes -= 1
-						else:
-							node.num_interior_nodes -= 1
-						
-						try:
-							node.pos.pop(j)
-						except:
-							node.pos = np.delete(node.pos, j, axis=0)
-
-					node.num_nodes -= 4
-
-					# Add new node (which will be interior!) and store new index
-					node.add_node(cent)
-					newnin = node.num_nodes - 1
-
-					# Now renumber all nodes (to new node if in old element, else, to the new position in the node list)
-					for j in range(self.num_elements):
-						for k in range(len(self.element[j].n)):
-							if self.element[j].n[k] in nodestorenumber:
-								self.element[j].n[k] = newnin
-							else:
-								if self.element[j].n[k] < nodestorenumber[0]:
-									pass
-								elif self.element[j].n[k] < nodestorenumber[1]:
-									self.element[j].n[k] -= 1
-								elif self.element[j].n[k] < nodestorenumber[2]:
-									self.element[j].n[k] -= 2
-								elif self.element[j].n[k] < nodestorenumber[3]:
-									self.element[j].n[k] -= 3
-								else:
-									self.element[j].n[k] -= 4
-
-					break
-
-					'''
-					# Cull by replacing element with a node at the center
-					# Add node (it will be interior)				
-					cent = e.calc_centroid()
-					node.add_node(cent, nodetype = 1)
-
-					# Reconnect all old nodes to this node
-					for j in range(self.num_elements):
-						for k in range(4):
-							if self.element[j].n[k] in e.n[0:4]:
-								self.element[j].n[k] = node.num_nodes	# New index
-
-					# Delete all old nodes and element (in reverse order so as to not ruin everything)
-					for n in reversed(sorted(e.n)):
-						node.pop(n)
-						node.num_nodes -= 1
-						node.num_interior_nodes -= 1
-
-					self.element.remove(e)
-					self.num_elements -= 1
-					self.num_interior_elements -= 1
-					break
-					'''
+
+				collapse.append(i)
+				locked[n[ring]] = True
+
+			if collapse == []:
+				break
+
+			# Elements to delete: the collapsed ones, and the ones sharing an edge with them (all interior)
+			collapse = np.array(collapse)
+			elstodelete = np.unique(np.concatenate([collapse] + [adj.get_edge_neighbours(i) for i in collapse]))
+			elkeep = np.ones(self.num_elements, dtype=bool)
+			elkeep[elstodelete] = False
+			elmap = np.cumsum(elkeep) - 1
+			elmap[~elkeep] = -1
+
+			# Delete the 4 nodes of each collapsed element (and any left without an element, like the midpoints of its edges),
+			# and add a new (interior) node at the centroid of each. Map old nodes to new ones
+			nodekeep = np.zeros(len(pos), dtype=bool)
+			nodekeep[nall[elkeep]] = True
+			nodekeep[n[collapse]] = False
+			nodestodelete = np.flatnonzero(~nodekeep)
+			nodemap = np.cumsum(nodekeep) - 1
+			nodemap[n[collapse]] = np.sum(nodekeep) + np.arange(len(collapse))[:,np.newaxis]
+			newpos = np.concatenate([pos[nodekeep], np.mean(pos[n[collapse]], axis=1)])
+
+			# Midpoints of the remaining edges to a collapsed node move with it
+			if nall.shape[1] == 10:
+				moved = np.zeros(len(pos), dtype=bool)
+				moved[n[collapse]] = True
+				m = nodemap[nall[elkeep]]
+				for i, edge in enumerate(linear_edge_nodes):
+					rows = np.any(moved[n[elkeep][:,edge]], axis=1)
+					newpos[m[rows,4 + i]] = 0.5 * (newpos[m[rows,edge[0]]] + newpos[m[rows,edge[1]]])
+
+			num_surface_deleted = np.sum(nodestodelete < node.num_surface_nodes)
+			node.num_surface_nodes -= num_surface_deleted
+			node.num_interior_nodes += len(collapse) - (len(nodestodelete) - num_surface_deleted)
+			node.num_nodes = len(newpos)
+			if isinstance(node.pos, list):
+				node.pos = list(newpos)
+			else:
+				node.pos = newpos
+
+			# Now renumber everything in one go
+			self.set_connectivity(nodemap[nall[elkeep]], self.element_interior[elkeep])
+			self.num_interior_elements -= len(elstodelete)
+
+			if surf != None:
+				surf.renumber_nodes(nodemap)
+				surf.elindex = np.where(surf.elindex != -1, elmap[surf.elindex], -1).astype(np.int32)
+
+			culled_elements += len(elstodelete)
+			sweeps.append((len(candidates), len(collapse), len(elstodelete)))
+			print ("Sweep %d: %d candidates, collapsed %d, culled %d elements and %d nodes." % (len(sweeps), len(candidates), len(collapse), len(elstodelete), len(nodestodelete) - len(collapse)))
+
 		print ("Culled %d elements with volume < %e." % (culled_elements, limitvol))
+		return sweeps
+
+	def get_element_volumes(self, node, scale = 1.0):
+
+		# Volumes of all elements, as an array
+		return get_volumes(get_positions(node)[self.get_linear_connectivity()]) * np.power(scale, 3.0)
 
 	def get_smallest_lengthscale(self, node):
 
+		# Smallest node to opposite plane normal distance of any element
+		if self.num_elements == 0:
+			return float("inf")
+
+		pos = get_positions(node)
+		n = self.get_linear_connectivity()
 		length = float("inf")
-		for e in self.element:
-			new_length = e.get_smallest_lengthscale(node)
-			if new_length < length:
-				length = new_length
+		for i in range(4):
+			f = pos[n[:,linear_face_nodes[i]]]
+			norm = np.cross(f[:,1] - f[:,0], f[:,2] - f[:,0])
+			norm /= np.linalg.norm(norm, axis=1)[:,np.newaxis]
+			distance = np.fabs(np.einsum("ij,ij->i", norm, pos[n[:,i]] - pos[n[:,(i + 1) % 4]]))
+			length = min(length, np.min(distance))
 
 		return length
 
 	def calculate_volume(self, node):
-		vol = 0.0
-		for e in self.element:
-			vol += e.calc_volume(node)
-		return vol
+		return np.sum(self.get_element_volumes(node))
 
 	def calculate_strain_energy(self, frame, frame0, mat):
 		
-		se = 0.0
-		index = 0
-		for el in self.element:
-			se += el.calculate_strain_energy(frame, frame0, mat.element[index])
-			index += 1
-		return se
+		# Jacobians of all elements, now and at the start
+		n = self.get_linear_connectivity()
+		x = get_positions(frame)[n]
+		x0 = get_positions(frame0)[n]
+		J = x[:,1:] - x[:,0][:,np.newaxis]
+		startJ = x0[:,1:] - x0[:,0][:,np.newaxis]
+
+		F = np.matmul(J, np.linalg.inv(startJ))
+		F = F.transpose(0, 2, 1)
+		dF = np.linalg.det(F)
+		matel = np.asarray(mat.element, dtype=float)
+		G = matel[:,3]
+		K = matel[:,4]
+		C = K - (2.0/3.0) * G
+
+		# Energy terms
+		se = 0.5 * G * (np.sum(F * F, axis=(1, 2)) - 3)
+		se += (C / 4.0) * (dF**2 - 1)
+		se -= (0.5 * C + G) * np.log(dF)
+
+		# Scale by volume
+		return np.sum(se * get_volumes(x0))
 
 	def print_details(self):
 
@@ -651,8 +619,7 @@ class FFEA_topology:
 		print ("num_interior_elements = %d" % (self.num_interior_elements))
 		sleep(1)
 
-		for e in self.element:
-			index = self.element.index(e)
+		for index, e in enumerate(self.element):
 			outline = "Element " + str(index) + " "
 			if(index < self.num_surface_elements):
 				outline += "(Surface): "
@@ -704,13 +671,7 @@ class FFEA_topology:
 		print("done!")
 
 	def calc_mass(self, mat, node, scale = 1.0):
-	
-		mass = 0.0
-		index = 0
-		for e in self.element:
-			mass += e.calc_volume(node, scale) * mat.element[index][0]
-			index += 1
-		return mass
+		return np.sum(self.get_element_volumes(node, scale) * np.asarray(mat.element, dtype=float)[:,0])
 
 	# Takes index list of type intype ("node", "surf" etc) and returns the element list corresponding to those
 	def index_switch(self, inindex, intype, limit=1, surf=None):
@@ -737,15 +698,99 @@ class FFEA_topology:
 	def reset(self):
 
 		self.CoM = None
-		self.element = []
+		self.element = FFEA_element_list(self)
 		self.num_elements = 0
 		self.num_surface_elements = 0
 		self.num_interior_elements = 0
 		self.valid = False
 		self.empty = True
 		self.linear_elemnode_list = []
+		self.adjacency = None
+		self.connectivity = np.zeros([0, 4], dtype=np.int32)
+		self.element_interior = np.zeros(0, dtype=np.int8)
+
+class FFEA_topology_adjacency:
+
+	def __init__(self, n):
+
+		# Face and edge adjacency of a set of elements, given their (num_elements x 4) linear nodes.
+		# Faces and edges are numbered uniquely, and stored as CSR arrays: the elements touching
+		# face f are face_elements[face_ptr[f]:face_ptr[f + 1]] (same for edges)
+		self.num_elements = len(n)
+
+		# Faces
+		faces = n[:,linear_face_nodes].reshape(-1, 3)
+		unique_faces, face_id, count = np.unique(get_face_keys(faces), return_inverse=True, return_counts=True)
+		self.element_faces = face_id.reshape(-1, 4)
+		self.face_ptr, self.face_elements = get_csr(face_id, count, 4)
+		self.face_count = count[self.element_faces]
+
+		# The element on the other side of each face (-1 on the surface)
+		self.face_neighbour = -1 * np.ones([self.num_elements, 4], dtype=np.int64)
+		first = self.face_elements[self.face_ptr[:-1]]
+		last = self.face_elements[self.face_ptr[1:] - 1]
+		shared = self.face_count == 2
+		own = np.arange(self.num_elements)[:,np.newaxis]
+		other = np.where(first[self.element_faces] == own, last[self.element_faces], first[self.element_faces])
+		self.face_neighbour[shared] = other[shared]
+
+		# Edges
+		edges = n[:,linear_edge_nodes].reshape(-1, 2)
+		unique_edges, edge_id, count = np.unique(get_face_keys(edges), return_inverse=True, return_counts=True)
+		self.element_edges = edge_id.reshape(-1, 6)
+		self.edge_ptr, self.edge_elements = get_csr(edge_id, count, 6)
+
+		# Nodes
+		count = np.bincount(n.ravel(), minlength=n.max() + 1 if n.size else 0)
+		self.node_ptr, self.node_elements = get_csr(n.ravel(), count, 4)
+
+	def get_edge_neighbours(self, index):
+
+		# All other elements sharing at least one of this element's edges
+		neighbours = np.concatenate([self.edge_elements[self.edge_ptr[e]:self.edge_ptr[e + 1]] for e in self.element_edges[index]])
+		neighbours = np.unique(neighbours)
+		return neighbours[neighbours != index]
+
+	def get_node_elements(self, nodes):
 
-class FFEA_element:
+		# All elements containing any of these nodes
+		return np.unique(np.concatenate([self.node_elements[self.node_ptr[i]:self.node_ptr[i + 1]] for i in nodes]))
+
+class FFEA_element_list(object):
+
+	# The elements of a topology, as views made when asked for
+	__slots__ = ("top",)
+
+	def __init__(self, top):
+		self.top = top
+
+	def __len__(self):
+		return len(self.top.connectivity)
+
+	def __getitem__(self, index):
+		if isinstance(index, slice):
+			return [FFEA_element_view(self.top, i) for i in range(*index.indices(len(self)))]
+
+		index = int(index)
+		if index < 0:
+			index += len(self)
+		if index < 0 or index >= len(self):
+			raise IndexError("Element index out of range")
+		return FFEA_element_view(self.top, index)
+
+	def __setitem__(self, index, el):
+		e = self[index]
+		e.n = el.n
+		e.interior = el.interior
+
+	def __iter__(self):
+		for i in range(len(self)):
+			yield FFEA_element_view(self.top, i)
+
+class FFEA_element(object):
+
+	# No attributes of its own, so that the views below don't need a __dict__
+	__slots__ = ()
 
 	def __init__(self):
 
@@ -892,3 +937,31 @@ class FFEA_element_tet_sec(FFEA_element):
 
 		self.n = [0,1,2,3,4,5,6,7,8,9]
 		self.interior = None
+
+class FFEA_element_view(FFEA_element):
+
+	# An element of a topology, read from and written to its arrays
+	__slots__ = ("top", "index")
+
+	def __init__(self, top, index):
+		self.top = top
+		self.index = index
+
+	@property
+	def n(self):
+		return self.top.get_element_nodes(self.index)
+
+	@n.setter
+	def n(self, n):
+		self.top.set_element_nodes(self.index, n)
+
+	@property
+	def interior(self):
+		interior = self.top.element_interior[self.index]
+		if interior == -1:
+			return None
+		return bool(interior)
+
+	@interior.setter
+	def interior(self, interior):
+		self.top.element_interior[self.index] = -1 if interior == None else interior
@@ -21,14 +21,18 @@
 #  the research papers on the package.
 #
 
+import os, time
 from os import path
+from collections import OrderedDict
+import multiprocessing
+from multiprocessing import sharedctypes
 import numpy as np
-import FFEA_frame, FFEA_pdb
-import sys
+import FFEA_frame, FFEA_pdb, FFEA_binary_trajectory
+import sys, re
 
 class FFEA_trajectory:
 
-	def __init__(self, fname="", surf=None, load_all=1, frame_rate = 1, num_frames_to_read = 1000000, start = 0, onlyNodes = False):
+	def __init__(self, fname="", surf=None, load_all=1, frame_rate = 1, num_frames_to_read = 1000000, start = 0, onlyNodes = False, lazy = False, cache_size = 100, num_processes = 1, dense = False, dtype = np.float64):
 
 		self.reset()
 
@@ -38,14 +42,26 @@ class FFEA_trajectory:
 			sys.stdout.write("Empty trajectory object initialised.\n")
 			return
 
-		self.load(fname, load_all=load_all, surf=surf, frame_rate = frame_rate, num_frames_to_read = num_frames_to_read, start = start, onlyNodes = onlyNodes)
+		self.load(fname, load_all=load_all, surf=surf, frame_rate = frame_rate, num_frames_to_read = num_frames_to_read, start = start, onlyNodes = onlyNodes, lazy = lazy, cache_size = cache_size, num_processes = num_processes, dense = dense, dtype = dtype)
 
 		return	
 		
-	def load(self, fname, surf=None, load_all=1, frame_rate = 1, num_frames_to_read = 1000000, start = 0, onlyNodes = False):
+	def load(self, fname, surf=None, load_all=1, frame_rate = 1, num_frames_to_read = 1000000, start = 0, onlyNodes = False, lazy = False, cache_size = 100, num_processes = 1, dense = False, dtype = np.float64):
 
+		"""
+		Load a trajectory (.ftj, or binary .ftb). lazy only indexes the
+		frames, decoding each when it is used, and cannot be combined with
+		dense, which keeps the frames of each blob/conformation in one array
+		(see set_dense). dense works with every other option, including .ftb
+		files, whose frames are then copied out of the memory map. dtype is
+		the type of the dense arrays (np.float32 halves their size).
+		num_processes and lazy only apply to .ftj files.
+		"""
 		print("Loading FFEA trajectory file...")
 
+		if dense and lazy:
+			raise ValueError("\tA trajectory cannot be both lazy and dense. Please choose one.")
+
 		# Test file exists
 		if not path.exists(fname):
 			raise IOError("No trajectory found at that location")
@@ -53,11 +69,34 @@ class FFEA_trajectory:
 		# Clear everything for beginning
 		self.reset()
 
+		# Binary trajectories are mapped, not parsed
+		if path.splitext(fname)[1] == ".ftb":
+			self.load_binary(fname, load_all=load_all, frame_rate = frame_rate, num_frames_to_read = num_frames_to_read, start = start)
+			if dense:
+				self.set_dense(onlyNodes = True, dtype = dtype)
+			return
+
 		# Header first, for sure
 		self.load_header(fname)
 
+		# Frames go into one array per blob/conformation rather than objects
+		if dense:
+			self.set_dense(onlyNodes = onlyNodes, dtype = dtype)
+
+		# Frames are only read when asked for
+		if lazy:
+			self.load_lazy(fname, frame_rate = frame_rate, num_frames_to_read = num_frames_to_read, start = start, onlyNodes = onlyNodes, cache_size = cache_size)
+
+		# Split the frames between processes
+		elif(load_all == 1 and num_processes > 1):
+			self.load_parallel(fname, frame_rate = frame_rate, num_frames_to_read = num_frames_to_read, start = start, surf = surf, onlyNodes = onlyNodes, num_processes = num_processes)
+
+		# Jump straight to the wanted frames rather than parsing the ones in between
+		elif(load_all == 1 and (start > 0 or frame_rate > 1)):
+			self.load_indexed(fname, frame_rate = frame_rate, num_frames_to_read = num_frames_to_read, start = start, surf = surf, onlyNodes = onlyNodes)
+
 		# Then rest of trajectory.
-		if(load_all == 1):
+		elif(load_all == 1):
 			all_frames = 0
 			while(True):
 
@@ -141,10 +180,189 @@ class FFEA_trajectory:
 			pass
 
 		self.fpos = self.traj.tell()
+		self.fname = fname
+		self.header_end = self.fpos
 		
 		# Finally, build the objects
 		self.blob = [[FFEA_traj_blob(self.num_nodes[i][j]) for j in range(self.num_conformations[i])] for i in range(self.num_blobs)]
 
+	def load_binary(self, fname, load_all=1, frame_rate = 1, num_frames_to_read = 1000000, start = 0):
+		"""
+		Load a binary trajectory (.ftb, see FFEA_binary_trajectory). Each
+		blob/conformation is memory mapped once, and every frame's pos is a
+		view into that map, so nothing is parsed or copied.
+		"""
+		btraj = FFEA_binary_trajectory.FFEA_binary_trajectory(fname)
+		self.set_header(btraj.num_blobs, btraj.num_conformations, btraj.num_nodes)
+
+		if load_all == 1:
+			frames = btraj.get_frames()
+			nrows = btraj.get_num_rows(frames)
+			findex = np.arange(start, min(btraj.num_frames, start + num_frames_to_read), frame_rate)
+			static = FFEA_binary_trajectory.motion_state_code["STATIC"]
+
+			for i in range(self.num_blobs):
+				for j in range(self.num_conformations[i]):
+					pos = btraj.get_positions(i, j, nrows = nrows[i][j])
+					rows = btraj.get_row_index(i, j, frames = frames)
+					b = self.blob[i][j]
+					for f in findex:
+						if frames["conformation"][f,i] != j:
+							b.frame.append(None)
+							continue
+
+						b.motion_state = FFEA_binary_trajectory.motion_state_name[frames["motion_state"][f,i]]
+						if rows[f] == -1:
+							b.frame.append(None)
+							continue
+
+						frame = FFEA_frame.FFEA_frame()
+						frame.num_nodes = b.num_nodes
+						frame.num_surface_nodes = b.num_nodes
+						frame.pos = pos[rows[f]]
+						frame.set_step(int(frames["step"][f]))
+						b.frame.append(frame)
+
+			self.num_frames = len(findex)
+			print("done! Successfully read " + str(self.num_frames) + " frame/s from '" + fname + "'.")
+
+		self.valid = True
+		self.empty = False
+
+	def load_lazy(self, fname, frame_rate = 1, num_frames_to_read = 1000000, start = 0, onlyNodes = False, cache_size = 100):
+		"""
+		Index the frames of the trajectory (or reuse the '.idx' file next to
+		it) and replace every blob's frame list with one that only decodes a
+		frame when it is indexed. The last cache_size decoded frames are kept.
+		The header must already be loaded.
+		"""
+		self.index = FFEA_traj_index(fname)
+		self.frame_index = np.arange(start, min(self.index.num_frames, start + num_frames_to_read), frame_rate)
+		self.num_frames = len(self.frame_index)
+		self.lazy_onlyNodes = onlyNodes
+		self.lazy_cache = OrderedDict()
+		self.lazy_cache_size = max(cache_size, 1)
+
+		for i in range(self.num_blobs):
+			for j in range(self.num_conformations[i]):
+				self.blob[i][j].frame = FFEA_traj_lazy_frames(self, i, j)
+
+		print("done! Indexed " + str(self.num_frames) + " frame/s from '" + fname + "'.")
+
+	def load_indexed(self, fname, frame_rate = 1, num_frames_to_read = 1000000, start = 0, surf = None, onlyNodes = False):
+		"""
+		Load the selected frames only, seeking to each using the frame index
+		instead of parsing every frame before start and in between. The
+		header must already be loaded.
+		"""
+		self.index = FFEA_traj_index(fname)
+		start = int(start)
+		self.frame_index = np.arange(start, min(self.index.num_frames, start + int(num_frames_to_read)), int(frame_rate))
+
+		for i in self.frame_index:
+			self.traj.seek(self.index.offset[i])
+			self.fpos = self.index.offset[i]
+			if self.load_frame(surf=surf, onlyNodes=onlyNodes) != 0:
+				break
+
+			sys.stdout.write("\r\tFrames read = %d, Frames skipped = %d" % (self.num_frames, i + 1 - self.num_frames))
+			sys.stdout.flush()
+
+		# Leave the file at the end of the last indexed frame
+		self.traj.seek(self.index.offset[-1])
+		self.fpos = self.index.offset[-1]
+		print("\ndone! Successfully read " + str(self.num_frames) + " frame/s from '" + fname + "'.")
+
+	def load_parallel(self, fname, frame_rate = 1, num_frames_to_read = 1000000, start = 0, surf = None, onlyNodes = False, num_processes = 4):
+		"""
+		Decode the frames in num_processes worker processes. The frames are
+		split into contiguous ranges using the frame index, and each worker
+		writes node data straight into shared arrays, one
+		(frames, max_nodes, 3) array per blob. Every frame's pos (and vel) is
+		a view into those arrays. The header must already be loaded. surf is
+		treated as by load_frame, i.e. normals are not calculated on load.
+		"""
+		self.index = FFEA_traj_index(fname)
+		self.frame_index = np.arange(start, min(self.index.num_frames, start + num_frames_to_read), frame_rate)
+		num_frames = len(self.frame_index)
+
+		# Shared memory for the workers to fill in
+		num_arrays = 1 if onlyNodes else 2
+		shared = []
+		for i in range(self.num_blobs):
+			size = num_frames * max(self.num_nodes[i]) * 3
+			shared.append([sharedctypes.RawArray("d", max(size, 1)) for j in range(num_arrays)])
+
+		# A few ranges per process, to even out the load
+		num_ranges = min(num_frames, 4 * num_processes)
+		bounds = np.linspace(0, num_frames, num_ranges + 1).astype(int)
+		tasks = [(fname, onlyNodes, bounds[i], self.index.offset[self.frame_index[bounds[i]:bounds[i + 1]]]) for i in range(num_ranges)]
+
+		pool = multiprocessing.Pool(num_processes, initializer=_init_parallel_worker, initargs=(self.num_blobs, self.num_conformations, self.num_nodes, num_frames, shared))
+		try:
+			results = pool.map(_read_frame_range, tasks)
+		finally:
+			pool.close()
+			pool.join()
+
+		# Now build ordinary frames around the shared data
+		arrays = _wrap_shared_arrays(shared, self.num_nodes, num_frames)
+		findex = 0
+		for result in results:
+			for bframes in result:
+				for bindex in range(self.num_blobs):
+					cindex, motion_state, step = bframes[bindex]
+					frame = None
+					if motion_state != "STATIC":
+						num_nodes = self.blob[bindex][cindex].num_nodes
+						frame = FFEA_frame.FFEA_frame()
+						frame.num_nodes = num_nodes
+						frame.num_surface_nodes = num_nodes
+						frame.pos = arrays[bindex][0][findex,:num_nodes]
+						if not onlyNodes:
+							frame.vel = arrays[bindex][1][findex,:num_nodes]
+						frame.set_step(step)
+					bframes[bindex] = [cindex, motion_state, frame]
+
+				self.append_frame(bframes)
+				findex += 1
+
+		print("done! Successfully read " + str(self.num_frames) + " frame/s from '" + fname + "' using " + str(num_processes) + " processes.")
+
+	def get_lazy_frame(self, index):
+		"""
+		Returns frame 'index' of the trajectory file (not of the frames
+		selected by load) in the form given by read_frame, decoding it if it
+		is not cached.
+		"""
+		try:
+			bframes = self.lazy_cache.pop(index)
+
+		except(KeyError):
+			self.traj.seek(self.index.offset[index])
+			bframes = self.read_frame(self.traj, onlyNodes=self.lazy_onlyNodes)
+			if bframes == None:
+				raise IOError("\tFailed to read frame " + str(index) + ". The trajectory may have changed since it was indexed.")
+
+			for bindex in range(self.num_blobs):
+				self.blob[bindex][bframes[bindex][0]].motion_state = bframes[bindex][1]
+
+			if len(self.lazy_cache) >= self.lazy_cache_size:
+				self.lazy_cache.popitem(last=False)
+
+		self.lazy_cache[index] = bframes
+		return bframes
+
+	def set_dense(self, onlyNodes = False, dtype = np.float64):
+		"""
+		Store the frames of every blob/conformation in a single growing
+		(frames, num_nodes, 3) array of type dtype (see
+		FFEA_traj_dense_frames). Frames already loaded are copied across.
+		"""
+		for b in self.blob:
+			for c in b:
+				c.set_dense(onlyNodes = onlyNodes, dtype = dtype)
+
 	# Manually set header data
 	def set_header(self, num_blobs, num_conformations, num_nodes):
 
@@ -157,22 +375,42 @@ class FFEA_trajectory:
 
 	# This function must be run as fast as possible! Error checking will be at a minimum. This function is standalone so it can be threaded
 	def load_frame(self, surf=None, onlyNodes=False):
-	
-		# For each blob
-		eof = False
-		bindex = -1
-		for b in self.blob:
+
+		bframes = self.read_frame(self.traj, onlyNodes=onlyNodes)
+
+		# We are at eof, or halfway through a frame being written
+		if bframes == None:
+			self.traj.seek(self.fpos)
+			return 1
+
+		self.append_frame(bframes)
+		self.fpos = self.traj.tell()
+		return 0
+
+	def read_frame(self, fo, onlyNodes=False, blobs=None, frames=None):
+		"""
+		Read the frame starting at the current position of fo, without
+		storing it anywhere.
+		In: fo, an open trajectory file object, optionally the indices of
+		the only blobs whose nodes should be decoded, and frames, a dict of
+		(blob, conformation) -> FFEA_frame to decode the nodes straight
+		into. Frames it doesn't have yet are made and added to it.
+		Out: a [conformation index, motion state, FFEA_frame (None if STATIC
+		or not wanted)] list per blob, or None if the frame is incomplete,
+		in which case fo is returned to where it started.
+		"""
+		start = fo.tell()
+		bframes = []
+		for bindex in range(self.num_blobs):
 			try:
 				# Get indices
-				bindex += 1
-
-				sline = self.traj.readline().split()
-				cindex = int(sline[3][0])
+				sline = fo.readline().split()
+				cindex = int(sline[3].rstrip(","))
 				step = int(sline[5])
 
 			except(IndexError):
-				self.traj.seek(self.fpos)
-				return 1
+				fo.seek(start)
+				return None
     
     	# ye who enter here: do not 'fix' this! The script is not handling an
 	# exception poorly, it is asking for forgiveness, not permission.
@@ -182,70 +420,202 @@ class FFEA_trajectory:
 			except(ValueError):
 
 				# Don't need to reset though!
-				self.traj.seek(self.fpos)
+				fo.seek(start)
 				print("Unable to read conformation index for blob " + str(bindex) + " at frame " + str(self.num_frames))
-				return 1
+				return None
 				
 			# Get a motion_state
-			b[cindex].motion_state = self.traj.readline().strip()
-			#if self.traj.readline().strip() == "DYNAMIC":
-		#		b[cindex].motion_state = "DYNAMIC"
-		#		frame = FFEA_frame.FFEA_frame()
-		#	else:
-		#		b[cindex].motion_state = "STATIC"
-		#		frame = b[cindex].frame[0]
-		#		continue
+			motion_state = fo.readline().strip()
 
 			# Do different things depending on motion state recieved
-			if b[cindex].motion_state == "STATIC":
+			if motion_state == "STATIC":
 				
 				# Nothing to read; frame cannot be read from trajectory
 				frame = None
 
+			elif blobs != None and bindex not in blobs:
+
+				# Not wanted, so step over the nodes without decoding them
+				frame = None
+				line = "\n"
+				for i in range(self.blob[bindex][cindex].num_nodes):
+					line = fo.readline()
+				if not line.endswith("\n"):
+					fo.seek(start)
+					return None
+
 			else:
 
-				# Get a frame
-				frame = FFEA_frame.FFEA_frame()
-				frame.num_nodes = b[cindex].num_nodes
+				# Get a frame, or reuse the one we were given
+				reuse = frames != None and (bindex, cindex) in frames
+				if reuse:
+					frame = frames[(bindex, cindex)]
+				else:
+					frame = FFEA_frame.FFEA_frame()
+					if frames != None:
+						frames[(bindex, cindex)] = frame
+				frame.num_nodes = self.blob[bindex][cindex].num_nodes
 
 				# Try to read stuff
 				if onlyNodes == True:
-					success = frame.load_from_traj_onlynodes_faster(self.traj)
+					success = frame.load_from_traj_onlynodes_faster(fo, reuse = reuse)
 				else:
-					success = frame.load_from_traj_faster(self.traj)
+					success = frame.load_from_traj_faster(fo, reuse = reuse)
 			
 				# We are at eof, or halfway through a frame being written
 				if success == 1:
-					eof = True
-					break
+					fo.seek(start)
+					return None
 				
 				frame.set_step(step)
 
-				# Load normals if necessary
-				#if surf != None:
-				#	frame.calc_normals(surf[bindex][cindex])
+			bframes.append([cindex, motion_state, frame])
 
+		# Gloss over kinetics stuff
+		fo.readline()
+		while(True):
+			line = fo.readline()
+			if line == "":
+				fo.seek(start)
+				return None
+			if line.strip() == "*":
+				break
 
-			# Append frame
-			b[cindex].frame.append(frame)
+		return bframes
 
-			# Append None to all frames that aren't active
+	def iter_frames(self, start = 0, stop = None, stride = 1, blobs = None, onlyNodes = False, reuse = False):
+		"""
+		Generator over the frames of the trajectory file. Frames are never
+		stored in the trajectory object, so memory use does not grow with
+		the length of the trajectory. The header must already be loaded
+		(e.g. load_all = 0).
+		In: start, stop and stride (in frames), blobs (indices of the blobs
+		to decode, all by default), onlyNodes, and reuse, which yields the
+		same frame objects every time, decoding each frame's nodes straight
+		into their arrays.
+		Yields: for each requested blob, a list with the frame of each
+		conformation (None if inactive or STATIC), laid out like
+		blob[b][c].frame[i].
+		"""
+		if blobs == None:
+			blobs = range(self.num_blobs)
+
+		# Reading straight through doesn't need the frame index
+		if start == 0 and stride == 1:
+			offsets = None
+			num_frames = stop
+		else:
+			self.index = FFEA_traj_index(self.fname)
+			offsets = self.index.offset[start:self.index.num_frames:stride]
+			if stop != None:
+				offsets = offsets[:max(0, (stop - start + stride - 1) // stride)]
+			num_frames = len(offsets)
+
+		buf = {} if reuse else None
+		fin = open(self.fname, "r")
+		try:
+			fin.seek(self.header_end)
+			findex = 0
+			while num_frames == None or findex < num_frames:
+
+				if offsets is not None:
+					fin.seek(offsets[findex])
+
+				bframes = self.read_frame(fin, onlyNodes=onlyNodes, blobs=blobs, frames=buf)
+				if bframes == None:
+					break
+
+				out = []
+				for bindex in blobs:
+					cindex, motion_state, frame = bframes[bindex]
+					self.blob[bindex][cindex].motion_state = motion_state
+					out.append([frame if c == cindex else None for c in range(self.num_conformations[bindex])])
+
+				yield out
+				findex += 1
+		finally:
+			fin.close()
+
+	def follow(self, fname = None, poll_interval = 1.0, timeout = None, callbacks = [], onlyNodes = False, store = True):
+		"""
+		Generator over the frames appended to a trajectory that is still
+		being written, e.g. by a running simulation. Carries on from the
+		last frame read (from the start if only the header was loaded, or
+		nothing at all was, in which case fname is needed and the header
+		is waited for). The file is polled every poll_interval seconds and
+		only newly completed frames are decoded; half-written ones are
+		left until they are finished.
+		In: fname, poll_interval, timeout (stop after this many seconds
+		without a new frame; None waits forever), callbacks (each called
+		as callback(traj, bframes) for every new frame), onlyNodes, and
+		store (append the new frames to the trajectory, as load does).
+		Yields: the frame as returned by read_frame, a
+		[conformation index, motion state, FFEA_frame] list per blob.
+		"""
+		if store and self.lazy_cache != None:
+			raise ValueError("\tCannot store followed frames in a lazily loaded trajectory. Use store = False.")
+
+		last_change = time.time()
+
+		# Wait for the simulation to write the header
+		if self.traj == None:
+			if fname == None:
+				raise IOError("\tNo trajectory to follow. Please supply a filename.")
+
+			while not path.exists(fname) or "\n*\n" not in open(fname, "r").read(1 << 16):
+				if timeout != None and time.time() - last_change > timeout:
+					return
+				time.sleep(poll_interval)
+			self.load_header(fname)
+			self.valid = True
+			self.empty = False
+
+		# Frames located with the index were not read in order
+		if self.index != None:
+			self.fpos = self.index.offset[-1]
+		self.traj.seek(self.fpos)
+
+		size = -1
+		while(True):
+
+			# Only try to read when something has been written since last time
+			new_size = path.getsize(self.fname)
+			if new_size != size:
+				size = new_size
+				bframes = self.read_frame(self.traj, onlyNodes=onlyNodes)
+				if bframes != None:
+					self.fpos = self.traj.tell()
+					if store:
+						self.append_frame(bframes)
+					for callback in callbacks:
+						callback(self, bframes)
+
+					last_change = time.time()
+					size = -1
+					yield bframes
+					continue
+
+			if timeout != None and time.time() - last_change > timeout:
+				return
+			time.sleep(poll_interval)
+
+	def append_frame(self, bframes):
+		"""
+		Store a frame returned by read_frame.
+		"""
+		for bindex in range(self.num_blobs):
+			cindex, motion_state, frame = bframes[bindex]
+			b = self.blob[bindex]
+			b[cindex].motion_state = motion_state
+
+			# Append frame, and None to all conformations that aren't active
 			for c in range(self.num_conformations[bindex]):
-				if c != cindex:
+				if c == cindex:
+					b[c].frame.append(frame)
+				else:
 					b[c].frame.append(None)
 
-		if not eof:
-		
-			# Gloss over kinetics stuff
-			self.traj.readline()
-			while(self.traj.readline().strip() != "*"):
-				pass
-
-			self.num_frames += 1
-			self.fpos = self.traj.tell()
-			return 0
-		else:
-			self.traj.seek(self.fpos)
+		self.num_frames += 1
 
 	def rescale(self, factor, frame_index):
 
@@ -288,21 +658,23 @@ class FFEA_trajectory:
 			raise
 			
 	def build_from_pdb(self, pdb, scale = 1e-10):
-
+		"""
+		Single blob trajectory of the first chain of a pdb. The frames are
+		views of the pdb's positions (see FFEA_frame.get_view), scaled from
+		Angstroms to metres when read, so nothing is copied and the pdb is
+		left as it is.
+		"""
 		self.reset()
 
 		# Single blob single conf
 		self.set_header(1, [1], [[pdb.chain[0].num_atoms]])
 
-		# Get all frames in one go (they're the same core objects) 
 		self.blob[0][0].num_nodes = pdb.chain[0].num_atoms
-		self.blob[0][0].frame = pdb.chain[0].frame
-		
-		index = 0
-		for f in self.blob[0][0].frame:
-			f.pos *= scale
+		self.blob[0][0].frame = []
+		for index in range(pdb.chain[0].num_frames):
+			f = pdb.chain[0].frame[index].get_view(scale)
 			f.set_step(index)
-			index += 1
+			self.blob[0][0].frame.append(f)
 
 		self.num_frames = pdb.chain[0].num_frames
 		self.valid = True
@@ -357,26 +729,78 @@ class FFEA_trajectory:
 		self.blob = []
 		self.valid = False
 		self.empty = True
+		self.index = None
+		self.frame_index = None
+		self.lazy_cache = None
+		self.fname = ""
+		self.header_end = 0
 		
-	def write_to_file(self, fname, frames=None, frame_rate = 1):
+	def write_to_file(self, fname, frames=None, frame_rate = 1, dtype = np.float64):
 
 		print("Writing trajectory to file\n\tData will be written to %s\n" % (fname))
 
-		# Get a file object
-		fout = open(fname, "w")
-		
-		# Write header info
-		self.write_header_to_file(fout)
-
 		# Write frames
 		if frames == None:
 			frames = [0,self.num_frames]
 
+		# Binary trajectories have their own writer
+		if path.splitext(fname)[1] == ".ftb":
+			self.write_binary(fname, frames = frames, frame_rate = frame_rate, dtype = dtype)
+			return
+
+		# Get a file object. Frames are written whole, so buffer plenty of them
+		fout = open(fname, "w", 1 << 22)
+		
+		# Write header info
+		self.write_header_to_file(fout)
+
 		for i in range(frames[0], frames[1], frame_rate):
 			self.write_frame_to_file(fout, i)
 
 		fout.close()
 
+	def write_binary(self, fname, frames=None, frame_rate = 1, dtype = np.float64):
+		"""
+		Write the frames to a binary trajectory (.ftb, see
+		FFEA_binary_trajectory). Only positions are stored.
+		"""
+		if frames == None:
+			frames = [0,self.num_frames]
+
+		btraj = FFEA_binary_trajectory.FFEA_binary_trajectory()
+		btraj.create(fname, self.num_blobs, self.num_conformations, self.num_nodes, dtype = dtype)
+		for i in range(frames[0], min(frames[1], self.num_frames), frame_rate):
+			step = 0
+			conformation = []
+			motion_state = []
+			pos = []
+			for b in self.blob:
+				cindex, frame = self.get_active_frame(b, i)
+				conformation.append(cindex)
+				if frame == None or b[cindex].motion_state == "STATIC":
+					motion_state.append("STATIC")
+					pos.append(None)
+				else:
+					motion_state.append(b[cindex].motion_state)
+					pos.append(frame.get_pos())
+					step = frame.step
+
+			btraj.append_frame(step, conformation, motion_state, pos)
+
+		btraj.close()
+
+	def get_active_frame(self, b, index):
+		"""
+		The active conformation of a blob at a frame, and its frame (None if
+		there isn't one, e.g. STATIC blobs, or index is out of range).
+		"""
+		if index < self.num_frames:
+			for cindex in range(len(b)):
+				frame = b[cindex].frame[index]
+				if frame is not None:
+					return cindex, frame
+		return 0, None
+
 	def write_header_to_file(self, fout):
 
 		
@@ -396,45 +820,38 @@ class FFEA_trajectory:
 		if index >= self.num_frames:
 			return
 
+		# Build the whole frame, then write it at once
+		out = []
+
 		# Traj data
 		cur_conf = []
-		bindex = -1
-		for b in self.blob:
-			bindex += 1
-			cindex = -1
-			for c in b:
-				cindex += 1
+		for bindex in range(self.num_blobs):
+			for cindex in range(self.num_conformations[bindex]):
+				c = self.blob[bindex][cindex]
 				if c.motion_state == "STATIC":
-					fout.write("Blob %d, Conformation %d, step %d\nSTATIC\n" % (bindex, cindex, 0))
+					out.append("Blob %d, Conformation %d, step %d\nSTATIC\n" % (bindex, cindex, 0))
 					cur_conf.append(0)
 					break
-				else:
-					if c.frame[index] == None:
-						continue
-				
-					cur_conf.append(cindex)
-					fout.write("Blob %d, Conformation %d, step %d\n" % (bindex, cindex, c.frame[index].step))
-					fout.write(c.motion_state + "\n")
-					c.frame[index].write_to_traj(fout)
+
+				frame = c.frame[index]
+				if frame is None:
+					continue
+
+				cur_conf.append(cindex)
+				out.append("Blob %d, Conformation %d, step %d\n%s\n" % (bindex, cindex, frame.step, c.motion_state))
+				out.append(frame.get_traj_string())
+				break
 
 		# Kinetic Data
-		fout.write("*\nConformation Changes:\n")
-		bindex = 0
-		for b in self.blob:
-			next_conf = cur_conf[bindex]
-			cindex = -1
-			try:
-				for c in b:
-					cindex += 1
-					if c.frame[index + 1] != None:
-						next_conf = cindex
-						break
-			except:
+		out.append("*\nConformation Changes:\n")
+		for bindex in range(self.num_blobs):
+			next_conf, frame = self.get_active_frame(self.blob[bindex], index + 1)
+			if frame is None:
 				next_conf = cur_conf[bindex]
 
-			fout.write("Blob %d: Conformation %d -> Conformation %d\n" % (bindex, cur_conf[bindex], next_conf))
-			bindex += 1
-		fout.write("*\n")		
+			out.append("Blob %d: Conformation %d -> Conformation %d\n" % (bindex, cur_conf[bindex], next_conf))
+		out.append("*\n")
+		fout.write("".join(out))
 
 	def reset(self):
 
@@ -446,6 +863,11 @@ class FFEA_trajectory:
 		self.blob = []
 		self.valid = False
 		self.empty = True
+		self.index = None
+		self.frame_index = None
+		self.lazy_cache = None
+		self.fname = ""
+		self.header_end = 0
 
 class FFEA_traj_blob:
 
@@ -491,21 +913,34 @@ class FFEA_traj_blob:
 				raise IndexError("Error. Subblob index %d out of range (num_subblobs = %d)." % (subblob_index, self.num_subblobs))
 
 		# Build the trajectory
-		subblob_size = len(indices)		
+		if isinstance(self.frame, FFEA_traj_dense_frames):
+			active = self.frame.get_active()
+			ctraj = np.mean(self.frame.get_pos()[active][:,indices], axis=1)
+			return self.frame.get_steps()[active], ctraj
+
 		ctraj = []
 		step = []
-		
 		for f in self.frame:
-			centroid = np.array([0.0,0.0,0.0])
-			for i in indices:
-				centroid += f.pos[i]
-
-			centroid /= subblob_size
-			ctraj.append(centroid)
+			if f == None:
+				continue
+			ctraj.append(np.mean(f.pos[indices], axis=0))
 			step.append(f.step)
 			
 		return np.array(step), np.array(ctraj)
 
+	def set_dense(self, onlyNodes = False, dtype = np.float64):
+		"""
+		Swap the frame list for an FFEA_traj_dense_frames of type dtype,
+		copying any frames already loaded.
+		"""
+		if isinstance(self.frame, FFEA_traj_dense_frames):
+			return
+
+		dense = FFEA_traj_dense_frames(self.num_nodes, vel = not onlyNodes, dtype = dtype)
+		for f in self.frame:
+			dense.append(f)
+		self.frame = dense
+
 	def reset(self):
 
 		self.motion_state = "DYNAMIC"
@@ -515,19 +950,462 @@ class FFEA_traj_blob:
 		self.subblob = []
 
 
-# External functions
-def get_num_frames(fname):
+class FFEA_traj_dense_frames:
+	"""
+	Stands in for the frame list of an FFEA_traj_blob, keeping every frame
+	of the conformation in one preallocated (frames, num_nodes, 3) array,
+	grown geometrically as frames are appended, plus a step vector and a
+	mask of the frames in which the conformation is active. Indexing it
+	gives an FFEA_frame whose pos is a view into the array (so changes made
+	in place stick), or None if the conformation was not active.
+	"""
+
+	def __init__(self, num_nodes, vel = True, dtype = np.float64, capacity = 16):
+
+		self.num_nodes = num_nodes
+		self.num_frames = 0
+		self.pos = np.empty([capacity, num_nodes, 3], dtype=dtype)
+		self.vel = np.empty([capacity, num_nodes, 3], dtype=dtype) if vel else None
+		self.step = np.zeros(capacity, dtype=np.int64)
+		self.active = np.zeros(capacity, dtype=bool)
+
+	def reserve(self, capacity):
+
+		if capacity <= len(self.step):
+			return
+
+		n = self.num_frames
+		pos = np.empty([capacity, self.num_nodes, 3], dtype=self.pos.dtype)
+		pos[:n] = self.pos[:n]
+		self.pos = pos
+		if self.vel is not None:
+			vel = np.empty([capacity, self.num_nodes, 3], dtype=self.vel.dtype)
+			vel[:n] = self.vel[:n]
+			self.vel = vel
+		self.step = np.append(self.step[:n], np.zeros(capacity - n, dtype=np.int64))
+		self.active = np.append(self.active[:n], np.zeros(capacity - n, dtype=bool))
+
+	def append(self, frame):
+
+		if self.num_frames == len(self.step):
+			self.reserve(2 * len(self.step))
+
+		n = self.num_frames
+		if frame == None:
+			self.active[n] = False
+		else:
+			self.pos[n] = frame.get_pos()
+			if self.vel is not None and len(frame.vel) == self.num_nodes:
+				self.vel[n] = frame.vel
+			self.step[n] = frame.step
+			self.active[n] = True
+
+		self.num_frames += 1
+
+	def get_pos(self):
+		return self.pos[:self.num_frames]
+
+	def get_vel(self):
+		if self.vel is None:
+			return None
+		return self.vel[:self.num_frames]
+
+	def get_steps(self):
+		return self.step[:self.num_frames]
+
+	def get_active(self):
+		return self.active[:self.num_frames]
+
+	def __len__(self):
+		return self.num_frames
+
+	def __getitem__(self, index):
+
+		if isinstance(index, slice):
+			return [self[i] for i in range(*index.indices(len(self)))]
+
+		if index < 0:
+			index += len(self)
+		if index < 0 or index >= len(self):
+			raise IndexError("Frame index " + str(index) + " out of range (num_frames = " + str(len(self)) + ").")
+
+		if not self.active[index]:
+			return None
+
+		frame = FFEA_frame.FFEA_frame()
+		frame.num_nodes = self.num_nodes
+		frame.num_surface_nodes = self.num_nodes
+		frame.pos = self.pos[index]
+		if self.vel is not None:
+			frame.vel = self.vel[index]
+		frame.set_step(self.step[index])
+		return frame
+
+	def __delitem__(self, index):
+
+		if index < 0:
+			index += len(self)
+		if index < 0 or index >= len(self):
+			raise IndexError("Frame index " + str(index) + " out of range (num_frames = " + str(len(self)) + ").")
+
+		# Shuffle everything after it down one
+		n = self.num_frames
+		self.pos[index:n - 1] = self.pos[index + 1:n]
+		if self.vel is not None:
+			self.vel[index:n - 1] = self.vel[index + 1:n]
+		self.step[index:n - 1] = self.step[index + 1:n]
+		self.active[index:n - 1] = self.active[index + 1:n]
+		self.num_frames -= 1
+
+	def __iter__(self):
+		for i in range(len(self)):
+			yield self[i]
+
+class FFEA_traj_lazy_frames:
+	"""
+	Stands in for the frame list of an FFEA_traj_blob in a lazy trajectory.
+	It holds the file index of each selected frame, and indexing it asks the
+	parent trajectory for that frame, so nothing is decoded until it is
+	needed. Inactive conformations still give None. Frames can be deleted,
+	and frames appended (e.g. by append_frame) are kept as they are.
+	"""
+
+	def __init__(self, traj, bindex, cindex):
+
+		self.traj = traj
+		self.bindex = bindex
+		self.cindex = cindex
+		self.frame = list(traj.frame_index)
+
+	def __len__(self):
+		return len(self.frame)
+
+	def __getitem__(self, index):
+
+		if isinstance(index, slice):
+			return [self[i] for i in range(*index.indices(len(self)))]
+
+		if index < 0:
+			index += len(self)
+		if index < 0 or index >= len(self):
+			raise IndexError("Frame index " + str(index) + " out of range (num_frames = " + str(len(self)) + ").")
+
+		# Appended frames are stored as they are
+		findex = self.frame[index]
+		if findex is None or isinstance(findex, FFEA_frame.FFEA_frame):
+			return findex
+
+		cindex, motion_state, frame = self.traj.get_lazy_frame(findex)[self.bindex]
+		if cindex != self.cindex:
+			return None
+		return frame
+
+	def __delitem__(self, index):
+
+		if index < 0:
+			index += len(self)
+		if index < 0 or index >= len(self):
+			raise IndexError("Frame index " + str(index) + " out of range (num_frames = " + str(len(self)) + ").")
+
+		del self.frame[index]
+
+	def append(self, frame):
+		self.frame.append(frame)
+
+	def __iter__(self):
+		for i in range(len(self)):
+			yield self[i]
+
+class FFEA_traj_index:
+	"""
+	Byte offsets and steps of the frames of an FFEA trajectory (.ftj).
+	Frame i occupies offset[i] to offset[i + 1], so only completely written
+	frames are indexed. The index is kept next to the trajectory as
+	'<fname>.idx' and reused for as long as the size and modification time
+	of the trajectory are unchanged. If the trajectory has only grown
+	since, just the new part of it is scanned.
+	"""
+
+	def __init__(self, fname = "", save = True):
 
-	fin = open(fname, "r")
-	if fin.readline().strip() != "FFEA_trajectory_file":
-		print("\tExpected to read 'FFEA_trajectory_file' but read '" + line + "'. This may not be an FFEA trajectory file.")
 		self.reset()
-		return 1
-		
-	num_asterisks = 0	
-	for line in fin:
-		if "*" in line:
-			num_asterisks += 1
-	
-	return (num_asterisks - 1) / 2
 
+		# Return empty object if fname not initialised
+		if fname == "" or fname == None:
+			return
+
+		self.load(fname, save = save)
+
+	def load(self, fname, save = True):
+
+		if not path.exists(fname):
+			raise IOError("No trajectory found at that location")
+
+		self.reset()
+		self.fname = fname
+		stamp = get_file_stamp(fname)
+
+		# Up to date, or at least a good start
+		saved = self.load_from_file(fname + ".idx")
+		if saved == stamp:
+			self.stamp = stamp
+			return
+
+		if saved == None or saved[0] > stamp[0] or not self.is_frame_boundary(fname):
+			self.reset()
+			self.fname = fname
+
+		self.stamp = stamp
+		self.build(fname)
+		if save:
+			try:
+				self.write_to_file(fname + ".idx")
+			except(IOError, OSError):
+				print("\tUnable to save frame index to '" + fname + ".idx'. It will be rebuilt next time.")
+
+	def build(self, fname, chunk_size = 1 << 24):
+		"""
+		Scan the trajectory in large chunks for the lines holding a single
+		'*'. The header ends with one and every frame with two. Scanning
+		carries on from the last indexed frame, if there is one.
+		"""
+		offset = [int(o) for o in self.offset]
+		step = [int(s) for s in self.step]
+
+		# Where to start, and the index of the next '*' line
+		if len(offset) > 0:
+			begin = offset[-1]
+			star = 2 * len(offset) - 1
+			step.append(None)
+		else:
+			begin = 0
+			star = 0
+
+		base = begin
+		tail = ""
+		with open(fname, "rb") as fin:
+			fin.seek(begin)
+			while(True):
+				chunk = fin.read(chunk_size)
+				if chunk == "":
+					break
+
+				buf = tail + chunk
+				bufstart = base - len(tail)
+				i = buf.find("\n*\n")
+				while i != -1:
+
+					# Frame starts. Its first line has the step
+					if star % 2 == 0:
+						offset.append(bufstart + i + 3)
+						j = buf.find("\n", i + 3)
+						if j == -1:
+							step.append(None)
+						else:
+							step.append(parse_step_line(buf[i + 3:j]))
+					star += 1
+					i = buf.find("\n*\n", i + 2)
+
+				tail = buf[-2:]
+				base += len(chunk)
+
+			# Complete frames whose step line straddled two chunks
+			num_frames = max(len(offset) - 1, 0)
+			for i in range(num_frames):
+				if step[i] == None:
+					fin.seek(offset[i])
+					step[i] = parse_step_line(fin.readline())
+
+		self.offset = np.array(offset, dtype=np.int64)
+		self.step = np.array(step[:num_frames], dtype=np.int64)
+		self.num_frames = num_frames
+
+	def is_frame_boundary(self, fname):
+		"""
+		Check that the first and last indexed offsets still follow a '*'
+		line, i.e. the trajectory has been appended to, not rewritten.
+		"""
+		if len(self.offset) == 0:
+			return True
+
+		with open(fname, "rb") as fin:
+			for o in [self.offset[0], self.offset[-1]]:
+				fin.seek(o - 3)
+				if fin.read(3) != "\n*\n":
+					return False
+		return True
+
+	def load_from_file(self, fname):
+		"""
+		Load a saved index. Returns the size and modification time of the
+		trajectory it was built from, or None if there isn't one.
+		"""
+		if not path.exists(fname):
+			return None
+
+		try:
+			with open(fname, "rb") as fin:
+				stamp = np.load(fin)
+				offset = np.load(fin)
+				step = np.load(fin)
+		except(IOError, ValueError, EOFError):
+			return None
+
+		self.offset = offset
+		self.step = step
+		self.num_frames = max(len(self.offset) - 1, 0)
+		return tuple(stamp)
+
+	def write_to_file(self, fname):
+
+		with open(fname, "wb") as fout:
+			np.save(fout, np.array(self.stamp, dtype=np.float64))
+			np.save(fout, self.offset)
+			np.save(fout, self.step)
+
+	def reset(self):
+
+		self.fname = ""
+		self.stamp = None
+		self.num_frames = 0
+		self.offset = np.zeros(0, dtype=np.int64)
+		self.step = np.zeros(0, dtype=np.int64)
+
+# External functions
+def get_file_stamp(fname):
+	"""
+	Size and modification time of a file, used to tell whether anything
+	derived from it is out of date.
+	"""
+	st = os.stat(fname)
+	return (float(st.st_size), float(st.st_mtime))
+
+# Worker side of FFEA_trajectory.load_parallel. The shared arrays have to be
+# handed over when the workers start, so they live here
+_parallel_worker = {}
+
+def _init_parallel_worker(num_blobs, num_conformations, num_nodes, num_frames, shared):
+
+	traj = FFEA_trajectory()
+	traj.set_header(num_blobs, num_conformations, num_nodes)
+	_parallel_worker["traj"] = traj
+	_parallel_worker["arrays"] = _wrap_shared_arrays(shared, num_nodes, num_frames)
+
+def _wrap_shared_arrays(shared, num_nodes, num_frames):
+
+	arrays = []
+	for i in range(len(shared)):
+		shape = (num_frames, max(num_nodes[i]), 3)
+		arrays.append([np.frombuffer(a, dtype=np.float64)[:np.prod(shape)].reshape(shape) for a in shared[i]])
+	return arrays
+
+def _read_frame_range(task):
+	"""
+	Decode the frames at the given byte offsets into the shared arrays,
+	starting at row 'first'. Returns the conformation index, motion state
+	and step of every blob in every frame.
+	"""
+	fname, onlyNodes, first, offsets = task
+	traj = _parallel_worker["traj"]
+	arrays = _parallel_worker["arrays"]
+
+	result = []
+	with open(fname, "r") as fin:
+		for i in range(len(offsets)):
+			fin.seek(offsets[i])
+			bframes = traj.read_frame(fin, onlyNodes=onlyNodes)
+			if bframes == None:
+				raise IOError("\tFailed to read frame at byte " + str(offsets[i]) + " of '" + fname + "'. The trajectory may have changed since it was indexed.")
+
+			meta = []
+			for bindex in range(traj.num_blobs):
+				cindex, motion_state, frame = bframes[bindex]
+				step = 0
+				if frame != None:
+					arrays[bindex][0][first + i,:frame.num_nodes] = frame.pos
+					if not onlyNodes:
+						arrays[bindex][1][first + i,:frame.num_nodes] = frame.vel
+					step = frame.step
+				meta.append([cindex, motion_state, step])
+			result.append(meta)
+
+	return result
+
+def get_num_frames(fname):
+	"""
+	Number of completely written frames in a trajectory, taken from its
+	frame index (which is built, or brought up to date, if need be).
+	"""
+	with open(fname, "r") as fin:
+		line = fin.readline().strip()
+	if line != "FFEA_trajectory_file":
+		raise IOError("\tExpected to read 'FFEA_trajectory_file' but read '" + line + "'. This may not be an FFEA trajectory file.")
+
+	return FFEA_traj_index(fname).num_frames
+
+def parse_step_line(line):
+	"""
+	Step from a 'Blob %d, Conformation %d, step %d' line, or -1.
+	"""
+	try:
+		return int(line.split()[5])
+	except(IndexError, ValueError):
+		return -1
+
+def rewrite_trajectory(fname, out_fname, start = 0, stop = None, frame_rate = 1):
+	"""
+	Write every frame_rate'th frame from start up to (not including) stop
+	to a new trajectory, one frame at a time, so memory use does not depend
+	on the length of the trajectory. Frames are copied as they are, without
+	decoding them. Only the conformation changes are rewritten, to point at
+	the next frame that is kept. Pairs with
+	FFEA_measurement.rewrite_measurement, which selects the same frames.
+	In: fname, out_fname, start, stop (None for the end) and frame_rate.
+	Out: the number of frames written.
+	"""
+	index = FFEA_traj_index(fname)
+	if stop == None or stop > index.num_frames:
+		stop = index.num_frames
+	findex = range(int(start), int(stop), int(frame_rate))
+
+	with open(fname, "rb") as fin:
+		with open(out_fname, "wb") as fout:
+
+			# Header, as it is
+			fout.write(fin.read(index.offset[0]))
+
+			# Each frame can only be finished once we know the next one
+			prev = None
+			for i in findex:
+				fin.seek(index.offset[i])
+				frame = fin.read(index.offset[i + 1] - index.offset[i])
+				if prev != None:
+					write_frame_with_conformation_changes(fout, prev, get_frame_conformations(frame))
+				prev = frame
+
+			if prev != None:
+				write_frame_with_conformation_changes(fout, prev, None)
+
+	return len(findex)
+
+def get_frame_conformations(frame):
+	"""
+	Active conformation of each blob in the text of a frame.
+	"""
+	return [int(c) for c in re.findall(r"^Blob \d+, Conformation (\d+)", frame, re.M)]
+
+def write_frame_with_conformation_changes(fout, frame, next_conformations):
+	"""
+	Write the text of a frame with its conformation changes pointing at
+	next_conformations (None if the blobs stay as they are).
+	"""
+	data = frame[:frame.rfind("*\nConformation Changes:\n")]
+	conformations = get_frame_conformations(data)
+	if next_conformations == None:
+		next_conformations = conformations
+
+	out = [data, "*\nConformation Changes:\n"]
+	for bindex in range(len(conformations)):
+		out.append("Blob %d: Conformation %d -> Conformation %d\n" % (bindex, conformations[bindex], next_conformations[bindex]))
+	out.append("*\n")
+	fout.write("".join(out))
@@ -34,7 +34,6 @@ import FFEA_trajectory
 #import pymol.cgo as _cgo
 from os import path
 import sys
-import re as _re
 
 class FFEA_turbotrajectory:
     """
@@ -73,39 +72,34 @@ class FFEA_turbotrajectory:
         Out: writes to the self.turbotraj object.
         """
         self.path = path.split(".")[0]
-        if path.endswith("out"):
-            traj = FFEA_trajectory.FFEA_trajectory(path)
+        if path.endswith("out") or path.endswith("ftj"):
+            traj = FFEA_trajectory.FFEA_trajectory(path, onlyNodes=True)
             self.blob = traj.blob # backward compatible
             blobs = traj.blob
             max_blobs = len(traj.blob)
             
-            num_confs = []
-            for blob in blobs:
-                num_confs.append(len(blob))
-            
-            max_confs = max(num_confs)
-            
-            num_frames = len(blobs[0][0].frame)
-            num_nodes = len(blobs[0][0].frame[0].pos)
+            max_confs = max(traj.num_conformations)
+            num_frames = traj.num_frames
+            num_nodes = max([max(n) for n in traj.num_nodes])
 
-            turbotraj = np.empty([max_blobs, max_confs, num_frames, num_nodes, self.dimensions])
+            turbotraj = np.zeros([max_blobs, max_confs, num_frames, num_nodes, self.dimensions])
             #later , this will automatically reduce the number of dimensions if the blobs or confs are 1
             #but i don't think it has any speed effect
             
+            # Copy whole frames at a time. Inactive conformations stay zero
             for i in range(max_blobs):
-                for j in range(max_confs):
+                for j in range(len(blobs[i])):
                     for k in range(num_frames):
-                        print(str(int(((float(k)/float(num_frames))/(max_blobs*max_confs))*100))+"% converted")
-                        for l in range(num_nodes):
-                            for m in range(self.dimensions):
-                                turbotraj[i][j][k][l][m] = blobs[i][j].frame[k].pos[l][m]
+                        frame = blobs[i][j].frame[k]
+                        if frame is not None:
+                            turbotraj[i, j, k, :len(frame.pos)] = frame.pos
             self.turbotraj = turbotraj
             return
         elif path.endswith("npy"):
             self.turbotraj=np.load(path)
             return
         else:
-            raise IOError("File must have .out (traj) or .npy (turbotraj) extension.")
+            raise IOError("File must have .out or .ftj (traj) or .npy (turbotraj) extension.")
 
     def dump_traj(self):
         np.save(self.path, self.turbotraj)
@@ -187,14 +181,14 @@ class FFEA_turbotrajectory:
         a script object, and a turbotraj object.
         Out: Appends to the cgo.
         """
-        frames = xrange(len(self.turbotraj[0][0]))
+        frames = range(len(self.turbotraj[0][0]))
         tops = []
-        for i in xrange(len(turbotraj)):
+        for i in range(len(turbotraj)):
             tops.append(script.load_topology(i)) 
         for frame in frames:
             print("Highlighting nodes in frame "+str(frame))
             sol = [ _cgo.BEGIN, _cgo.TRIANGLES ]
-            for blob_num in xrange(len(tops)):
+            for blob_num in range(len(tops)):
                 for element in element_list:
                     nodes = tops[blob_num].element[element].n[:4]
                     face1 = [nodes[0], nodes[1], nodes[2]]
@@ -216,134 +210,111 @@ class FFEA_turbotrajectory:
         np.save(self.path+"_cgo", cgo_array)
         np.save(self.path+"_cgoindex", cgo_blob_index_array)
 
-    def load_ftj_header(self, fname): # load header data from ftj file and create empty turbotraj
+    def load_ftj_header(self, fname): # load header data from ftj file and size the turbotraj
         """            If we had to do this for every node, it would probably be a pain
         Load header info. This works in almost the exact same way as the regular
-        FFEA trajectory method.
+        FFEA trajectory method. The file is closed again afterwards, and
+        nothing is allocated: the turbotraj array's size comes from
+        num_blobs, num_conformations, num_frames, num_nodes and dimensions
+        (see allocate_turbotraj).
         """
     
         self.path = fname.split(".")[0]
             
-        # Get a file object and store it
+        # Get a file object
         try:
-            self.ftj = open(fname, "r")
+            ftj = open(fname, "r")
 
         except(IOError):
             raise IOError("\tFailed to open '" + fname + "' for reading.")
 
-        # Now, read only the information from the top of the file
-
-        # Title
-        line = self.ftj.readline().strip()
-        if line != "FFEA_trajectory_file":
-            raise IOError("\tExpected to read 'FFEA_trajectory_file' but read '" + line + "'. This may not be an FFEA trajectory file.")
-
-        self.ftj.readline()
-        self.ftj.readline()
-
-        # num_blobs
         try:
-            #self.blob = [[FFEA_trajectory.FFEA_traj_blob(self.num_nodes[i][j]) for j in range(self.num_conformations[i])] for i in range(self.num_blobs)]
+            # Now, read only the information from the top of the file
 
-            line = self.ftj.readline()
-            self.num_blobs = int(line.split()[3])
+            # Title
+            line = ftj.readline().strip()
+            if line != "FFEA_trajectory_file":
+                raise IOError("\tExpected to read 'FFEA_trajectory_file' but read '" + line + "'. This may not be an FFEA trajectory file.")
 
-        except(IndexError, ValueError):
-            raise IOError("\tExpected to read 'Number of Blobs %d' but read '" + line + "'.")
+            ftj.readline()
+            ftj.readline()
 
-        # num_conformations
-        try:
-            line = self.ftj.readline()
-            sline = line.split()[3:]
-            self.num_conformations = [int(s) for s in sline]
+            # num_blobs
+            try:
+                line = ftj.readline()
+                self.num_blobs = int(line.split()[3])
 
-        except(IndexError, ValueError):
-            raise IOError("\tExpected to read 'Number of Conformations %d %d ....%d' but read '" + line + "'.")
+            except(IndexError, ValueError):
+                raise IOError("\tExpected to read 'Number of Blobs %d' but read '" + line + "'.")
 
-        # num_nodes
-        self.num_nodes = [[0 for i in range(self.num_conformations[j])] for j in range(self.num_blobs)]
-        for i in range(self.num_blobs):
+            # num_conformations
             try:
-                line = self.ftj.readline()
-                sline = line.split()[2:]
-
-                for j in range(self.num_conformations[i]):
-                    self.num_nodes[i][j] = int(sline[4 * j + 3])
+                line = ftj.readline()
+                sline = line.split()[3:]
+                self.num_conformations = [int(s) for s in sline]
 
             except(IndexError, ValueError):
-                raise IOError("\tExpected to read 'Blob " + str(i) + ": Conformation 0 Nodes %d Conformation 1 Nodes %d....Conformation " + str(self.num_conformations[i] - 1) + " Nodes %d' but read '" + line + "'.")
+                raise IOError("\tExpected to read 'Number of Conformations %d %d ....%d' but read '" + line + "'.")
+
+            # num_nodes
+            self.num_nodes = [[0 for i in range(self.num_conformations[j])] for j in range(self.num_blobs)]
+            for i in range(self.num_blobs):
+                try:
+                    line = ftj.readline()
+                    sline = line.split()[2:]
 
-        # final whitespace until '*' and save the file pos
-        while(self.ftj.readline().strip() != "*"):
-            pass
+                    for j in range(self.num_conformations[i]):
+                        self.num_nodes[i][j] = int(sline[4 * j + 3])
 
-        self.fpos = self.ftj.tell()
+                except(IndexError, ValueError):
+                    raise IOError("\tExpected to read 'Blob " + str(i) + ": Conformation 0 Nodes %d Conformation 1 Nodes %d....Conformation " + str(self.num_conformations[i] - 1) + " Nodes %d' but read '" + line + "'.")
+
+            # final whitespace until '*' and save the file pos
+            while(ftj.readline().strip() != "*"):
+                pass
+
+            self.fpos = ftj.tell()
+        finally:
+            ftj.close()
         
-        # cheeky way of getting the number of frames
-        self.ftj.seek(0)
-        asterisks = self.ftj.read().count("*")
-        self.num_frames = (asterisks-1)/2 # 1 frame for every 2 asterisks, plus an extra one at the end
-        self.num_nodes = self.num_nodes[0][0] # not sure why it's trapped in those lists
+        # Exact number of complete frames, from the frame index
+        self.index = FFEA_trajectory.FFEA_traj_index(fname)
+        self.num_frames = self.index.num_frames
+
+        # Blobs and conformations can differ in size, so pad to the largest
+        self.blob_num_nodes = self.num_nodes
+        self.blob_num_conformations = self.num_conformations
+        self.num_nodes = max([max(n) for n in self.num_nodes])
         self.num_conformations = max(self.num_conformations) # get max number of conformations
+
+    def allocate_turbotraj(self, memmap_fname = None):
+        """
+        Allocate the (blobs, conformations, frames, nodes, dimensions)
+        turbotraj array, filled with zeros, once the header is loaded.
+        In: memmap_fname, which backs it with a file of that name rather
+        than memory.
+        """
+        shape = (self.num_blobs, self.num_conformations, self.num_frames, self.num_nodes, self.dimensions)
+        if memmap_fname != None:
+            self.turbotraj = np.memmap(memmap_fname, dtype=np.float64, mode="w+", shape=shape)
+        else:
+            self.turbotraj = np.zeros(shape)
         
-        # Finally, build the objects
-        self.turbotraj = np.empty([self.num_blobs, self.num_conformations, self.num_frames, self.num_nodes, self.dimensions])
-        
-    def populate_turbotraj_from_ftj(self, fname, surf=None, load_all=1, frame_rate = 1, num_frames_to_read = 1000000, start = 0): # load the contents of a .ftj trajectory into a turbotraj object
+    def populate_turbotraj_from_ftj(self, fname, surf=None, load_all=1, frame_rate = 1, num_frames_to_read = 1000000, start = 0, memmap_fname = None): # load the contents of a .ftj trajectory into a turbotraj object
         """
-        Create a turbotraj object straight from a ,ftj file. As far as I know,
-        this is the fastest way to do it, but if you have a better idea, go
-        ahead! We load in the file, grab the header, use the first 3 frames
-        to get the number of steps (it only starts stepping properly between
-        frame 2 and 3) in each frame (why that's not in the header I have no
-        idea). 
-        From there, we start reading the file sequentially. Every frame of every
-        blob has what is essentially header information above it, and let me
-        tell ya, it's a lot more human readable than it is machine-readable.
-        Regex is used to work out which part of the header we're in, and
-        extract the data from the header. We populate the turbotraj object
-        only with the first-order nodes.
-        In: self, fname...
+        Create a turbotraj object straight from a .ftj file. The header is
+        read once, and the frame index (see FFEA_trajectory.FFEA_traj_index)
+        gives the exact number of frames and where each one starts, so the
+        array is allocated once, for just the frames wanted, and each
+        blob's node block is decoded by numpy and copied in whole.
+        Only positions are kept. Blobs and conformations with fewer nodes
+        than the largest one, and conformations that are not active in a
+        frame, are left as zeros.
+        In: self, fname, frame_rate, num_frames_to_read and start (which
+        frames to load, as in FFEA_trajectory) and memmap_fname, which backs
+        the turbotraj array with a file of that name rather than memory.
         Out: populates turbotraj attribute.
         """
-        def skip_line(ftj, n):
-            for i in range(n):
-                ftj.readline()
-                
-        def match_line(line):
-            """
-            Match a line according to the highly sophisticated regex query:
-            "[0-9]". Uses python's built in regex library. We have to do a bit
-            of string fiddling beforehand, because the library takes input and
-            gives output in an odd way.
-            In: a line (string
-            Out: the contents of the line (we use it for blob, conf and step)
-            """
-            line_contents = line.split(',')
-            line_contents_formatted = []
-            for thing in line_contents:
-                chars = _re.findall("[0-9]", thing)
-                num = "".join(chars)
-                line_contents_formatted.append(int(num))
-            try:
-                return line_contents_formatted[0], line_contents_formatted[1], line_contents_formatted[2] # blob, conf, step
-            except IndexError:
-                raise IndexError("Expected line contents to contain 3 items, got "+str(line_contents_formatted)+" of length "+str(len(line_contents_formatted)))
-            
-        def convert_step_to_frame(steps_per_frame, step):
-            """
-            Because the .trj file format doesn't have any way of telling you
-            what frame you're on, you have to either keep track of it in a
-            variable (which gets a bit ungainly because then you also have to
-            keep track of which blob you're in) OR just infer it from the steps.
-            If you know how many steps there are in each frame (which we do)
-            then we can work out which frame we're on.
-            """
-            if step > 1:
-                return ((step-1)/steps_per_frame)+1
-            else:
-                return step
-
         print("Loading FFEA trajectory file...")
 
         # Test file exists
@@ -353,58 +324,41 @@ class FFEA_turbotrajectory:
         # Header first, for sure
         self.load_ftj_header(fname)
 
-        try:
-            ftj = open(fname, "r")
-        except(IOError):
-            raise IOError("\tFailed to open '" + fname + "' for reading.")
-            
-        
-        # get step - find the 2nd and 3rd frames, get the step difference
-        seek = True
-        steps = []
-        while seek:
-            line = ftj.readline()
-            if line.startswith('Blob') and "->" not in line and "Nodes" not in line: # Only lines with blob, conf, step
-                blob, conf, step = match_line(line) # regex the line to get the values
-                steps.append(step)
-            if len(steps) >= 3:
-                break
-            
-        self.step = steps[2] - steps[1]
-        steps_per_frame = self.step
-        
-        print("Steps calculated successfully...")
-        print("Loading trajectory...")
-        
+        findex = np.arange(int(start), min(self.num_frames, int(start) + num_frames_to_read), frame_rate)
+        self.num_frames = len(findex)
+        self.allocate_turbotraj(memmap_fname)
+
         turbotraj = self.turbotraj #faster to access a local object
-            
-        ftj.seek(0)
-        
-        seek = True
-        while seek:
-            line = ftj.readline()
-            if line.startswith('Blob') and "->" not in line and "Nodes" not in line: #Only lines with blob, conf, step
-                blob, conf, step = match_line(line) # regex the line to get the values
-                frame = convert_step_to_frame(steps_per_frame, step)
-                ftj.readline() # skip the word 'DYNAMIC'
-                nodes_range = xrange(self.num_nodes)
-                for node in nodes_range: #  each node occupies one line
-                    #self.turbotraj[blob][conf][frame][node] = np.fromstring(self.ftj.readline(), dtype=float, sep=' ')[0:3]
-                    node_line = ftj.readline().split()
-                    for i in [0,1,2]: # 3 points
-                        turbotraj[blob][conf][frame][node][i] = float(node_line[i])
-                    # fill the contents of the node with the first 3 numbers in the line, converted from a string. first 3 numbers = ignore second order elements
-            if line == "": #empty string (no /n) at eof
+        # Steps between frames (frame 0 is written before stepping properly starts)
+        if self.index.num_frames > 2:
+            self.step = self.index.step[2] - self.index.step[1]
+
+        # The frame reader only needs the sizes of the blobs
+        traj = FFEA_trajectory.FFEA_trajectory()
+        traj.set_header(self.num_blobs, self.blob_num_conformations, self.blob_num_nodes)
+
+        print("Loading trajectory...")
+        ftj = open(fname, "r")
+        for k in range(self.num_frames):
+            ftj.seek(self.index.offset[findex[k]])
+            bframes = traj.read_frame(ftj, onlyNodes=True)
+            if bframes == None:
                 break
 
-        self.ftj =  ftj
-        self.turbotraj = turbotraj
-                    
-        print("Trajectory loaded.")
-                
-                
-            
-    
+            for blob in range(self.num_blobs):
+                conf, motion_state, frame = bframes[blob]
+                if frame is not None:
+                    turbotraj[blob, conf, k, :len(frame.pos)] = frame.pos
+
+            if k % 100 == 0:
+                sys.stdout.write("\r\tFrames read = %d" % (k))
+                sys.stdout.flush()
+
+        ftj.close()
+        if memmap_fname != None:
+            turbotraj.flush()
+        print("\ndone! Successfully read " + str(self.num_frames) + " frame/s from '" + fname + "'.")
+
 class _cgo:
     """
     These are the builtin constants for the PyMOL library's cgo, stolen from
@@ -445,4 +399,4 @@ class _cgo:
     ALPHA              = 25.0
     QUADRIC            = 26.0 # NOTE: Only works with ellipsoids and disks
     CONE               = 27.0 
-    LIGHTING           = float(0x0B50)
\ No newline at end of file
+    LIGHTING           = float(0x0B50)
@@ -25,3 +25,4 @@ import FFEA_binding_sites, FFEA_pin, FFEA_frame, FFEA_ctforces, FFEA_beads
 import FFEA_kinetic_map, FFEA_springs, FFEA_kinetic_rates, FFEA_stokes
 import FFEA_kinetic_states, FFEA_surface, FFEA_material, FFEA_topology, FFEA_skeleton
 import FFEA_measurement, FFEA_trajectory, FFEA_node, FFEA_pdb, FFEA_vdw, FFEA_lj
+import FFEA_binary_trajectory
@@ -47,6 +47,7 @@ Created on Mon Aug 15 12:09:29 2016
 #from FFEA_trajectory import *
 #from FFEA_vdw import *
 
+from FFEA_binary_trajectory import FFEA_binary_trajectory as binary_trajectory
 from FFEA_binding_sites import FFEA_binding_sites as binding_sites
 from FFEA_frame import FFEA_frame as frame
 from FFEA_kinetic_map import FFEA_kinetic_map as kinetic_map
@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+# 
+#  This file is part of the FFEA simulation package
+#  
+#  Copyright (c) by the Theory and Development FFEA teams,
+#  as they appear in the README.md file. 
+# 
+#  FFEA is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+# 
+#  FFEA is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+# 
+#  You should have received a copy of the GNU General Public License
+#  along with FFEA.  If not, see <http://www.gnu.org/licenses/>.
+# 
+#  To help us fund FFEA development, we humbly ask that you cite 
+#  the research papers on the package.
+#
+
+
+import sys
+import numpy as np
+
+try:
+    import FFEA_rod
+    from FFEA_rod import py_rod_math as M
+except ImportError:
+    print("Failure to import FFEA_rod")
+    sys.exit(1) # failure to import
+
+def make_rod(num_frames, num_elements):
+    """
+    A gently bent and twisted rod, with random material frames.
+    """
+    rng = np.random.RandomState(1)
+    rod = FFEA_rod.FFEA_rod(num_elements = num_elements)
+    rod.num_frames = num_frames
+    rod.current_r = np.cumsum(rng.rand(num_frames, num_elements, 3) + [1, 0, 0], axis = 1)
+    rod.equil_r = np.cumsum(rng.rand(num_frames, num_elements, 3) * 0.1 + [1, 0, 0], axis = 1)
+    rod.current_m = rng.rand(num_frames, num_elements, 3)
+    rod.equil_m = rng.rand(num_frames, num_elements, 3)
+    rod.B_matrix = np.zeros([num_frames, num_elements, 4])
+    rod.B_matrix[:,:,0] = 2.0
+    rod.B_matrix[:,:,3] = 2.0
+    rod.material_params = rng.rand(num_frames, num_elements, 3)
+    return rod
+
+def get_B(B, f, e):
+    return np.matrix([[B[f][e][0], B[0][0][1]], [B[0][0][2], B[0][0][3]]])
+
+def check(value, expected, what):
+    if not np.allclose(value, expected, rtol = 1e-10, atol = 1e-12 * np.nanmax(np.abs(expected)), equal_nan = True):
+        print(what + " differs from the element by element one")
+        sys.exit(1)
+
+try:
+    F, N = 5, 12
+    rod = make_rod(F, N)
+    anal = FFEA_rod.anal_rod(rod)
+    anal.get_equipartition()
+    anal.get_persistence_length()
+    anal.get_EI_from_deflection(1.0)
+
+    # p_i, from rolling each frame
+    x = rod.current_r
+    p = np.array([np.delete(x[f] - np.roll(x[f], 1, axis = 0), 0, axis = 0) for f in range(F)])
+    if not np.array_equal(anal.p_i, p):
+        print("p_i differs from the frame by frame one")
+        sys.exit(1)
+    ep = anal.equil_p_i
+
+    # Bending and twist energy, one pair of elements at a time
+    B = rod.B_matrix
+    bending = np.zeros([F, N - 2])
+    twist = np.zeros([F, N - 2])
+    for f in range(F):
+        for e in range(N - 2):
+            def get_omega(pp, mm):
+                pim1 = M.normalize(pp[f][e])
+                pi = M.normalize(pp[f][e + 1])
+                mim1 = M.normalize(mm[f][e])
+                mi = M.normalize(mm[f][e + 1])
+                nim1 = np.cross(mim1, pim1/np.linalg.norm(pim1))
+                ni = np.cross(mi, pi/np.linalg.norm(pi))
+                return M.omega(pi, pim1, nim1, mim1)[0], M.omega(pi, pim1, ni, mi)[0], pi, pim1
+            oi, oj, pi, pim1 = get_omega(p, rod.current_m)
+            eoi, eoj, epi, epim1 = get_omega(ep, rod.equil_m)
+            di = oi - eoi
+            dj = oj - eoj
+            bending[f,e] = 0.5*(di.T*get_B(B, f, e)*di + dj.T*get_B(B, f, e + 1)*dj)[0,0]/(2*(M.get_length(epi) + M.get_length(epim1)))
+
+            t = M.parallel_transport(M.normalize(rod.current_m[f][e]), M.normalize(p[f][e]), M.normalize(p[f][e + 1]))
+            delta = M.get_twist_angle(np.asarray(t).ravel(), M.normalize(rod.current_m[f][e + 1]))
+            t = M.parallel_transport(M.normalize(rod.equil_m[f][e]), M.normalize(ep[f][e]), M.normalize(ep[f][e + 1]))
+            equil_delta = M.get_twist_angle(np.asarray(t).ravel(), M.normalize(rod.equil_m[f][e + 1]))
+            twist[f,e] = rod.material_params[f][e][1]/(M.get_length(ep[f][e]) + M.get_length(ep[f][e + 1]))*(delta - equil_delta)**2
+
+    check(anal.bending_energy, bending, "The bending energy")
+    check(anal.twist_energy, twist, "The twist energy")
+    check(anal.average_twist_energy, [np.average(twist[f]) for f in range(F)], "The average twist energy")
+
+    # Extension and persistence length
+    extension = np.array([[M.get_length(ep[f][s]) - M.get_length(p[f][s]) for s in range(N - 1)] for f in range(F)])
+    check(anal.p_i_extension, extension, "The extension")
+    check(anal.p_i_extension_y, ep[:,:,1] - p[:,:,1], "The y extension")
+    cos_theta = [M.get_cos_theta(M.normalize(p[f][0]), M.normalize(p[f][-1])) for f in range(F)]
+    P = [-sum(M.get_length(p[f][i]) for i in range(N - 2))/np.log(np.average(cos_theta)) for f in range(F)]
+    check(anal.P, P, "The persistence length")
+    check(anal.get_absolute_length(1, 5, 2), sum(M.get_length(p[2][i]) for i in range(1, 5)), "The absolute length")
+
+    # Deflection
+    deflections = rod.current_r[:,-1,1] - rod.equil_r[:,-1,1]
+    check(anal.deflections, deflections, "The deflection")
+    check(anal.EI_from_deflection, M.get_length(rod.equil_r[0][1] - rod.equil_r[0][N - 1])**3/(3*np.abs(deflections)), "EI from the deflection")
+
+    # Bending energy in the mutual material frame
+    anal.get_bending_response_mutual()
+    bending = np.zeros([F, N - 2])
+    for f in range(F):
+        for e in range(N - 2):
+            def get_omega(pp, mm):
+                l = M.normalize(pp[f][e]/M.get_length(pp[f][e]) + pp[f][e + 1]/M.get_length(pp[f][e + 1]))
+                pim1 = M.normalize(pp[f][e])
+                pi = M.normalize(pp[f][e + 1])
+                mim1 = M.normalize(mm[f][e])
+                mi = M.normalize(mm[f][e + 1])
+                a = np.asarray(M.parallel_transport(mi, pi, l)).ravel()
+                b = np.asarray(M.parallel_transport(mim1, pim1, l)).ravel()
+                angle = np.arccos(np.dot(a, b))*M.get_length(b)/(M.get_length(b) + M.get_length(a))
+                m_mutual = M.rodrigues(b, l, angle)
+                return M.omega(pi, pim1, np.cross(m_mutual, l), m_mutual)[0], M.get_length(pi) + M.get_length(pim1)
+            omega, length = get_omega(p, rod.current_m)
+            equil_omega, equil_length = get_omega(ep, rod.equil_m)
+            d = omega - equil_omega
+            bending[f,e] = 0.5*(d.T*get_B(B, f, e + 1)*d)[0,0]/equil_length
+
+    check(anal.bending_energy, bending, "The mutual bending energy")
+
+    sys.exit(0)
+except Exception, e:
+    print(e)
+    sys.exit(1)
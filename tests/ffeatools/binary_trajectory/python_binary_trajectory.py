@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+# 
+#  This file is part of the FFEA simulation package
+#  
+#  Copyright (c) by the Theory and Development FFEA teams,
+#  as they appear in the README.md file. 
+# 
+#  FFEA is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+# 
+#  FFEA is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+# 
+#  You should have received a copy of the GNU General Public License
+#  along with FFEA.  If not, see <http://www.gnu.org/licenses/>.
+# 
+#  To help us fund FFEA development, we humbly ask that you cite 
+#  the research papers on the package.
+#
+
+import sys
+import numpy as np
+
+try:
+    import FFEA_trajectory, FFEA_binary_trajectory
+except ImportError:
+    print("Failure to import FFEA_trajectory")
+    sys.exit(1) # failure to import
+
+try:
+    FFEA_binary_trajectory.convert_ftj_to_binary("unit_test_traj.ftj", "unit_test_traj.ftb")
+
+    # A second conversion has nothing new to add
+    if FFEA_binary_trajectory.convert_ftj_to_binary("unit_test_traj.ftj", "unit_test_traj.ftb") != 0:
+        print("Binary trajectory conversion was not incremental")
+        sys.exit(1)
+
+    traj = FFEA_trajectory.FFEA_trajectory("unit_test_traj.ftj")
+    btraj = FFEA_trajectory.FFEA_trajectory("unit_test_traj.ftb")
+
+    if btraj.num_frames != traj.num_frames:
+        print("Expected %d frames in the binary trajectory, got %d" % (traj.num_frames, btraj.num_frames))
+        sys.exit(1)
+
+    for i in range(traj.num_frames):
+        if not np.allclose(traj.blob[0][0].frame[i].pos, btraj.blob[0][0].frame[i].pos):
+            print("Node positions differ in frame %d" % (i))
+            sys.exit(1)
+        if traj.blob[0][0].frame[i].step != btraj.blob[0][0].frame[i].step:
+            print("Steps differ in frame %d" % (i))
+            sys.exit(1)
+
+    sys.exit(0)
+except IOError:
+    print("Couldn't find trajectory file that's supposed to be packed in with these tests. Probably a CMake issue!")
+    sys.exit(1)
+except Exception, e:
+    print(e)
+    sys.exit(1)
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+# 
+#  This file is part of the FFEA simulation package
+#  
+#  Copyright (c) by the Theory and Development FFEA teams,
+#  as they appear in the README.md file. 
+# 
+#  FFEA is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+# 
+#  FFEA is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+# 
+#  You should have received a copy of the GNU General Public License
+#  along with FFEA.  If not, see <http://www.gnu.org/licenses/>.
+# 
+#  To help us fund FFEA development, we humbly ask that you cite 
+#  the research papers on the package.
+#
+
+
+import sys
+import numpy as np
+
+try:
+    import FFEA_node, FFEA_topology, FFEA_surface
+except ImportError:
+    print("Failure to import FFEA_node, FFEA_topology and FFEA_surface")
+    sys.exit(1) # failure to import
+
+def get_surface(surf, pos):
+    """
+    The surface as a sorted list of faces, each given by its node positions.
+    """
+    return sorted([sorted([tuple(pos[i]) for i in f.n]) for f in surf.face])
+
+def get_signed_volumes(top, pos):
+    n = top.get_linear_connectivity()
+    return FFEA_topology.get_volumes(pos[n], signed = True)
+
+try:
+    for second_order in [False, True]:
+        node = FFEA_node.FFEA_node("emd_5043_8ang.vol")
+        top = FFEA_topology.FFEA_topology("emd_5043_8ang.vol")
+        surf = FFEA_surface.FFEA_surface("emd_5043_8ang.vol")
+        if surf.get_element_indices(top) == -1:
+            surf = top.extract_surface()
+        if second_order:
+            top.increase_order(node = node, surf = surf)
+        top.calculateInterior(surf = surf)
+        node.calculateInterior(top = top, surf = surf)
+
+        pos = FFEA_topology.get_positions(node)
+        surface = get_surface(surf, pos)
+        volume = top.calculate_volume(node)
+        sign = np.unique(np.sign(get_signed_volumes(top, pos)))
+        num_elements = top.num_elements
+
+        top.cull_interior(100.0, node, surf = surf)
+        pos = FFEA_topology.get_positions(node)
+        what = "second order" if second_order else "linear"
+
+        if top.num_elements >= num_elements:
+            print("Nothing was culled from the %s mesh" % (what))
+            sys.exit(1)
+
+        # The surface is left as it was, and nothing is turned inside out
+        if get_surface(surf, pos) != surface:
+            print("Culling the %s mesh changed its surface" % (what))
+            sys.exit(1)
+        if len(sign) != 1 or not np.all(np.sign(get_signed_volumes(top, pos)) == sign):
+            print("Culling the %s mesh turned elements inside out" % (what))
+            sys.exit(1)
+        if not np.isclose(top.calculate_volume(node), volume, rtol = 1e-9, atol = 0):
+            print("Culling the %s mesh changed its volume from %e to %e" % (what, volume, top.calculate_volume(node)))
+            sys.exit(1)
+
+        # Every node is in an element, and the surface nodes come first
+        n = top.get_connectivity()
+        if node.num_nodes != len(pos) or np.unique(n).tolist() != range(node.num_nodes):
+            print("Culling the %s mesh left nodes without elements" % (what))
+            sys.exit(1)
+        if node.num_surface_nodes + node.num_interior_nodes != node.num_nodes or np.max([f.n for f in surf.face]) >= node.num_surface_nodes:
+            print("Culling the %s mesh miscounted the surface nodes" % (what))
+            sys.exit(1)
+
+        # Each surface face still belongs to its element, and the elements are counted
+        for f in surf.face:
+            if not set(f.n) <= set(top.element[f.elindex].n):
+                print("Culling the %s mesh lost the elements of the surface faces" % (what))
+                sys.exit(1)
+        if top.num_surface_elements + top.num_interior_elements != top.num_elements:
+            print("Culling the %s mesh miscounted the interior elements" % (what))
+            sys.exit(1)
+
+        # Second order nodes are halfway along their edges
+        if second_order:
+            for i, edge in enumerate(FFEA_topology.linear_edge_nodes):
+                if not np.allclose(pos[n[:,4 + i]], 0.5 * (pos[n[:,edge[0]]] + pos[n[:,edge[1]]]), rtol = 0, atol = 1e-9):
+                    print("Culling the second order mesh moved nodes off their edges")
+                    sys.exit(1)
+
+    sys.exit(0)
+except IOError:
+    print("Couldn't find mesh file that's supposed to be packed in with these tests. Probably a CMake issue!")
+    sys.exit(1)
+except Exception, e:
+    print(e)
+    sys.exit(1)
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+# 
+#  This file is part of the FFEA simulation package
+#  
+#  Copyright (c) by the Theory and Development FFEA teams,
+#  as they appear in the README.md file. 
+# 
+#  FFEA is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+# 
+#  FFEA is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+# 
+#  You should have received a copy of the GNU General Public License
+#  along with FFEA.  If not, see <http://www.gnu.org/licenses/>.
+# 
+#  To help us fund FFEA development, we humbly ask that you cite 
+#  the research papers on the package.
+#
+
+
+import sys
+import numpy as np
+
+try:
+    import FFEA_trajectory
+except ImportError:
+    print("Failure to import FFEA_trajectory")
+    sys.exit(1) # failure to import
+
+def make_trajectory(fname, num_frames):
+    """
+    A trajectory of num_frames copies of the test frame, at steps 0, 100, ...
+    """
+    text = open("unit_test_traj.ftj").read()
+    i = text.index("*\n") + 2
+    fout = open(fname, "w")
+    fout.write(text[:i])
+    for f in range(num_frames):
+        fout.write(text[i:].replace("step 0\n", "step %d\n" % (100 * f)))
+    fout.close()
+
+def check_same(traj, dtraj, what, dtype = np.float64):
+    if not isinstance(dtraj.blob[0][0].frame, FFEA_trajectory.FFEA_traj_dense_frames):
+        print("Frames of the %s trajectory are not dense" % (what))
+        sys.exit(1)
+    if dtraj.blob[0][0].frame.get_pos().dtype != dtype:
+        print("Frames of the %s trajectory are %s, not %s" % (what, str(dtraj.blob[0][0].frame.get_pos().dtype), np.dtype(dtype).name))
+        sys.exit(1)
+    if dtraj.num_frames != traj.num_frames or len(dtraj.blob[0][0].frame) != traj.num_frames:
+        print("Expected %d frames in the %s trajectory, got %d" % (traj.num_frames, what, dtraj.num_frames))
+        sys.exit(1)
+    for i in range(traj.num_frames):
+        f = traj.blob[0][0].frame[i]
+        df = dtraj.blob[0][0].frame[i]
+        if f.step != df.step or not np.array_equal(f.pos.astype(dtype), df.pos):
+            print("Frame %d of the %s trajectory differs" % (i, what))
+            sys.exit(1)
+
+try:
+    make_trajectory("dense_traj.ftj", 20)
+
+    traj = FFEA_trajectory.FFEA_trajectory("dense_traj.ftj")
+    check_same(traj, FFEA_trajectory.FFEA_trajectory("dense_traj.ftj", dense=True), "dense")
+    check_same(traj, FFEA_trajectory.FFEA_trajectory("dense_traj.ftj", dense=True, num_processes=2), "dense parallel")
+
+    # Single precision, half the size
+    check_same(traj, FFEA_trajectory.FFEA_trajectory("dense_traj.ftj", dense=True, dtype=np.float32), "single precision dense", np.float32)
+    check_same(traj, FFEA_trajectory.FFEA_trajectory("dense_traj.ftj", dense=True, dtype=np.float32, num_processes=2), "single precision dense parallel", np.float32)
+
+    # Binary trajectories can be made dense too
+    traj.write_to_file("dense_traj.ftb")
+    check_same(traj, FFEA_trajectory.FFEA_trajectory("dense_traj.ftb", dense=True), "dense binary")
+    check_same(traj, FFEA_trajectory.FFEA_trajectory("dense_traj.ftb", dense=True, dtype=np.float32), "single precision dense binary", np.float32)
+
+    # Whole trajectory analysis works on the array
+    dtraj = FFEA_trajectory.FFEA_trajectory("dense_traj.ftj", dense=True)
+    step, centroid = traj.blob[0][0].calc_centroid_trajectory()
+    dstep, dcentroid = dtraj.blob[0][0].calc_centroid_trajectory()
+    if not np.array_equal(step, dstep) or not np.allclose(centroid, dcentroid):
+        print("Dense centroid trajectory differs")
+        sys.exit(1)
+
+    # Deleting frames shuffles the rest down
+    traj.delete_frame(3)
+    dtraj.delete_frame(3)
+    check_same(traj, dtraj, "dense")
+
+    # Lazy frames can't be dense
+    try:
+        FFEA_trajectory.FFEA_trajectory("dense_traj.ftj", dense=True, lazy=True)
+        print("A lazy dense trajectory was loaded")
+        sys.exit(1)
+    except ValueError:
+        pass
+
+    sys.exit(0)
+except IOError:
+    print("Couldn't find trajectory file that's supposed to be packed in with these tests. Probably a CMake issue!")
+    sys.exit(1)
+except Exception, e:
+    print(e)
+    sys.exit(1)
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+# 
+#  This file is part of the FFEA simulation package
+#  
+#  Copyright (c) by the Theory and Development FFEA teams,
+#  as they appear in the README.md file. 
+# 
+#  FFEA is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+# 
+#  FFEA is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+# 
+#  You should have received a copy of the GNU General Public License
+#  along with FFEA.  If not, see <http://www.gnu.org/licenses/>.
+# 
+#  To help us fund FFEA development, we humbly ask that you cite 
+#  the research papers on the package.
+#
+
+
+import sys
+import numpy as np
+
+try:
+    import FFEA_topology, FFEA_surface
+except ImportError:
+    print("Failure to import FFEA_topology and FFEA_surface")
+    sys.exit(1) # failure to import
+
+def old_extract_surface(top):
+    """
+    The surface faces of a linear topology, found by cancelling out pairs of
+    faces one at a time.
+    """
+    faces = []
+    facessorted = []
+    elindex = []
+    for i in range(top.num_elements):
+        for j in range(4):
+            faces.append(top.element[i].get_linear_face(j, obj=False))
+            facessorted.append(sorted(faces[-1]))
+            elindex.append(i)
+
+    surface = []
+    while facessorted != []:
+        fsort = facessorted.pop(0)
+        f = faces.pop(0)
+        eind = elindex.pop(0)
+        if fsort not in facessorted:
+            surface.append((eind, f))
+        else:
+            index = facessorted.index(fsort)
+            facessorted.pop(index)
+            faces.pop(index)
+            elindex.pop(index)
+    return surface
+
+def get_faces(surf):
+    return [(f.elindex, [int(i) for i in f.n]) for f in surf.face]
+
+try:
+    # Linear elements, the whole mesh and half of it (which has faces inside the sphere on its surface)
+    top = FFEA_topology.FFEA_topology("sphere_63_120.vol")
+    for num_elements in [top.num_elements, top.num_elements // 2]:
+        top.set_connectivity(top.connectivity[:num_elements])
+        surf = top.extract_surface()
+        if get_faces(surf) != old_extract_surface(top):
+            print("The surface of %d linear elements differs from the pairwise one" % (num_elements))
+            sys.exit(1)
+
+    # Second order elements give second order faces, which split into those of the .surf
+    top = FFEA_topology.FFEA_topology("sphere_63_120.top")
+    surf = top.extract_surface()
+    for f in surf.face:
+        if len(f.n) != 6:
+            print("A second order topology gave linear faces")
+            sys.exit(1)
+        n = top.element[f.elindex].n
+        for i, j in enumerate([[0, 1], [0, 2], [1, 2]]):
+            a, b = [list(n).index(f.n[k]) for k in j]
+            if n[4 + FFEA_topology.linear_edge_nodes.tolist().index(sorted([a, b]))] != f.n[3 + i]:
+                print("A face's second order node is not on its edge")
+                sys.exit(1)
+
+    for i in range(surf.num_faces - 1, -1, -1):
+        surf.split_face(i)
+    expected = FFEA_surface.FFEA_surface("sphere_63_120.surf")
+    if sorted([(eind, sorted(n)) for eind, n in get_faces(surf)]) != sorted([(eind, sorted(n)) for eind, n in get_faces(expected)]):
+        print("The split second order surface differs from sphere_63_120.surf")
+        sys.exit(1)
+
+    sys.exit(0)
+except IOError:
+    print("Couldn't find mesh files that are supposed to be packed in with these tests. Probably a CMake issue!")
+    sys.exit(1)
+except Exception, e:
+    print(e)
+    sys.exit(1)
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+# 
+#  This file is part of the FFEA simulation package
+#  
+#  Copyright (c) by the Theory and Development FFEA teams,
+#  as they appear in the README.md file. 
+# 
+#  FFEA is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+# 
+#  FFEA is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+# 
+#  You should have received a copy of the GNU General Public License
+#  along with FFEA.  If not, see <http://www.gnu.org/licenses/>.
+# 
+#  To help us fund FFEA development, we humbly ask that you cite 
+#  the research papers on the package.
+#
+
+
+import sys
+import numpy as np
+
+try:
+    import FFEA_trajectory, FFEA_measurement
+except ImportError:
+    print("Failure to import FFEA_trajectory or FFEA_measurement")
+    sys.exit(1) # failure to import
+
+def make_frames(num_frames, first = 0):
+    """
+    Header and the text of num_frames copies of the test frame, at steps
+    100 * first, 100 * (first + 1), ...
+    """
+    text = open("unit_test_traj.ftj").read()
+    i = text.index("*\n") + 2
+    return text[:i], "".join([text[i:].replace("step 0\n", "step %d\n" % (100 * f)) for f in range(first, first + num_frames)])
+
+try:
+    # Trajectory: load what is there, then follow what is written after
+    header, frames = make_frames(3)
+    more = make_frames(4, 3)[1]
+    open("follow_traj.ftj", "w").write(header + frames + more[:len(more) // 3])
+
+    traj = FFEA_trajectory.FFEA_trajectory("follow_traj.ftj")
+    num_loaded = traj.num_frames
+    open("follow_traj.ftj", "a").write(more[len(more) // 3:])
+    followed = list(traj.follow(poll_interval=0.01, timeout=0.5))
+
+    full = FFEA_trajectory.FFEA_trajectory("follow_traj.ftj")
+    if num_loaded + len(followed) != full.num_frames or traj.num_frames != full.num_frames:
+        print("Expected %d frames after following, got %d" % (full.num_frames, traj.num_frames))
+        sys.exit(1)
+    for i in range(full.num_frames):
+        f = traj.blob[0][0].frame[i]
+        ff = full.blob[0][0].frame[i]
+        if f.step != ff.step or not np.array_equal(f.pos, ff.pos):
+            print("Followed frame %d differs from the loaded one" % (i))
+            sys.exit(1)
+
+    # Measurements: only the selected columns are followed
+    lines = open("ffea_plain_measurement.fm").readlines()
+    first = [i for i in range(len(lines)) if lines[i].strip() == "Measurements:"][0] + 5
+    open("follow_meas.fm", "w").write("".join(lines[:first]))
+
+    columns = ["StrainEnergy", "Centroid"]
+    meas = FFEA_measurement.FFEA_measurement("follow_meas.fm", columns=columns, cache=False)
+    open("follow_meas.fm", "a").write("".join(lines[first:]))
+    rows = list(meas.follow(poll_interval=0.01, timeout=0.5))
+    full = FFEA_measurement.FFEA_measurement("ffea_plain_measurement.fm", columns=columns, cache=False)
+
+    if len(rows) == 0 or sorted(rows[0].keys()) != sorted(columns + ["Time"]):
+        print("Followed rows hold the wrong measurements")
+        sys.exit(1)
+    for key in full.global_meas:
+        if (meas.global_meas[key] is None) != (full.global_meas[key] is None):
+            print("Measurement '%s' should %sbe there after following" % (key, "not " if full.global_meas[key] is None else ""))
+            sys.exit(1)
+        if full.global_meas[key] is not None and not np.array_equal(meas.global_meas[key], full.global_meas[key]):
+            print("Followed measurement '%s' differs from the loaded one" % (key))
+            sys.exit(1)
+
+    sys.exit(0)
+except IOError:
+    print("Couldn't find trajectory or measurement file that's supposed to be packed in with these tests. Probably a CMake issue!")
+    sys.exit(1)
+except Exception, e:
+    print(e)
+    sys.exit(1)
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+# 
+#  This file is part of the FFEA simulation package
+#  
+#  Copyright (c) by the Theory and Development FFEA teams,
+#  as they appear in the README.md file. 
+# 
+#  FFEA is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+# 
+#  FFEA is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+# 
+#  You should have received a copy of the GNU General Public License
+#  along with FFEA.  If not, see <http://www.gnu.org/licenses/>.
+# 
+#  To help us fund FFEA development, we humbly ask that you cite 
+#  the research papers on the package.
+#
+
+
+import sys, os
+import numpy as np
+
+try:
+    import FFEA_trajectory
+except ImportError:
+    print("Failure to import FFEA_trajectory")
+    sys.exit(1) # failure to import
+
+def make_frames(num_frames, first = 0):
+    """
+    Header and the text of num_frames copies of the test frame, at steps
+    100 * first, 100 * (first + 1), ...
+    """
+    text = open("unit_test_traj.ftj").read()
+    i = text.index("*\n") + 2
+    return text[:i], "".join([text[i:].replace("step 0\n", "step %d\n" % (100 * f)) for f in range(first, first + num_frames)])
+
+def check_index(fname):
+    """
+    The index against a line by line scan of the trajectory.
+    """
+    offset = []
+    step = []
+    fin = open(fname, "r")
+    while True:
+        pos = fin.tell()
+        line = fin.readline()
+        if line == "":
+            break
+        if line.startswith("Blob 0, Conformation"):
+            offset.append(pos)
+            step.append(int(line.split()[5]))
+    fin.close()
+
+    # The old count, from the asterisks
+    num_frames = (open(fname).read().count("*") - 1) / 2
+
+    index = FFEA_trajectory.FFEA_traj_index(fname)
+    if index.num_frames != num_frames or FFEA_trajectory.get_num_frames(fname) != num_frames:
+        print("Expected %d frames in the index, got %d" % (num_frames, index.num_frames))
+        sys.exit(1)
+    if not np.array_equal(index.offset[:-1], offset[:num_frames]) or not np.array_equal(index.step, step[:num_frames]):
+        print("Frame offsets or steps differ from a line by line scan")
+        sys.exit(1)
+
+    # Small chunks find the same frames
+    small = FFEA_trajectory.FFEA_traj_index()
+    small.build(fname, chunk_size = 1000)
+    if not np.array_equal(small.offset, index.offset) or not np.array_equal(small.step, index.step):
+        print("Frame index built in small chunks differs")
+        sys.exit(1)
+
+try:
+    if os.path.exists("index_traj.ftj.idx"):
+        os.remove("index_traj.ftj.idx")
+    header, frames = make_frames(5)
+    fout = open("index_traj.ftj", "w")
+    fout.write(header + frames)
+    fout.close()
+    check_index("index_traj.ftj")
+
+    # A half written frame is not counted
+    frames = make_frames(3, 5)[1]
+    fout = open("index_traj.ftj", "a")
+    fout.write(frames[:len(frames) // 2])
+    fout.close()
+    check_index("index_traj.ftj")
+
+    # until it is finished
+    fout = open("index_traj.ftj", "a")
+    fout.write(frames[len(frames) // 2:])
+    fout.close()
+    check_index("index_traj.ftj")
+
+    if not os.path.exists("index_traj.ftj.idx"):
+        print("Frame index was not written")
+        sys.exit(1)
+
+    sys.exit(0)
+except IOError:
+    print("Couldn't find trajectory file that's supposed to be packed in with these tests. Probably a CMake issue!")
+    sys.exit(1)
+except Exception, e:
+    print(e)
+    sys.exit(1)
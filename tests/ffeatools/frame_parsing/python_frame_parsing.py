@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+# 
+#  This file is part of the FFEA simulation package
+#  
+#  Copyright (c) by the Theory and Development FFEA teams,
+#  as they appear in the README.md file. 
+# 
+#  FFEA is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+# 
+#  FFEA is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+# 
+#  You should have received a copy of the GNU General Public License
+#  along with FFEA.  If not, see <http://www.gnu.org/licenses/>.
+# 
+#  To help us fund FFEA development, we humbly ask that you cite 
+#  the research papers on the package.
+#
+
+
+import sys
+import numpy as np
+
+try:
+    import FFEA_frame
+except ImportError:
+    print("Failure to import FFEA_frame")
+    sys.exit(1) # failure to import
+
+def open_at_nodes(fname):
+    """
+    The test trajectory, positioned at the first node line.
+    """
+    fin = open(fname, "r")
+    while fin.readline().strip() != "DYNAMIC":
+        pass
+    return fin
+
+try:
+    # Line by line, as it has always been done
+    fin = open_at_nodes("unit_test_traj.ftj")
+    ref = FFEA_frame.FFEA_frame()
+    if ref.load_from_traj(fin) != 0:
+        print("Failed to read the test frame line by line")
+        sys.exit(1)
+    end = fin.tell()
+    fin.close()
+
+    # Whole blocks, knowing the number of nodes
+    for onlyNodes in [False, True]:
+        fin = open_at_nodes("unit_test_traj.ftj")
+        frame = FFEA_frame.FFEA_frame()
+        frame.num_nodes = ref.num_nodes
+        if onlyNodes:
+            success = frame.load_from_traj_onlynodes_faster(fin)
+        else:
+            success = frame.load_from_traj_faster(fin)
+
+        if success != 0 or fin.tell() != end:
+            print("Failed to read the test frame as a block (onlyNodes = %s)" % (str(onlyNodes)))
+            sys.exit(1)
+        if not np.array_equal(frame.pos, ref.pos) or (not onlyNodes and not np.array_equal(frame.vel, ref.vel)):
+            print("Block read differs from line by line read (onlyNodes = %s)" % (str(onlyNodes)))
+            sys.exit(1)
+        fin.close()
+
+    # A frame still being written is left alone
+    text = open("unit_test_traj.ftj").read()
+    fout = open("half_written.ftj", "w")
+    fout.write(text[:len(text) // 2])
+    fout.close()
+    fin = open_at_nodes("half_written.ftj")
+    start = fin.tell()
+    frame = FFEA_frame.FFEA_frame()
+    frame.num_nodes = ref.num_nodes
+    if frame.load_from_traj_faster(fin) != 1 or fin.tell() != start:
+        print("Half written frame was not rejected")
+        sys.exit(1)
+    fin.close()
+
+    sys.exit(0)
+except IOError:
+    print("Couldn't find trajectory file that's supposed to be packed in with these tests. Probably a CMake issue!")
+    sys.exit(1)
+except Exception, e:
+    print(e)
+    sys.exit(1)
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+# 
+#  This file is part of the FFEA simulation package
+#  
+#  Copyright (c) by the Theory and Development FFEA teams,
+#  as they appear in the README.md file. 
+# 
+#  FFEA is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+# 
+#  FFEA is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+# 
+#  You should have received a copy of the GNU General Public License
+#  along with FFEA.  If not, see <http://www.gnu.org/licenses/>.
+# 
+#  To help us fund FFEA development, we humbly ask that you cite 
+#  the research papers on the package.
+#
+
+
+import sys
+import numpy as np
+
+try:
+    import FFEA_node, FFEA_topology, FFEA_surface, FFEA_stokes
+except ImportError:
+    print("Failure to import FFEA_node, FFEA_topology, FFEA_surface and FFEA_stokes")
+    sys.exit(1) # failure to import
+
+def get_shapes(objects, pos):
+    """
+    Each element (or face) as the sorted positions of its nodes, so that meshes
+    numbered differently can be compared.
+    """
+    return sorted([sorted([tuple(np.round(pos[i], 6)) for i in o.n]) for o in objects])
+
+try:
+    expected_node = FFEA_node.FFEA_node("sphere_63_120.node")
+    expected_top = FFEA_topology.FFEA_topology("sphere_63_120.top")
+    expected_surf = FFEA_surface.FFEA_surface("sphere_63_120.surf")
+    expected_pos = FFEA_topology.get_positions(expected_node)
+
+    for array_pos in [False, True]:
+        node = FFEA_node.FFEA_node("sphere_63_120.vol")
+        top = FFEA_topology.FFEA_topology("sphere_63_120.vol")
+        surf = FFEA_surface.FFEA_surface("sphere_63_120.vol")
+        surf.get_element_indices(top)
+        stokes = FFEA_stokes.FFEA_stokes()
+        stokes.default(node.num_nodes, top, 1.0)
+        num_linear_nodes = node.num_nodes
+        if array_pos:
+            node.pos = np.array(node.pos)
+
+        top.increase_order(node = node, surf = surf, stokes = stokes)
+        pos = FFEA_topology.get_positions(node)
+
+        if node.num_nodes != expected_node.num_nodes or len(pos) != expected_node.num_nodes:
+            print("Increasing the order gave %d nodes, not %d" % (node.num_nodes, expected_node.num_nodes))
+            sys.exit(1)
+        if stokes.num_nodes != node.num_nodes or stokes.radius[num_linear_nodes:] != [0.0] * (node.num_nodes - num_linear_nodes):
+            print("The new nodes have the wrong stokes radii")
+            sys.exit(1)
+
+        # The elements and faces of the sample second order structure
+        if top.connectivity.shape != (top.num_elements, 10) or surf.connectivity.shape != (surf.num_faces, 3):
+            print("Increasing the order left a linear element or a second order face")
+            sys.exit(1)
+        if get_shapes(top.element, pos) != get_shapes(expected_top.element, expected_pos):
+            print("The second order elements differ from sphere_63_120.top")
+            sys.exit(1)
+        if get_shapes(surf.face, pos) != get_shapes(expected_surf.face, expected_pos):
+            print("The split surface differs from sphere_63_120.surf")
+            sys.exit(1)
+
+        # Each second order node is the midpoint of its edge
+        n = top.get_connectivity()
+        for i, edge in enumerate(FFEA_topology.linear_edge_nodes):
+            if not np.array_equal(pos[n[:,4 + i]], 0.5 * (pos[n[:,edge[0]]] + pos[n[:,edge[1]]])):
+                print("A second order node is not the midpoint of its edge")
+                sys.exit(1)
+        for f in surf.face:
+            if not set(f.n) <= set(top.element[f.elindex].n):
+                print("A surface face is not on its element")
+                sys.exit(1)
+
+    sys.exit(0)
+except IOError:
+    print("Couldn't find mesh files that are supposed to be packed in with these tests. Probably a CMake issue!")
+    sys.exit(1)
+except Exception, e:
+    print(e)
+    sys.exit(1)
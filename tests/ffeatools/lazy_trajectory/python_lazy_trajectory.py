@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+# 
+#  This file is part of the FFEA simulation package
+#  
+#  Copyright (c) by the Theory and Development FFEA teams,
+#  as they appear in the README.md file. 
+# 
+#  FFEA is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+# 
+#  FFEA is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+# 
+#  You should have received a copy of the GNU General Public License
+#  along with FFEA.  If not, see <http://www.gnu.org/licenses/>.
+# 
+#  To help us fund FFEA development, we humbly ask that you cite 
+#  the research papers on the package.
+#
+
+
+import sys, os
+import numpy as np
+
+try:
+    import FFEA_trajectory
+except ImportError:
+    print("Failure to import FFEA_trajectory")
+    sys.exit(1) # failure to import
+
+def make_trajectory(fname, num_frames):
+    """
+    A trajectory of num_frames copies of the test frame, at steps 0, 100, ...
+    """
+    text = open("unit_test_traj.ftj").read()
+    i = text.index("*\n") + 2
+    fout = open(fname, "w")
+    fout.write(text[:i])
+    for f in range(num_frames):
+        fout.write(text[i:].replace("step 0\n", "step %d\n" % (100 * f)))
+    fout.close()
+
+def check_same(traj, lazy):
+    if lazy.num_frames != traj.num_frames or len(lazy.blob[0][0].frame) != len(traj.blob[0][0].frame):
+        print("Expected %d frames in the lazy trajectory, got %d" % (traj.num_frames, lazy.num_frames))
+        sys.exit(1)
+    for i in range(traj.num_frames):
+        f = traj.blob[0][0].frame[i]
+        lf = lazy.blob[0][0].frame[i]
+        if f.step != lf.step or not np.array_equal(f.pos, lf.pos):
+            print("Lazy frame %d differs from the loaded one" % (i))
+            sys.exit(1)
+
+try:
+    make_trajectory("lazy_traj.ftj", 8)
+    if os.path.exists("lazy_traj.ftj.idx"):
+        os.remove("lazy_traj.ftj.idx")
+
+    traj = FFEA_trajectory.FFEA_trajectory("lazy_traj.ftj")
+    lazy = FFEA_trajectory.FFEA_trajectory("lazy_traj.ftj", lazy=True, cache_size=2)
+    check_same(traj, lazy)
+
+    # The index is kept, and reused
+    if not os.path.exists("lazy_traj.ftj.idx"):
+        print("Frame index was not written")
+        sys.exit(1)
+    check_same(traj, FFEA_trajectory.FFEA_trajectory("lazy_traj.ftj", lazy=True))
+
+    # Selections match those of a full load
+    check_same(FFEA_trajectory.FFEA_trajectory("lazy_traj.ftj", start=1, frame_rate=3), FFEA_trajectory.FFEA_trajectory("lazy_traj.ftj", lazy=True, start=1, frame_rate=3))
+
+    # Frames can be deleted and appended
+    for t in [traj, lazy]:
+        t.delete_frame(2)
+        t.delete_frame()
+    check_same(traj, lazy)
+    frame = traj.blob[0][0].frame[0]
+    lazy.append_frame([[0, "DYNAMIC", frame]])
+    if lazy.num_frames != traj.num_frames + 1 or lazy.blob[0][0].frame[-1] is not frame:
+        print("Appended frame not found in the lazy trajectory")
+        sys.exit(1)
+
+    sys.exit(0)
+except IOError:
+    print("Couldn't find trajectory file that's supposed to be packed in with these tests. Probably a CMake issue!")
+    sys.exit(1)
+except Exception, e:
+    print(e)
+    sys.exit(1)
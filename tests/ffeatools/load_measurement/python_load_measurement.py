@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+# 
+#  This file is part of the FFEA simulation package
+#  
+#  Copyright (c) by the Theory and Development FFEA teams,
+#  as they appear in the README.md file. 
+# 
+#  FFEA is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+# 
+#  FFEA is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+# 
+#  You should have received a copy of the GNU General Public License
+#  along with FFEA.  If not, see <http://www.gnu.org/licenses/>.
+# 
+#  To help us fund FFEA development, we humbly ask that you cite 
+#  the research papers on the package.
+#
+
+
+import sys
+import numpy as np
+
+try:
+    import FFEA_measurement
+except ImportError:
+    print("Failure to import FFEA_measurement")
+    sys.exit(1) # failure to import
+
+def read_columns(fname):
+    """
+    The column titles and rows of a measurement file, parsed line by line.
+    """
+    lines = open(fname).read().split("\n")
+    first = lines.index("Measurements:") + 1
+    rows = []
+    for line in lines[first + 1:]:
+        if line.strip() == "" or line.strip() == "#==RESTART==":
+            continue
+        rows.append([float(s) for s in line.split()])
+    return lines[first], np.array(rows)
+
+def same(a, b):
+    a = np.asarray(a)
+    b = np.asarray(b)
+    return a.shape == b.shape and np.array_equal(np.isnan(a), np.isnan(b)) and np.array_equal(a[~np.isnan(a)], b[~np.isnan(b)])
+
+def check_columns(meas, titles, data, frame_rate = 1, num_frames = 1000000):
+    data = data[:num_frames][::frame_rate]
+
+    # Global measurements
+    gtitles = titles.split()
+    for i in range(len(gtitles)):
+        if gtitles[i].startswith("Centroid"):
+            if not same(meas.global_meas["Centroid"][:,"xyz".index(gtitles[i][-1])], data[:,i]):
+                print("Global measurement '%s' differs" % (gtitles[i]))
+                sys.exit(1)
+        elif not same(meas.global_meas[gtitles[i]], data[:,i]):
+            print("Global measurement '%s' differs" % (gtitles[i]))
+            sys.exit(1)
+
+try:
+    fname = "ffea_plain_measurement.fm"
+    titles, data = read_columns(fname)
+    dtitles, ddata = read_columns("ffea_plain_measurement.fdm")
+
+    for frame_rate, num_frames in [(1, 1000000), (3, 1000000), (2, 11)]:
+        meas = FFEA_measurement.FFEA_measurement(fname, frame_rate=frame_rate, num_frames_to_read=num_frames, cache=False)
+        check_columns(meas, titles, data, frame_rate, num_frames)
+
+        # Detailed measurements, blob by blob
+        dsel = ddata[:num_frames][::frame_rate]
+        column = 1
+        for segment in dtitles.split("|")[1:meas.num_blobs + 1]:
+            blob = int(segment.split()[0][1:])
+            for title in segment.split()[1:]:
+                if title.startswith("Centroid"):
+                    value = meas.blob_meas[blob]["Centroid"][:,"xyz".index(title[-1])]
+                else:
+                    value = meas.blob_meas[blob][title]
+                if not same(value, dsel[:,column]):
+                    print("Measurement '%s' of blob %d differs" % (title, blob))
+                    sys.exit(1)
+                column += 1
+
+        if meas.num_frames != len(data[:num_frames][::frame_rate]):
+            print("Expected %d frames, got %d" % (len(data[:num_frames][::frame_rate]), meas.num_frames))
+            sys.exit(1)
+
+    # More rows than wanted: the rows, and where the last one ends
+    lines = ["%d %e %e" % (i, i * 0.5, -i * 0.25) for i in range(20)]
+    lines[5:5] = ["#==RESTART==", ""]
+    lines[14:14] = ["  ", "#==RESTART=="]
+    fout = open("rows.fm", "w")
+    fout.write("header\n" + "\n".join(lines) + "\n" + "20 1.0")
+    fout.close()
+    rows = [l for l in lines if l.strip() not in ("", "#==RESTART==")]
+    for num_rows in [0, 3, 5, 12, 20, 25]:
+        fin = open("rows.fm", "r")
+        fin.readline()
+        data, fpos = FFEA_measurement.read_measurement_rows(fin, 3, num_rows)
+        fin.close()
+        expected = np.array([[float(x) for x in l.split()] for l in rows[:num_rows]]).reshape(-1, 3)
+        last = lines.index(rows[min(num_rows, len(rows)) - 1]) + 1 if num_rows > 0 else 0
+        if not same(data, expected) or fpos != len("header\n") + sum([len(l) + 1 for l in lines[:last]]):
+            print("read_measurement_rows read %d rows wrongly" % (num_rows))
+            sys.exit(1)
+
+    sys.exit(0)
+except IOError:
+    print("Couldn't find measurement file that's supposed to be packed in with these tests. Probably a CMake issue!")
+    sys.exit(1)
+except Exception, e:
+    print(e)
+    sys.exit(1)
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+# 
+#  This file is part of the FFEA simulation package
+#  
+#  Copyright (c) by the Theory and Development FFEA teams,
+#  as they appear in the README.md file. 
+# 
+#  FFEA is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+# 
+#  FFEA is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+# 
+#  You should have received a copy of the GNU General Public License
+#  along with FFEA.  If not, see <http://www.gnu.org/licenses/>.
+# 
+#  To help us fund FFEA development, we humbly ask that you cite 
+#  the research papers on the package.
+#
+
+
+import sys
+import numpy as np
+
+try:
+    import FFEA_pdb
+except ImportError:
+    print("Failure to import FFEA_pdb")
+    sys.exit(1) # failure to import
+
+def make_pdb(fname, num_frames):
+    """
+    A multi-model pdb of two chains, made from the atoms of left.pdb, with
+    coordinates that fill their columns.
+    """
+    atoms = [line for line in open("left.pdb").readlines() if line.startswith("ATOM")]
+    rng = np.random.RandomState(0)
+    fout = open(fname, "w")
+    for f in range(num_frames):
+        fout.write("MODEL     %4d\n" % (f + 1))
+        for c, chain in enumerate("AB"):
+            for line in atoms:
+                x = rng.uniform(-999.0, 999.0, 3)
+                fout.write(line[:6] + "%5d" % (int(line[6:11]) + 1000 * c) + line[11:21] + chain + line[22:30] + "%8.3f%8.3f%8.3f" % tuple(x) + "  1.00  0.00           C  \n")
+            fout.write("TER\n")
+        fout.write("ENDMDL\n")
+    fout.write("END\n")
+    fout.close()
+
+def read_columns(fname):
+    """
+    The ATOM records of each model, read line by line from their columns.
+    """
+    models = []
+    for line in open(fname):
+        if line.startswith("MODEL"):
+            models.append([])
+        elif line.startswith("ATOM"):
+            models[-1].append(line)
+    return models
+
+try:
+    make_pdb("multi.pdb", 6)
+    models = read_columns("multi.pdb")
+
+    for num_frames, chunk_size in [(100000, 1 << 24), (4, 1 << 24), (100000, 1000)]:
+        pdb = FFEA_pdb.FFEA_pdb()
+        pdb.load_pdb("multi.pdb", num_frames_to_read = num_frames, chunk_size = chunk_size)
+        expected = models[:num_frames]
+
+        if pdb.num_chains != 2 or pdb.num_atoms != [len(expected[0]) // 2] * 2 or pdb.num_frames != len(expected):
+            print("Expected 2 chains of %d atoms and %d frames, got %d chains of %s atoms and %d frames" % (len(expected[0]) // 2, len(expected), pdb.num_chains, str(pdb.num_atoms), pdb.num_frames))
+            sys.exit(1)
+
+        for i in range(pdb.num_frames):
+            pos = np.concatenate([pdb.chain[c].frame[i].pos for c in range(pdb.num_chains)])
+            ref = np.array([[float(line[30:38]), float(line[38:46]), float(line[46:54])] for line in expected[i]])
+            if not np.array_equal(pos, ref):
+                print("Positions of frame %d differ from their columns (chunk_size = %d)" % (i, chunk_size))
+                sys.exit(1)
+
+        atoms = [a for c in pdb.chain for a in c.atom]
+        for a, line in zip(atoms, expected[0]):
+            if a.atomID != int(line[6:11]) or a.name != line[12:16] or a.res != line[17:20] or a.resID != int(line[22:26]) or a.occupancy != float(line[54:60]) or a.element != line[76:78]:
+                print("Atom %d differs from its record" % (a.atomID))
+                sys.exit(1)
+
+        if [c.chainID for c in pdb.chain] != ["A", "B"]:
+            print("Wrong chain IDs")
+            sys.exit(1)
+
+    # Single frame, no MODEL records
+    pdb = FFEA_pdb.FFEA_pdb("left.pdb")
+    ref = np.array([[float(line[30:38]), float(line[38:46]), float(line[46:54])] for line in open("left.pdb") if line.startswith("ATOM")])
+    if pdb.num_frames != 1 or not np.array_equal(pdb.chain[0].frame[0].pos, ref):
+        print("left.pdb read wrongly")
+        sys.exit(1)
+
+    sys.exit(0)
+except IOError:
+    print("Couldn't find pdb file that's supposed to be packed in with these tests. Probably a CMake issue!")
+    sys.exit(1)
+except Exception, e:
+    print(e)
+    sys.exit(1)
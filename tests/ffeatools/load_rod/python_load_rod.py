@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+# 
+#  This file is part of the FFEA simulation package
+#  
+#  Copyright (c) by the Theory and Development FFEA teams,
+#  as they appear in the README.md file. 
+# 
+#  FFEA is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+# 
+#  FFEA is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+# 
+#  You should have received a copy of the GNU General Public License
+#  along with FFEA.  If not, see <http://www.gnu.org/licenses/>.
+# 
+#  To help us fund FFEA development, we humbly ask that you cite 
+#  the research papers on the package.
+#
+
+
+import sys
+import numpy as np
+
+try:
+    import FFEA_rod
+except ImportError:
+    print("Failure to import FFEA_rod")
+    sys.exit(1) # failure to import
+
+def make_rod(num_frames, num_elements):
+    """
+    A rod of random values, in every one of the 14 arrays.
+    """
+    rod = FFEA_rod.FFEA_rod(num_elements = num_elements)
+    rng = np.random.RandomState(0)
+    rod.num_frames = num_frames
+    for name in FFEA_rod.rod_row_names:
+        setattr(rod, name, rng.uniform(-1.0, 1.0, (num_frames, num_elements, getattr(rod, name).shape[2])))
+    return rod
+
+def write_rodtraj(rod, fname):
+    """
+    A .rodtraj written one row at a time with np.savetxt.
+    """
+    rod_file = open(fname, "w")
+    rod_file.write("format,ffea_rod\nversion,1\nHEADER,ROD,0\n")
+    rod_file.write("num_elements,%d\nlength,%d\nnum_rods,1\n" % (rod.num_elements, rod.length))
+    for row in range(FFEA_rod.num_rod_rows):
+        rod_file.write("row%d,%s\n" % (row + 1, FFEA_rod.rod_row_names[row]))
+    rod_file.write("CONNECTIONS,ROD,0\n[rodelement], [blobno], [blobelement]\n---END HEADER---\n")
+    for frame in range(rod.num_frames):
+        rod_file.write("FRAME %d ROD 0\n" % (frame))
+        for name in FFEA_rod.rod_row_names:
+            rod_file.write(",".join(["%.18e" % (x) for x in getattr(rod, name)[frame].ravel()]) + "\n")
+    rod_file.close()
+
+def read_rodtraj(fname, num_elements):
+    """
+    The arrays of a .rodtraj, read one line at a time.
+    """
+    arrays = [[] for name in FFEA_rod.rod_row_names]
+    rod_file = open(fname, "r")
+    while True:
+        line = rod_file.readline()
+        if not line:
+            break
+        if line.split(" ")[0] == "FRAME":
+            for array in arrays:
+                array.append(np.fromstring(rod_file.readline(), sep=",").reshape(num_elements, -1))
+    rod_file.close()
+    return dict(zip(FFEA_rod.rod_row_names, [np.array(array) for array in arrays]))
+
+def check(rod, expected, what):
+    if rod.num_frames != len(expected["equil_r"]) or rod.num_elements != expected["equil_r"].shape[1]:
+        print(what + " has %d frames of %d elements, not %d of %d" % (rod.num_frames, rod.num_elements, len(expected["equil_r"]), expected["equil_r"].shape[1]))
+        sys.exit(1)
+    for name in FFEA_rod.rod_row_names:
+        if not np.array_equal(getattr(rod, name), expected[name]):
+            print(what + " read " + name + " wrongly")
+            sys.exit(1)
+
+try:
+    write_rodtraj(make_rod(10, 6), "test.rodtraj")
+    expected = read_rodtraj("test.rodtraj", 6)
+
+    check(FFEA_rod.FFEA_rod("test.rodtraj"), expected, "The rod")
+
+    # Small chunks and blocks, decoded in several processes
+    rod = FFEA_rod.FFEA_rod(num_elements = 6)
+    rod.filename = "test.rodtraj"
+    rod.load_header()
+    rod.get_trajectory_length(chunk_size = 100)
+    rod.load_trajectory(num_processes = 2, frames_per_block = 3)
+    check(rod, expected, "The rod read in blocks")
+
+    # Memory mapped arrays
+    rod = FFEA_rod.FFEA_rod("test.rodtraj", memmap_prefix = "test_memmap")
+    check(rod, expected, "The memory mapped rod")
+    if not isinstance(rod.current_r, np.memmap):
+        print("current_r is not memory mapped")
+        sys.exit(1)
+
+    # A frame still being written is left out
+    text = open("test.rodtraj").read()
+    last_frame = text.rfind("FRAME ")
+    partial = open("partial.rodtraj", "w")
+    partial.write(text + text[last_frame:last_frame + (len(text) - last_frame) // 2])
+    partial.close()
+    check(FFEA_rod.FFEA_rod("partial.rodtraj"), expected, "The rod with a partial frame")
+
+    sys.exit(0)
+except IOError:
+    print("Couldn't write or read the rod trajectory files. Probably a CMake issue!")
+    sys.exit(1)
+except Exception, e:
+    print(e)
+    sys.exit(1)
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+# 
+#  This file is part of the FFEA simulation package
+#  
+#  Copyright (c) by the Theory and Development FFEA teams,
+#  as they appear in the README.md file. 
+# 
+#  FFEA is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+# 
+#  FFEA is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+# 
+#  You should have received a copy of the GNU General Public License
+#  along with FFEA.  If not, see <http://www.gnu.org/licenses/>.
+# 
+#  To help us fund FFEA development, we humbly ask that you cite 
+#  the research papers on the package.
+#
+
+
+import sys, os
+import numpy as np
+
+try:
+    import FFEA_measurement
+except ImportError:
+    print("Failure to import FFEA_measurement")
+    sys.exit(1) # failure to import
+
+def same(a, b):
+    if a is None or b is None:
+        return a is None and b is None
+    a = np.asarray(a)
+    b = np.asarray(b)
+    return a.shape == b.shape and np.array_equal(np.isnan(a), np.isnan(b)) and np.array_equal(a[~np.isnan(a)], b[~np.isnan(b)])
+
+def all_measurements(meas):
+    """
+    (name, value) of every measurement held.
+    """
+    out = [("global " + key, meas.global_meas[key]) for key in meas.global_meas]
+    for i in range(len(meas.blob_meas)):
+        out.extend([("blob %d %s" % (i, key), meas.blob_meas[i][key]) for key in meas.blob_meas[i]])
+        for j in range(len(meas.interblob_meas[i])):
+            out.extend([("interblob %d %d %s" % (i, j, key), meas.interblob_meas[i][j][key]) for key in meas.interblob_meas[i][j]])
+    return sorted(out)
+
+def check_same(meas, ref, what):
+    m = all_measurements(meas)
+    r = all_measurements(ref)
+    if [k for k, v in m] != [k for k, v in r]:
+        print("Different measurements held by the %s load" % (what))
+        sys.exit(1)
+    for (key, value), (rkey, rvalue) in zip(m, r):
+        if not same(value, rvalue):
+            print("Measurement '%s' differs in the %s load" % (key, what))
+            sys.exit(1)
+
+try:
+    fname = "ffea_plain_measurement.fm"
+    cfname = fname + ".cache"
+    if os.path.exists(cfname):
+        os.remove(cfname)
+
+    # Parsed and cached the first time, read from the cache the next
+    ref = FFEA_measurement.FFEA_measurement(fname, cache=False)
+    check_same(FFEA_measurement.FFEA_measurement(fname), ref, "first cached")
+    if not os.path.exists(cfname):
+        print("Measurement cache was not written")
+        sys.exit(1)
+    mtime = os.stat(cfname).st_mtime
+    check_same(FFEA_measurement.FFEA_measurement(fname), ref, "cached")
+
+    # Thinning and column selection give what the text files would
+    for frame_rate, num_frames, columns in [(3, 1000000, None), (2, 9, None), (1, 1000000, ["RMSD", "Centroid"]), (2, 1000000, ["StrainEnergy"])]:
+        meas = FFEA_measurement.FFEA_measurement(fname, frame_rate=frame_rate, num_frames_to_read=num_frames, columns=columns)
+        ref = FFEA_measurement.FFEA_measurement(fname, frame_rate=frame_rate, num_frames_to_read=num_frames, columns=columns, cache=False)
+        check_same(meas, ref, "cached (frame_rate = %d, num_frames_to_read = %d, columns = %s)" % (frame_rate, num_frames, str(columns)))
+
+        if columns != None:
+            for key in meas.global_meas:
+                if (meas.global_meas[key] is None) == (key == "Time" or key in columns):
+                    print("Column selection %s not applied to '%s'" % (str(columns), key))
+                    sys.exit(1)
+
+    if os.stat(cfname).st_mtime != mtime:
+        print("Up to date cache was rewritten")
+        sys.exit(1)
+
+    # A changed file makes the cache stale
+    lines = open(fname).readlines()
+    open("stale_measurement.fm", "w").write("".join(lines))
+    FFEA_measurement.FFEA_measurement("stale_measurement.fm")
+    open("stale_measurement.fm", "w").write("".join(lines[:-3]))
+    check_same(FFEA_measurement.FFEA_measurement("stale_measurement.fm"), FFEA_measurement.FFEA_measurement("stale_measurement.fm", cache=False), "stale cache")
+
+    sys.exit(0)
+except IOError:
+    print("Couldn't find measurement file that's supposed to be packed in with these tests. Probably a CMake issue!")
+    sys.exit(1)
+except Exception, e:
+    print(e)
+    sys.exit(1)
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+# 
+#  This file is part of the FFEA simulation package
+#  
+#  Copyright (c) by the Theory and Development FFEA teams,
+#  as they appear in the README.md file. 
+# 
+#  FFEA is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+# 
+#  FFEA is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+# 
+#  You should have received a copy of the GNU General Public License
+#  along with FFEA.  If not, see <http://www.gnu.org/licenses/>.
+# 
+#  To help us fund FFEA development, we humbly ask that you cite 
+#  the research papers on the package.
+#
+
+
+import sys
+import numpy as np
+
+try:
+    import FFEA_trajectory
+except ImportError:
+    print("Failure to import FFEA_trajectory")
+    sys.exit(1) # failure to import
+
+def make_trajectory(fname, num_frames):
+    """
+    A trajectory of num_frames copies of the test frame, at steps 0, 100, ...
+    """
+    text = open("unit_test_traj.ftj").read()
+    i = text.index("*\n") + 2
+    fout = open(fname, "w")
+    fout.write(text[:i])
+    for f in range(num_frames):
+        fout.write(text[i:].replace("step 0\n", "step %d\n" % (100 * f)))
+    fout.close()
+
+try:
+    make_trajectory("parallel_traj.ftj", 9)
+
+    for onlyNodes in [False, True]:
+        for start, frame_rate in [(0, 1), (2, 3)]:
+            traj = FFEA_trajectory.FFEA_trajectory("parallel_traj.ftj", start=start, frame_rate=frame_rate, onlyNodes=onlyNodes)
+            ptraj = FFEA_trajectory.FFEA_trajectory("parallel_traj.ftj", start=start, frame_rate=frame_rate, onlyNodes=onlyNodes, num_processes=2)
+
+            if ptraj.num_frames != traj.num_frames:
+                print("Expected %d frames from the parallel load, got %d" % (traj.num_frames, ptraj.num_frames))
+                sys.exit(1)
+
+            for i in range(traj.num_frames):
+                f = traj.blob[0][0].frame[i]
+                pf = ptraj.blob[0][0].frame[i]
+                if f.step != pf.step or not np.array_equal(f.pos, pf.pos) or (not onlyNodes and not np.array_equal(f.vel, pf.vel)):
+                    print("Parallel frame %d differs from the serial one (start = %d, frame_rate = %d, onlyNodes = %s)" % (i, start, frame_rate, str(onlyNodes)))
+                    sys.exit(1)
+
+    sys.exit(0)
+except IOError:
+    print("Couldn't find trajectory file that's supposed to be packed in with these tests. Probably a CMake issue!")
+    sys.exit(1)
+except Exception, e:
+    print(e)
+    sys.exit(1)
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+# 
+#  This file is part of the FFEA simulation package
+#  
+#  Copyright (c) by the Theory and Development FFEA teams,
+#  as they appear in the README.md file. 
+# 
+#  FFEA is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+# 
+#  FFEA is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+# 
+#  You should have received a copy of the GNU General Public License
+#  along with FFEA.  If not, see <http://www.gnu.org/licenses/>.
+# 
+#  To help us fund FFEA development, we humbly ask that you cite 
+#  the research papers on the package.
+#
+
+
+import sys
+import numpy as np
+
+try:
+    import FFEA_trajectory, FFEA_pdb
+except ImportError:
+    print("Failure to import FFEA_trajectory or FFEA_pdb")
+    sys.exit(1) # failure to import
+
+try:
+    traj = FFEA_trajectory.FFEA_trajectory("unit_test_traj.ftj")
+    pos = [np.array(f.pos) for f in traj.blob[0][0].frame]
+    step, centroid = traj.blob[0][0].calc_centroid_trajectory()
+
+    # Trajectory (m) -> pdb (Angstrom)
+    pdb = FFEA_pdb.FFEA_pdb("")
+    pdb.build_from_traj(traj)
+    for i in range(traj.num_frames):
+        if not np.allclose(pdb.chain[0].frame[i].pos, pos[i] * 1e10):
+            print("pdb positions are not in Angstroms in frame %d" % (i))
+            sys.exit(1)
+
+    # and back again (m)
+    rtraj = FFEA_trajectory.FFEA_trajectory("")
+    rtraj.build_from_pdb(pdb)
+    for i in range(traj.num_frames):
+        if not np.allclose(rtraj.blob[0][0].frame[i].pos, pos[i]):
+            print("Round trip positions are not in metres in frame %d" % (i))
+            sys.exit(1)
+
+    rstep, rcentroid = rtraj.blob[0][0].calc_centroid_trajectory()
+    if not np.allclose(rcentroid, centroid):
+        print("Round trip centroid %s differs from %s" % (str(rcentroid[0]), str(centroid[0])))
+        sys.exit(1)
+
+    # Neither conversion may change what it was built from
+    pdb.translate([1.0, 0.0, 0.0])
+    rtraj.translate([1.0, 0.0, 0.0])
+    for i in range(traj.num_frames):
+        if not np.array_equal(traj.blob[0][0].frame[i].pos, pos[i]):
+            print("Original trajectory changed in frame %d" % (i))
+            sys.exit(1)
+        if not np.allclose(pdb.chain[0].frame[i].pos, pos[i] * 1e10 + [1.0, 0.0, 0.0]):
+            print("pdb changed by translating the trajectory built from it in frame %d" % (i))
+            sys.exit(1)
+
+    sys.exit(0)
+except IOError:
+    print("Couldn't find trajectory file that's supposed to be packed in with these tests. Probably a CMake issue!")
+    sys.exit(1)
+except Exception, e:
+    print(e)
+    sys.exit(1)
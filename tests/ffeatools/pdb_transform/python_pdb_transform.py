@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+# 
+#  This file is part of the FFEA simulation package
+#  
+#  Copyright (c) by the Theory and Development FFEA teams,
+#  as they appear in the README.md file. 
+# 
+#  FFEA is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+# 
+#  FFEA is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+# 
+#  You should have received a copy of the GNU General Public License
+#  along with FFEA.  If not, see <http://www.gnu.org/licenses/>.
+# 
+#  To help us fund FFEA development, we humbly ask that you cite 
+#  the research papers on the package.
+#
+
+
+import sys
+import numpy as np
+
+try:
+    import FFEA_pdb
+except ImportError:
+    print("Failure to import FFEA_pdb")
+    sys.exit(1) # failure to import
+
+def make_pdb(fname, num_frames):
+    """
+    A multi-model pdb of two chains, made from the atoms of left.pdb.
+    """
+    atoms = [line for line in open("left.pdb").readlines() if line.startswith("ATOM")]
+    rng = np.random.RandomState(0)
+    fout = open(fname, "w")
+    for f in range(num_frames):
+        fout.write("MODEL     %4d\n" % (f + 1))
+        for c, chain in enumerate("AB"):
+            for line in atoms:
+                x = rng.uniform(-50.0, 50.0, 3)
+                fout.write(line[:6] + "%5d" % (int(line[6:11]) + 1000 * c) + line[11:21] + chain + line[22:30] + "%8.3f%8.3f%8.3f" % tuple(x) + "  1.00  0.00           C  \n")
+            fout.write("TER\n")
+        fout.write("ENDMDL\n")
+    fout.write("END\n")
+    fout.close()
+
+def rotation(rot):
+    """
+    The rotation matrix of 3 angles in degrees, rotating in x, then y, then z.
+    """
+    c = np.cos
+    s = np.sin
+    x, y, z = np.radians(rot)
+    Rx = np.array([[1, 0, 0],[0,c(x),-s(x)],[0,s(x),c(x)]])
+    Ry = np.array([[c(y), 0, s(y)],[0,1,0],[-s(y),0,c(y)]])
+    Rz = np.array([[c(z),-s(z),0],[s(z),c(z),0], [0,0,1]])
+    return np.dot(Rz, np.dot(Ry, Rx))
+
+def get_pos(pdb):
+    """
+    The positions of every chain, one frame at a time, as (frames, atoms, 3).
+    """
+    return np.array([np.concatenate([pdb.chain[c].frame[i].pos for c in range(pdb.num_chains)]) for i in range(pdb.num_frames)])
+
+def check(pdb, expected, what):
+    if not np.allclose(get_pos(pdb), expected, rtol = 0, atol = 1e-9):
+        print(what + " moved the atoms to the wrong places")
+        sys.exit(1)
+
+try:
+    make_pdb("multi.pdb", 5)
+    pdb = FFEA_pdb.FFEA_pdb("multi.pdb")
+    pos = get_pos(pdb)
+    rng = np.random.RandomState(1)
+
+    # Centroids
+    cent = np.array([p.mean(axis = 0) for p in pos])
+    if not np.allclose(pdb.get_centroid(), cent) or not np.allclose(pdb.get_centroid(3), cent[3]):
+        print("get_centroid is wrong")
+        sys.exit(1)
+
+    # Translations
+    trans = rng.uniform(-10.0, 10.0, 3)
+    pdb.translate(trans)
+    pos += trans
+    check(pdb, pos, "translate")
+
+    pdb.translate(-trans, findex = [1, 3])
+    pos[[1, 3]] -= trans
+    check(pdb, pos, "translate of some frames")
+
+    # A single frame, about its centroid or a given point
+    rot = rng.uniform(0.0, 360.0, 3)
+    pdb.rotate_full_system(rot, findex = 2)
+    c = pos[2].mean(axis = 0)
+    pos[2] = np.array([np.dot(rotation(rot), x - c) + c for x in pos[2]])
+    check(pdb, pos, "rotate_full_system")
+
+    c = rng.uniform(-10.0, 10.0, 3)
+    pdb.rotate_full_system(rotation(rot).ravel(), cent = c, findex = 0)
+    pos[0] = np.array([np.dot(rotation(rot), x - c) + c for x in pos[0]])
+    check(pdb, pos, "rotate_full_system with a matrix")
+
+    # Each chain about its own centroid
+    pdb.rotate_chains_individually(rot)
+    for i in range(pdb.num_frames):
+        first_atom = 0
+        for n in pdb.num_atoms:
+            c = pos[i, first_atom:first_atom + n].mean(axis = 0)
+            pos[i, first_atom:first_atom + n] = [np.dot(rotation(rot), x - c) + c for x in pos[i, first_atom:first_atom + n]]
+            first_atom += n
+    check(pdb, pos, "rotate_chains_individually")
+
+    # A different transform per frame
+    rots = rng.uniform(0.0, 360.0, (pdb.num_frames, 3))
+    trans = rng.uniform(-10.0, 10.0, (pdb.num_frames, 3))
+    pdb.transform(rot = rots, trans = trans)
+    for i in range(pdb.num_frames):
+        pos[i] = [np.dot(rotation(rots[i]), x) + trans[i] for x in pos[i]]
+    check(pdb, pos, "transform")
+
+    # Every frame moves with the one put at pos
+    p = rng.uniform(-10.0, 10.0, 3)
+    pdb.set_pos(p, findex = 1)
+    pos += p - pos[1].mean(axis = 0)
+    check(pdb, pos, "set_pos")
+
+    # Frames replaced by hand are gathered again
+    pdb.chain[1].frame[4].pos = pdb.chain[1].frame[4].pos + 1.0
+    pos[4, pdb.num_atoms[0]:] += 1.0
+    pdb.translate(trans[0])
+    pos += trans[0]
+    check(pdb, pos, "translate after replacing a frame")
+
+    sys.exit(0)
+except IOError:
+    print("Couldn't find pdb file that's supposed to be packed in with these tests. Probably a CMake issue!")
+    sys.exit(1)
+except Exception, e:
+    print(e)
+    sys.exit(1)
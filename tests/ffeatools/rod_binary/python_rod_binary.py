@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+# 
+#  This file is part of the FFEA simulation package
+#  
+#  Copyright (c) by the Theory and Development FFEA teams,
+#  as they appear in the README.md file. 
+# 
+#  FFEA is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+# 
+#  FFEA is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+# 
+#  You should have received a copy of the GNU General Public License
+#  along with FFEA.  If not, see <http://www.gnu.org/licenses/>.
+# 
+#  To help us fund FFEA development, we humbly ask that you cite 
+#  the research papers on the package.
+#
+
+
+import sys
+import numpy as np
+import cStringIO as StringIO
+
+try:
+    import FFEA_rod
+except ImportError:
+    print("Failure to import FFEA_rod")
+    sys.exit(1) # failure to import
+
+def make_rod(num_frames, num_elements, seed = 0):
+    """
+    A rod of random values, in every one of the 14 arrays.
+    """
+    rod = FFEA_rod.FFEA_rod(num_elements = num_elements)
+    rng = np.random.RandomState(seed)
+    rod.num_frames = num_frames
+    for name in FFEA_rod.rod_row_names:
+        setattr(rod, name, rng.uniform(-1.0, 1.0, (num_frames, num_elements, getattr(rod, name).shape[2])))
+    return rod
+
+def old_write_rod(rod, fname):
+    """
+    The .rodtraj, written one row at a time with np.savetxt.
+    """
+    rod_file = open(fname, "w")
+    rod_file.write("format,ffea_rod\n")
+    rod_file.write("version,"+str(FFEA_rod.rod_creator_version)+"\n")
+    rod_file.write("HEADER,ROD,"+str(rod.rod_no)+"\n")
+    rod_file.write("num_elements,"+str(rod.num_elements)+"\n")
+    rod_file.write("length,"+str(rod.length)+"\n")
+    rod_file.write("num_rods,"+str(rod.num_rods)+"\n")
+    for row in range(FFEA_rod.num_rod_rows):
+        rod_file.write("row"+str(row+1)+","+FFEA_rod.rod_row_names[row]+"\n")
+    rod_file.write("CONNECTIONS,ROD,0\n")
+    rod_file.write("[rodelement], [blobno], [blobelement]\n")
+    rod_file.write("---END HEADER---\n")
+    for frame in range(rod.num_frames):
+        rod_file.write("FRAME "+str(frame)+" ROD "+str(rod.rod_no)+"\n")
+        for name in FFEA_rod.rod_row_names:
+            sio = StringIO.StringIO()
+            np.savetxt(sio, getattr(rod, name)[frame].flatten(), newline=",")
+            rod_file.write(sio.getvalue()[:-1]+"\n")
+    rod_file.close()
+
+def check(rod, expected, what, dtype = np.float64):
+    if rod.num_frames != expected.num_frames or rod.num_elements != expected.num_elements:
+        print(what + " has %d frames of %d elements, not %d of %d" % (rod.num_frames, rod.num_elements, expected.num_frames, expected.num_elements))
+        sys.exit(1)
+    for name in FFEA_rod.rod_row_names:
+        if not np.array_equal(getattr(rod, name), getattr(expected, name).astype(dtype)):
+            print(what + " has the wrong " + name)
+            sys.exit(1)
+
+try:
+    rod = make_rod(9, 7)
+
+    # The text writer
+    rod.write_rod("test.rodtraj")
+    old_write_rod(rod, "old.rodtraj")
+    if open("test.rodtraj").read() != open("old.rodtraj").read():
+        print("write_rod wrote a different .rodtraj from np.savetxt")
+        sys.exit(1)
+
+    # The binary writer and reader
+    rod.write_binary_rod("test.rodb")
+    check(FFEA_rod.FFEA_rod("test.rodb"), rod, "The .rodb")
+    rod.write_rod("test_by_name.rodb")
+    check(FFEA_rod.FFEA_rod("test_by_name.rodb"), rod, "The .rodb written by write_rod")
+    rod.write_binary_rod("test32.rodb", dtype = np.float32)
+    check(FFEA_rod.FFEA_rod("test32.rodb"), rod, "The single precision .rodb", np.float32)
+
+    # Changing a loaded .rodb leaves the file as it is
+    binary = FFEA_rod.FFEA_rod("test.rodb")
+    binary.current_r[:] = 0.0
+    check(FFEA_rod.FFEA_rod("test.rodb"), rod, "The .rodb after changing a loaded copy")
+
+    # The cache is made on the first load, and used on the next
+    text = FFEA_rod.FFEA_rod("test.rodtraj")
+    check(FFEA_rod.FFEA_rod("test.rodtraj", cache = True), text, "The rod that made the cache")
+    cached = FFEA_rod.FFEA_rod("test.rodtraj", cache = True)
+    if not isinstance(cached.current_r, np.memmap):
+        print("The cache was not used")
+        sys.exit(1)
+    check(cached, text, "The cached rod")
+
+    # A changed trajectory makes a new cache
+    rod = make_rod(5, 7, seed = 1)
+    rod.write_rod("test.rodtraj")
+    text = FFEA_rod.FFEA_rod("test.rodtraj")
+    check(FFEA_rod.FFEA_rod("test.rodtraj", cache = True), text, "The rod after changing the trajectory")
+    check(FFEA_rod.FFEA_rod("test.rodtraj", cache = True), text, "The new cache")
+
+    sys.exit(0)
+except IOError:
+    print("Couldn't write or read the rod trajectory files. Probably a CMake issue!")
+    sys.exit(1)
+except Exception, e:
+    print(e)
+    sys.exit(1)
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+# 
+#  This file is part of the FFEA simulation package
+#  
+#  Copyright (c) by the Theory and Development FFEA teams,
+#  as they appear in the README.md file. 
+# 
+#  FFEA is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+# 
+#  FFEA is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+# 
+#  You should have received a copy of the GNU General Public License
+#  along with FFEA.  If not, see <http://www.gnu.org/licenses/>.
+# 
+#  To help us fund FFEA development, we humbly ask that you cite 
+#  the research papers on the package.
+#
+
+
+import sys
+import numpy as np
+
+try:
+    import FFEA_trajectory, FFEA_frame
+except ImportError:
+    print("Failure to import FFEA_trajectory")
+    sys.exit(1) # failure to import
+
+def make_trajectory(fname, num_frames):
+    """
+    A trajectory of num_frames copies of the test frame, at steps 0, 100, ...
+    """
+    text = open("unit_test_traj.ftj").read()
+    i = text.index("*\n") + 2
+    fout = open(fname, "w")
+    fout.write(text[:i])
+    for f in range(num_frames):
+        fout.write(text[i:].replace("step 0\n", "step %d\n" % (100 * f)))
+    fout.close()
+
+Frame = FFEA_frame.FFEA_frame
+
+class CountedFrame(Frame):
+    """
+    An FFEA_frame that counts how many of them have been made.
+    """
+    made = 0
+    def __init__(self):
+        CountedFrame.made += 1
+        Frame.__init__(self)
+
+try:
+    make_trajectory("stream_traj.ftj", 10)
+    traj = FFEA_trajectory.FFEA_trajectory("stream_traj.ftj")
+
+    for start, stop, stride in [(0, None, 1), (0, 4, 1), (1, None, 3), (2, 7, 2)]:
+        header = FFEA_trajectory.FFEA_trajectory("stream_traj.ftj", load_all=0)
+        expected = range(traj.num_frames)[start:stop:stride]
+        streamed = list(header.iter_frames(start=start, stop=stop, stride=stride))
+        if len(streamed) != len(expected):
+            print("Expected %d frames from iter_frames(%d, %s, %d), got %d" % (len(expected), start, str(stop), stride, len(streamed)))
+            sys.exit(1)
+
+        for i, frames in zip(expected, streamed):
+            f = traj.blob[0][0].frame[i]
+            sf = frames[0][0]
+            if f.step != sf.step or not np.array_equal(f.pos, sf.pos) or not np.array_equal(f.vel, sf.vel):
+                print("Streamed frame %d differs from the loaded one" % (i))
+                sys.exit(1)
+
+        # Nothing is kept
+        if header.num_frames != 0 or len(header.blob[0][0].frame) != 0:
+            print("iter_frames stored frames in the trajectory")
+            sys.exit(1)
+
+    # Reused frames are decoded into the same arrays every time
+    for onlyNodes in [True, False]:
+        header = FFEA_trajectory.FFEA_trajectory("stream_traj.ftj", load_all=0)
+        frame = None
+        steps = []
+        FFEA_trajectory.FFEA_frame.FFEA_frame = CountedFrame
+        CountedFrame.made = 0
+        for frames in header.iter_frames(onlyNodes=onlyNodes, reuse=True):
+            if frame != None and (frames[0][0] is not frame or frame.pos is not pos or (not onlyNodes and frame.vel is not vel)):
+                print("Reused frame was not handed out again with the same arrays")
+                sys.exit(1)
+            frame = frames[0][0]
+            pos = frame.pos
+            vel = frame.vel
+            steps.append(frame.step)
+            f = traj.blob[0][0].frame[len(steps) - 1]
+            if not np.array_equal(frame.pos, f.pos) or (not onlyNodes and not np.array_equal(frame.vel, f.vel)):
+                print("Reused frame %d differs from the loaded one" % (len(steps) - 1))
+                sys.exit(1)
+
+        FFEA_trajectory.FFEA_frame.FFEA_frame = Frame
+        if steps != [f.step for f in traj.blob[0][0].frame]:
+            print("Reused frames have the wrong steps")
+            sys.exit(1)
+        if CountedFrame.made != 1:
+            print("%d frames were made to stream %d reused ones" % (CountedFrame.made, len(steps)))
+            sys.exit(1)
+
+    sys.exit(0)
+except IOError:
+    print("Couldn't find trajectory file that's supposed to be packed in with these tests. Probably a CMake issue!")
+    sys.exit(1)
+except Exception, e:
+    print(e)
+    sys.exit(1)
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+# 
+#  This file is part of the FFEA simulation package
+#  
+#  Copyright (c) by the Theory and Development FFEA teams,
+#  as they appear in the README.md file. 
+# 
+#  FFEA is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+# 
+#  FFEA is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+# 
+#  You should have received a copy of the GNU General Public License
+#  along with FFEA.  If not, see <http://www.gnu.org/licenses/>.
+# 
+#  To help us fund FFEA development, we humbly ask that you cite 
+#  the research papers on the package.
+#
+
+
+import sys
+import numpy as np
+
+try:
+    import FFEA_trajectory, FFEA_measurement
+except ImportError:
+    print("Failure to import FFEA_trajectory or FFEA_measurement")
+    sys.exit(1) # failure to import
+
+def make_trajectory(fname, num_frames):
+    """
+    A trajectory of num_frames copies of the test frame, at steps 0, 100, ...
+    """
+    text = open("unit_test_traj.ftj").read()
+    i = text.index("*\n") + 2
+    fout = open(fname, "w")
+    fout.write(text[:i])
+    for f in range(num_frames):
+        fout.write(text[i:].replace("step 0\n", "step %d\n" % (100 * f)))
+    fout.close()
+
+def same(a, b):
+    if a is None or b is None:
+        return a is None and b is None
+    a = np.asarray(a)
+    b = np.asarray(b)
+    return a.shape == b.shape and np.array_equal(np.isnan(a), np.isnan(b)) and np.array_equal(a[~np.isnan(a)], b[~np.isnan(b)])
+
+try:
+    # Trajectories: the same frames as a thinned load
+    make_trajectory("thin_traj.ftj", 10)
+    for start, stop, frame_rate in [(0, None, 1), (0, None, 3), (2, 8, 2)]:
+        num_written = FFEA_trajectory.rewrite_trajectory("thin_traj.ftj", "thinned_traj.ftj", start=start, stop=stop, frame_rate=frame_rate)
+        num_frames = 1000000 if stop == None else stop - start
+        traj = FFEA_trajectory.FFEA_trajectory("thin_traj.ftj", start=start, frame_rate=frame_rate, num_frames_to_read=num_frames)
+        thinned = FFEA_trajectory.FFEA_trajectory("thinned_traj.ftj")
+        if num_written != traj.num_frames or thinned.num_frames != traj.num_frames:
+            print("Expected %d frames in the thinned trajectory, got %d" % (traj.num_frames, thinned.num_frames))
+            sys.exit(1)
+        for i in range(traj.num_frames):
+            f = traj.blob[0][0].frame[i]
+            tf = thinned.blob[0][0].frame[i]
+            if f.step != tf.step or not np.array_equal(f.pos, tf.pos) or not np.array_equal(f.vel, tf.vel):
+                print("Thinned frame %d differs (start = %d, stop = %s, frame_rate = %d)" % (i, start, str(stop), frame_rate))
+                sys.exit(1)
+
+    # Measurements: the same rows as a thinned load, in both files
+    fname = "ffea_plain_measurement.fm"
+    for stop, frame_rate in [(None, 1), (None, 4), (13, 2)]:
+        num_written = FFEA_measurement.rewrite_measurement(fname, "thinned_measurement.fm", stop=stop, frame_rate=frame_rate)
+        num_frames = 1000000 if stop == None else stop
+        meas = FFEA_measurement.FFEA_measurement(fname, frame_rate=frame_rate, num_frames_to_read=num_frames, cache=False)
+        thinned = FFEA_measurement.FFEA_measurement("thinned_measurement.fm", cache=False)
+        if num_written != meas.num_frames or thinned.num_frames != meas.num_frames:
+            print("Expected %d rows in the thinned measurements, got %d" % (meas.num_frames, thinned.num_frames))
+            sys.exit(1)
+        for key in meas.global_meas:
+            if not same(meas.global_meas[key], thinned.global_meas[key]):
+                print("Thinned global measurement '%s' differs (stop = %s, frame_rate = %d)" % (key, str(stop), frame_rate))
+                sys.exit(1)
+        for i in range(meas.num_blobs):
+            for key in meas.blob_meas[i]:
+                if not same(meas.blob_meas[i][key], thinned.blob_meas[i][key]):
+                    print("Thinned measurement '%s' of blob %d differs (stop = %s, frame_rate = %d)" % (key, i, str(stop), frame_rate))
+                    sys.exit(1)
+
+    # A time range
+    meas = FFEA_measurement.FFEA_measurement(fname, cache=False)
+    t = meas.global_meas["Time"]
+    FFEA_measurement.rewrite_measurement(fname, "thinned_measurement.fm", time_range=(t[5], t[10]))
+    thinned = FFEA_measurement.FFEA_measurement("thinned_measurement.fm", cache=False)
+    if not np.array_equal(thinned.global_meas["Time"], t[5:11]):
+        print("Time range not applied")
+        sys.exit(1)
+
+    sys.exit(0)
+except IOError:
+    print("Couldn't find trajectory or measurement file that's supposed to be packed in with these tests. Probably a CMake issue!")
+    sys.exit(1)
+except Exception, e:
+    print(e)
+    sys.exit(1)
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+# 
+#  This file is part of the FFEA simulation package
+#  
+#  Copyright (c) by the Theory and Development FFEA teams,
+#  as they appear in the README.md file. 
+# 
+#  FFEA is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+# 
+#  FFEA is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+# 
+#  You should have received a copy of the GNU General Public License
+#  along with FFEA.  If not, see <http://www.gnu.org/licenses/>.
+# 
+#  To help us fund FFEA development, we humbly ask that you cite 
+#  the research papers on the package.
+#
+
+
+import sys
+import numpy as np
+
+try:
+    import FFEA_topology
+except ImportError:
+    print("Failure to import FFEA_topology")
+    sys.exit(1) # failure to import
+
+try:
+    top = FFEA_topology.FFEA_topology("emd_5043_8ang.vol")
+    n = np.array([e.n for e in top.element])
+    adjacency = top.get_adjacency()
+
+    # Every 20th element, against all others by the number of nodes they share
+    for i in range(0, top.num_elements, 20):
+        shared = np.isin(n, n[i]).sum(axis = 1)
+        shared[i] = 0
+        face_neighbours = np.where(shared == 3)[0]
+        edge_neighbours = np.where(shared >= 2)[0]
+
+        neighbours = top.get_face_neighbours(i)
+        if sorted(neighbours[neighbours != -1].tolist()) != face_neighbours.tolist():
+            print("Element %d has the wrong face neighbours" % (i))
+            sys.exit(1)
+        for j in range(4):
+            face = n[i][FFEA_topology.linear_face_nodes[j]]
+            if neighbours[j] != -1 and not np.all(np.isin(face, n[neighbours[j]])):
+                print("Face %d of element %d is not on its neighbour" % (j, i))
+                sys.exit(1)
+            if adjacency.face_count[i][j] != 1 + (neighbours[j] != -1):
+                print("Face %d of element %d has the wrong count" % (j, i))
+                sys.exit(1)
+
+        if top.get_edge_neighbours(i).tolist() != edge_neighbours.tolist():
+            print("Element %d has the wrong edge neighbours" % (i))
+            sys.exit(1)
+
+        if top.isElementInterior(i) != (len(face_neighbours) == 4):
+            print("Element %d is wrongly interior or not" % (i))
+            sys.exit(1)
+
+        nodes = n[i][:2]
+        if adjacency.get_node_elements(nodes).tolist() != np.where(np.isin(n, nodes).any(axis = 1))[0].tolist():
+            print("The elements of the nodes of element %d are wrong" % (i))
+            sys.exit(1)
+
+    # Adding an element rebuilds the index
+    e = FFEA_topology.FFEA_element_tet_lin()
+    e.set_indices([n[0][0], n[0][1], n[0][2], n.max() + 1])
+    top.add_element(e)
+    if top.get_adjacency() is adjacency or top.get_adjacency().num_elements != top.num_elements:
+        print("The adjacency index was not rebuilt after adding an element")
+        sys.exit(1)
+    if top.num_elements - 1 not in top.get_edge_neighbours(0):
+        print("The new element is not a neighbour of the one it shares a face with")
+        sys.exit(1)
+
+    sys.exit(0)
+except IOError:
+    print("Couldn't find mesh file that's supposed to be packed in with these tests. Probably a CMake issue!")
+    sys.exit(1)
+except Exception, e:
+    print(e)
+    sys.exit(1)
@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+# 
+#  This file is part of the FFEA simulation package
+#  
+#  Copyright (c) by the Theory and Development FFEA teams,
+#  as they appear in the README.md file. 
+# 
+#  FFEA is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+# 
+#  FFEA is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+# 
+#  You should have received a copy of the GNU General Public License
+#  along with FFEA.  If not, see <http://www.gnu.org/licenses/>.
+# 
+#  To help us fund FFEA development, we humbly ask that you cite 
+#  the research papers on the package.
+#
+
+
+import sys
+import gc
+import copy
+import numpy as np
+
+try:
+    import FFEA_node, FFEA_topology, FFEA_surface, FFEA_material
+except ImportError:
+    print("Failure to import FFEA_node, FFEA_topology, FFEA_surface and FFEA_material")
+    sys.exit(1) # failure to import
+
+def check(value, expected, what):
+    if not np.allclose(value, expected, rtol = 1e-12, atol = 0):
+        print(what + " differs from the element by element one")
+        sys.exit(1)
+
+def read_rows(fname, num_columns):
+    """
+    The rows of a structure file with num_columns integers on them.
+    """
+    rows = [line.split() for line in open(fname)]
+    return [[int(i) for i in row] for row in rows if len(row) == num_columns and row[0].isdigit()]
+
+def object_size(objects):
+    """
+    Bytes taken by a list of element (or face) objects holding their own node lists.
+    """
+    return sys.getsizeof(objects) + sum([sys.getsizeof(o) + sys.getsizeof(o.__dict__) + sys.getsizeof(o.n) for o in objects])
+
+try:
+    node = FFEA_node.FFEA_node("sphere_63_120.node")
+    top = FFEA_topology.FFEA_topology("sphere_63_120.top")
+    surf = FFEA_surface.FFEA_surface("sphere_63_120.surf")
+    mat = FFEA_material.FFEA_material("sphere_63_120.mat")
+    elements = read_rows("sphere_63_120.top", 10)
+    faces = [row[1:] for row in read_rows("sphere_63_120.surf", 4)]
+    elindex = [row[0] for row in read_rows("sphere_63_120.surf", 4)]
+
+    # The loaders fill the arrays, which are what's stored
+    if top.connectivity.dtype != np.int32 or top.get_connectivity() is not top.connectivity or top.connectivity.tolist() != elements:
+        print("The loaded connectivity is wrong")
+        sys.exit(1)
+    if surf.connectivity.dtype != np.int32 or surf.get_connectivity() is not surf.connectivity or surf.connectivity.tolist() != faces:
+        print("The loaded face connectivity is wrong")
+        sys.exit(1)
+    if surf.get_elindex() is not surf.elindex or surf.elindex.tolist() != elindex:
+        print("The loaded face elements are wrong")
+        sys.exit(1)
+
+    # Elements and faces are views of the arrays, with no state of their own
+    for structure, objects, expected in [(top, top.element, elements), (surf, surf.face, faces)]:
+        if len(objects) != len(expected) or [list(o.n) for o in objects] != expected or [list(o.n) for o in objects[-3:]] != expected[-3:]:
+            print("The element (or face) views are wrong")
+            sys.exit(1)
+        if hasattr(objects[0], "__dict__"):
+            print("An element (or face) view has a __dict__")
+            sys.exit(1)
+        objects[1].n[2] += 1
+        if structure.connectivity[1][2] != expected[1][2] + 1:
+            print("Changing a view's nodes didn't change the array")
+            sys.exit(1)
+        objects[1].n = expected[1]
+        if structure.connectivity[1].tolist() != expected[1]:
+            print("Setting a view's nodes didn't change the array")
+            sys.exit(1)
+    top.element[3].interior = True
+    surf.face[3].elindex = None
+    if top.element_interior[3] != 1 or top.element[3].interior != True or top.element[2].interior != False or surf.elindex[3] != -1:
+        print("Views don't write through to the interior and element arrays")
+        sys.exit(1)
+    top.element[3].interior = False
+    surf.face[3].elindex = elindex[3]
+
+    # A linear element added to a second order topology has no second order nodes
+    added_top = copy.deepcopy(top)
+    added_top.add_element(FFEA_topology.FFEA_element_tet_lin())
+    if added_top.num_elements != top.num_elements + 1 or added_top.connectivity.tolist() != elements + [[0, 1, 2, 3] + [-1] * 6] or list(added_top.element[-1].n) != [0, 1, 2, 3]:
+        print("Adding a linear element to a second order topology went wrong")
+        sys.exit(1)
+
+    # The whole mesh at once, against one element (or face) at a time
+    frame = copy.deepcopy(node)
+    rng = np.random.RandomState(0)
+    frame.pos = [1.1 * np.asarray(p) + rng.uniform(-0.01, 0.01, 3) for p in node.pos]
+    scale = 2.5
+    volume = [e.calc_volume(node) for e in top.element]
+    mass = [e.calc_volume(node, scale) * mat.element[i][0] for i, e in enumerate(top.element)]
+    centroid = [np.mean([node.pos[n] for n in e.n[0:4]], axis = 0) for e in top.element]
+    check(top.calculate_volume(node), np.sum(volume), "The volume")
+    check(top.get_element_volumes(node), volume, "The element volumes")
+    check(top.calc_mass(mat, node, scale), np.sum(mass), "The mass")
+    check(top.calc_CoM(node, mat), np.sum([v * mat.element[i][0] * c for i, (v, c) in enumerate(zip(volume, centroid))], axis = 0) / np.sum([v * mat.element[i][0] for i, v in enumerate(volume)]), "The centre of mass")
+    check(top.get_smallest_lengthscale(node), np.min([e.get_smallest_lengthscale(node) for e in top.element]), "The smallest lengthscale")
+    check(top.calculate_strain_energy(frame, node, mat), np.sum([e.calculate_strain_energy(frame, node, mat.element[i]) for i, e in enumerate(top.element)]), "The strain energy")
+    check(surf.calculateSmallestEdge(node), np.min([f.calculateSmallestEdge(node) for f in surf.face]), "The smallest surface edge")
+    check(surf.calculateSmallestLength(node), np.min([f.calculateSmallestLength(node) for f in surf.face]), "The smallest surface length")
+
+    # A big topology (copies of the sphere, half of them interior) takes a fraction of the memory of element objects
+    num_copies = 500
+    n = (np.array(elements)[np.newaxis] + node.num_nodes * np.arange(num_copies)[:,np.newaxis,np.newaxis]).reshape(-1, 10)
+    num_surface = len(n) // 2
+    fout = open("big.top", "w")
+    fout.write("ffea topology file\nnum_elements %d\nnum_surface_elements %d\nnum_interior_elements %d\n" % (len(n), num_surface, len(n) - num_surface))
+    fout.write("surface elements:\n")
+    np.savetxt(fout, n[:num_surface], fmt = "%d")
+    fout.write("interior elements:\n")
+    np.savetxt(fout, n[num_surface:], fmt = "%d")
+    fout.close()
+
+    gc.collect()
+    num_objects = len(gc.get_objects())
+    big_top = FFEA_topology.FFEA_topology("big.top")
+    gc.collect()
+    if len(gc.get_objects()) - num_objects > 100:
+        print("Loading %d elements made %d objects" % (len(n), len(gc.get_objects()) - num_objects))
+        sys.exit(1)
+    if big_top.connectivity.tolist() != n.tolist() or big_top.num_surface_elements != num_surface or big_top.element_interior.tolist() != [0] * num_surface + [1] * (len(n) - num_surface):
+        print("The big topology was loaded wrongly")
+        sys.exit(1)
+
+    objects = []
+    for en in n.tolist():
+        e = FFEA_topology.FFEA_element_tet_sec()
+        e.set_indices(en)
+        objects.append(e)
+    array_size = big_top.connectivity.nbytes + big_top.element_interior.nbytes
+    if 5 * array_size > object_size(objects):
+        print("The arrays take %d bytes, against %d for element objects" % (array_size, object_size(objects)))
+        sys.exit(1)
+
+    sys.exit(0)
+except IOError:
+    print("Couldn't find structure files that are supposed to be packed in with these tests. Probably a CMake issue!")
+    sys.exit(1)
+except Exception, e:
+    print(e)
+    sys.exit(1)
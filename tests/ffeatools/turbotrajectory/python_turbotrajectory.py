@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+# 
+#  This file is part of the FFEA simulation package
+#  
+#  Copyright (c) by the Theory and Development FFEA teams,
+#  as they appear in the README.md file. 
+# 
+#  FFEA is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+# 
+#  FFEA is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+# 
+#  You should have received a copy of the GNU General Public License
+#  along with FFEA.  If not, see <http://www.gnu.org/licenses/>.
+# 
+#  To help us fund FFEA development, we humbly ask that you cite 
+#  the research papers on the package.
+#
+
+
+import sys
+import numpy as np
+
+try:
+    import FFEA_trajectory, FFEA_turbotrajectory
+except ImportError:
+    print("Failure to import FFEA_trajectory or FFEA_turbotrajectory")
+    sys.exit(1) # failure to import
+
+def make_trajectory(fname, num_frames):
+    """
+    A trajectory of num_frames copies of the test frame, at steps 0, 100, ...
+    """
+    text = open("unit_test_traj.ftj").read()
+    i = text.index("*\n") + 2
+    fout = open(fname, "w")
+    fout.write(text[:i])
+    for f in range(num_frames):
+        fout.write(text[i:].replace("step 0\n", "step %d\n" % (100 * f)))
+    fout.close()
+
+try:
+    make_trajectory("turbo_traj.ftj", 7)
+
+    for start, frame_rate, num_frames_to_read in [(0, 1, 1000000), (1, 2, 1000000), (2, 1, 3)]:
+        traj = FFEA_trajectory.FFEA_trajectory("turbo_traj.ftj", start=start, frame_rate=frame_rate, num_frames_to_read=num_frames_to_read)
+        expected = np.array([[[f.pos for f in traj.blob[0][0].frame]]])
+
+        turbo = FFEA_turbotrajectory.FFEA_turbotrajectory()
+        turbo.populate_turbotraj_from_ftj("turbo_traj.ftj", start=start, frame_rate=frame_rate, num_frames_to_read=num_frames_to_read)
+        if turbo.turbotraj.shape != expected.shape or not np.array_equal(turbo.turbotraj, expected):
+            print("turbotraj differs from the trajectory (start = %d, frame_rate = %d, num_frames_to_read = %d)" % (start, frame_rate, num_frames_to_read))
+            sys.exit(1)
+
+    # Straight from a trajectory object, and backed by a file
+    expected = np.array([[[f.pos for f in FFEA_trajectory.FFEA_trajectory("turbo_traj.ftj").blob[0][0].frame]]])
+    turbo = FFEA_turbotrajectory.FFEA_turbotrajectory()
+    turbo.load_traj("turbo_traj.ftj")
+    if not np.array_equal(turbo.turbotraj, expected):
+        print("turbotraj built by load_traj differs from the trajectory")
+        sys.exit(1)
+
+    turbo = FFEA_turbotrajectory.FFEA_turbotrajectory()
+    turbo.populate_turbotraj_from_ftj("turbo_traj.ftj", memmap_fname="turbo_traj.dat")
+    if not isinstance(turbo.turbotraj, np.memmap) or not np.array_equal(turbo.turbotraj, expected):
+        print("Memory mapped turbotraj differs from the trajectory")
+        sys.exit(1)
+
+    # The header alone allocates nothing and leaves no file open
+    turbo = FFEA_turbotrajectory.FFEA_turbotrajectory()
+    turbo.load_ftj_header("turbo_traj.ftj")
+    if hasattr(turbo, "turbotraj") or hasattr(turbo, "ftj") or turbo.num_frames != 7 or turbo.num_nodes != expected.shape[3]:
+        print("load_ftj_header did more than read the header")
+        sys.exit(1)
+
+    # The PyMOL drawing code needs the cgo constants
+    if FFEA_turbotrajectory._cgo.BEGIN != 2.0 or FFEA_turbotrajectory._cgo.TRIANGLES != 4.0:
+        print("cgo constants missing")
+        sys.exit(1)
+
+    sys.exit(0)
+except IOError:
+    print("Couldn't find trajectory file that's supposed to be packed in with these tests. Probably a CMake issue!")
+    sys.exit(1)
+except Exception, e:
+    print(e)
+    sys.exit(1)
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+# 
+#  This file is part of the FFEA simulation package
+#  
+#  Copyright (c) by the Theory and Development FFEA teams,
+#  as they appear in the README.md file. 
+# 
+#  FFEA is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+# 
+#  FFEA is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+# 
+#  You should have received a copy of the GNU General Public License
+#  along with FFEA.  If not, see <http://www.gnu.org/licenses/>.
+# 
+#  To help us fund FFEA development, we humbly ask that you cite 
+#  the research papers on the package.
+#
+
+
+import sys
+import numpy as np
+
+try:
+    import FFEA_pdb
+except ImportError:
+    print("Failure to import FFEA_pdb")
+    sys.exit(1) # failure to import
+
+def make_pdb(fname, num_frames):
+    """
+    A multi-model pdb of two chains, made from the atoms of left.pdb, with
+    coordinates that fill their columns.
+    """
+    atoms = [line for line in open("left.pdb").readlines() if line.startswith("ATOM")]
+    rng = np.random.RandomState(0)
+    fout = open(fname, "w")
+    for f in range(num_frames):
+        fout.write("MODEL     %4d\n" % (f + 1))
+        for c, chain in enumerate("AB"):
+            for line in atoms:
+                x = rng.uniform(-999.0, 999.0, 3)
+                fout.write(line[:6] + "%5d" % (int(line[6:11]) + 1000 * c) + line[11:21] + chain + line[22:30] + "%8.3f%8.3f%8.3f" % tuple(x) + "  1.00  0.00           C  \n")
+            fout.write("TER\n")
+        fout.write("ENDMDL\n")
+    fout.write("END\n")
+    fout.close()
+
+def old_write_to_text(pdb, frames, frame_rate):
+    """
+    The pdb text, written one atom record at a time.
+    """
+    text = ""
+    for i in range(frames[0], frames[1], frame_rate):
+        text += ("MODEL     %4d\n" % (i + 1))
+        for j in range(pdb.num_chains):
+            for k in range(pdb.num_atoms[j]):
+                a = pdb.chain[j].atom[k]
+                pos = pdb.chain[j].frame[i].pos
+                text += ("%6s%5d %4s %3s %c%4d    %8.3f%8.3f%8.3f%6.2f%6.2f      %4s%2s%2s\n" % ("ATOM  ", a.atomID, a.name, a.res, pdb.chain[j].chainID, a.resID, pos[k][0], pos[k][1], pos[k][2], a.occupancy, a.temperature, a.segID ,a.element, a.charge))
+            text += ("TER\n")
+        text += ("ENDMDL\n")
+    text += ("END\n")
+    return text
+
+try:
+    make_pdb("multi.pdb", 7)
+    pdb = FFEA_pdb.FFEA_pdb("multi.pdb")
+
+    # The whole file
+    pdb.write_to_file("multi_out.pdb", buffer_size = 1000)
+    if open("multi_out.pdb").read() != open("multi.pdb").read():
+        print("Written pdb differs from the one read")
+        sys.exit(1)
+
+    # Some of the frames
+    for frames, frame_rate in [([0, 7], 1), ([1, 6], 2), ([3, 4], 1)]:
+        expected = old_write_to_text(pdb, frames, frame_rate)
+        if pdb.write_to_text(frames, frame_rate) != expected:
+            print("write_to_text differs for frames %s, frame_rate %d" % (str(frames), frame_rate))
+            sys.exit(1)
+        pdb.write_to_file("frames_out.pdb", frames, frame_rate)
+        if open("frames_out.pdb").read() != expected:
+            print("write_to_file differs for frames %s, frame_rate %d" % (str(frames), frame_rate))
+            sys.exit(1)
+
+    # Positions from a generator
+    pos = [np.concatenate([pdb.chain[c].frame[i].pos for c in range(pdb.num_chains)]) for i in range(pdb.num_frames)]
+    pdb.write_to_file("generated_out.pdb", positions = (p for p in pos[::-1]))
+    for i in range(pdb.num_frames):
+        for c in range(pdb.num_chains):
+            pdb.chain[c].frame[i].pos = pos[pdb.num_frames - 1 - i][sum(pdb.num_atoms[:c]):sum(pdb.num_atoms[:c + 1])]
+    if open("generated_out.pdb").read() != old_write_to_text(pdb, [0, pdb.num_frames], 1):
+        print("Written positions differ from the generator's")
+        sys.exit(1)
+
+    sys.exit(0)
+except IOError:
+    print("Couldn't find pdb file that's supposed to be packed in with these tests. Probably a CMake issue!")
+    sys.exit(1)
+except Exception, e:
+    print(e)
+    sys.exit(1)
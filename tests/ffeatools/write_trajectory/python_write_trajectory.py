@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+# 
+#  This file is part of the FFEA simulation package
+#  
+#  Copyright (c) by the Theory and Development FFEA teams,
+#  as they appear in the README.md file. 
+# 
+#  FFEA is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+# 
+#  FFEA is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+# 
+#  You should have received a copy of the GNU General Public License
+#  along with FFEA.  If not, see <http://www.gnu.org/licenses/>.
+# 
+#  To help us fund FFEA development, we humbly ask that you cite 
+#  the research papers on the package.
+#
+
+
+import sys
+import numpy as np
+
+try:
+    import FFEA_trajectory
+except ImportError:
+    print("Failure to import FFEA_trajectory")
+    sys.exit(1) # failure to import
+
+def make_trajectory(fname, num_frames):
+    """
+    A trajectory of num_frames copies of the test frame, at steps 0, 100, ...
+    """
+    text = open("unit_test_traj.ftj").read()
+    i = text.index("*\n") + 2
+    fout = open(fname, "w")
+    fout.write(text[:i])
+    for f in range(num_frames):
+        fout.write(text[i:].replace("step 0\n", "step %d\n" % (100 * f)))
+    fout.close()
+
+try:
+    # The writer reproduces the simulation's output exactly, however it was loaded
+    make_trajectory("write_traj.ftj", 6)
+    text = open("write_traj.ftj").read()
+    for kwargs in [{}, {"lazy": True}, {"dense": True}, {"onlyNodes": True}]:
+        traj = FFEA_trajectory.FFEA_trajectory("write_traj.ftj", **kwargs)
+        traj.write_to_file("written_traj.ftj")
+        if open("written_traj.ftj").read() != text:
+            print("Written trajectory differs from the one loaded (%s)" % (str(kwargs)))
+            sys.exit(1)
+
+    # Selected frames only
+    traj = FFEA_trajectory.FFEA_trajectory("write_traj.ftj")
+    traj.write_to_file("written_traj.ftj", frames=[1, 6], frame_rate=2)
+    written = FFEA_trajectory.FFEA_trajectory("written_traj.ftj")
+    if [f.step for f in written.blob[0][0].frame] != [100, 300, 500]:
+        print("Wrong frames written for frames = [1, 6], frame_rate = 2")
+        sys.exit(1)
+    for f in written.blob[0][0].frame:
+        if not np.array_equal(f.pos, traj.blob[0][0].frame[0].pos):
+            print("Node positions differ in a written frame")
+            sys.exit(1)
+
+    sys.exit(0)
+except IOError:
+    print("Couldn't find trajectory file that's supposed to be packed in with these tests. Probably a CMake issue!")
+    sys.exit(1)
+except Exception, e:
+    print(e)
+    sys.exit(1)